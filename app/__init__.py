@@ -2,17 +2,22 @@ from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_jwt_extended import JWTManager
 from .config import Config
-from flask_migrate import Migrate
 from flask_cors import CORS
 from flask_mail import Mail
+from .database import RoutingSession, configure_engines
+from .log import configure_logging
 
 # Инициализация объектов
-db = SQLAlchemy()
-migrate = Migrate()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 jwt = JWTManager()
 mail = Mail()  # Объект почты инициализируется здесь
 
-def create_app():
+def create_app(cli: bool = True):
+    """
+    Фабрика приложения. Не делает сетевых запросов и не трогает базу, поэтому годится
+    для gunicorn --preload (см. wsgi.py). С cli=False не подключает миграции и команды
+    flask CLI: alembic при этом не импортируется и процесс стартует быстрее.
+    """
     # Создаем экземпляр Flask приложения
     app = Flask(__name__)
 
@@ -22,20 +27,66 @@ def create_app():
     # Загружаем конфигурацию из config.py
     app.config.from_object(Config)
 
+    # Адрес клиента из X-Forwarded-For доверенных прокси (лимиты запросов по IP)
+    if app.config['PROXY_FIX_X_FOR']:
+        from werkzeug.middleware.proxy_fix import ProxyFix
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_FIX_X_FOR'], x_proto=1, x_host=1)
+
+    # JSON-логи через очередь в отдельный поток, уровни и сэмплирование из конфига
+    configure_logging(app.config)
+
     # Инициализация Mail с приложением
     mail.init_app(app)  # Инициализация почтового сервиса с приложением
 
-    # Инициализация SQLAlchemy с приложением
+    # Инициализация SQLAlchemy с приложением: пул соединений и реплика для чтения
+    configure_engines(app)
     db.init_app(app)
 
     # Инициализация JWTManager с приложением
     jwt.init_app(app)
 
-    # Регистрируем миграции
-    migrate.init_app(app, db)
+    # Инициализация кэша (локальный уровень + общее хранилище)
+    from .services.cache import cache
+    cache.init_app(app)
+
+    # Загрузка пользователя по JWT через кэш снимков (current_user)
+    from .services.identity import identity_cache
+    identity_cache.init_app(app)
+
+    # Фильтр Блума по email для /auth
+    from .services.email_index import email_index
+    email_index.init_app(app)
+
+    # Лимиты частоты запросов и очередь к API генерации
+    from .services.rate_limit import limiter
+    limiter.init_app(app)
+
+    # Хеширование паролей в пуле процессов
+    from .services.passwords import hasher
+    hasher.init_app(app)
+
+    # Хранилище локальных копий треков и обложек
+    from .services.media_store import media_storage
+    media_storage.init_app(app)
+
+    # Pub/sub событий об изменении битов
+    from .services.events import events
+    events.init_app(app)
+
+    # Замеры времени запросов, SQL и вызовов API генерации
+    from .services import metrics
+    metrics.init_app(app)
+
+    # Миграции (flask db) и команды flask CLI
+    if cli:
+        from flask_migrate import Migrate
+        from .cli import register_commands
+
+        Migrate(app, db)
+        register_commands(app)
 
     # Импортируем маршруты (Blueprints)
-    from .routes import auth, beats, subscription
+    from .routes import auth, beats, metrics as metrics_routes
 
     # Регистрируем Blueprint для аутентификации
     app.register_blueprint(auth.bp)
@@ -44,4 +95,8 @@ def create_app():
     app.register_blueprint(beats.bp)
     # app.register_blueprint(subscription.bp)
 
+    # Метрики Prometheus
+    if app.config['METRICS_ENABLED']:
+        app.register_blueprint(metrics_routes.bp)
+
     return app
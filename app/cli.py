@@ -0,0 +1,43 @@
+import click
+from flask.cli import AppGroup, with_appcontext
+
+# Команды обслуживания: flask quota sync
+quota_cli = AppGroup('quota', help='Лимиты генераций пользователей')
+
+
+@quota_cli.command('sync')
+def quota_sync():
+    """Пересчитывает остаток генераций по тарифам пользователей."""
+    from app.services.quota import sync_with_plans
+
+    fixed = sync_with_plans()
+    click.echo(f"Quota synced, {fixed} users updated")
+
+
+# Коды подтверждения почты: flask verification purge
+verification_cli = AppGroup('verification', help='Коды подтверждения почты')
+
+
+@verification_cli.command('purge')
+def verification_purge():
+    """Удаляет истекшие коды подтверждения пачками."""
+    from app.services.auth_service import purge_expired_codes
+
+    purged = purge_expired_codes()
+    click.echo(f"Purged {purged} expired verification codes")
+
+
+@click.command('init-db')
+@with_appcontext
+def init_db():
+    """Создает недостающие таблицы по моделям (для разработки; в проде - flask db upgrade)."""
+    from app import db
+
+    db.create_all(bind_key=None)  # Только основная база, реплика получает схему репликацией
+    click.echo("Database tables created")
+
+
+def register_commands(app) -> None:
+    app.cli.add_command(quota_cli)
+    app.cli.add_command(verification_cli)
+    app.cli.add_command(init_db)
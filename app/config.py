@@ -4,7 +4,8 @@ from dotenv import load_dotenv
 load_dotenv()
 
 class Config:
-    SQLALCHEMY_DATABASE_URI = f"mysql+mysqlconnector://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST')}/{os.getenv('DB_NAME')}"
+    SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL') or f"mysql+mysqlconnector://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST')}/{os.getenv('DB_NAME')}"
+    SQLALCHEMY_DATABASE_REPLICA_URI = os.getenv('DATABASE_REPLICA_URL')  # Реплика для роутов @read_only (необязательно)
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SECRET_KEY = os.getenv('SECRET_KEY', os.urandom(24))  # Генерация случайного ключа по умолчанию
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY')  # Это нужно для подписи JWT токенов
@@ -14,3 +15,148 @@ class Config:
     MAIL_USERNAME = os.getenv('MAIL_USERNAME')
     MAIL_PASSWORD = os.getenv('MAIL_PASSWORD')
     MAIL_DEFAULT_SENDER = os.getenv('MAIL_DEFAULT_SENDER')
+
+    # Прием /beats/callback без LOVEAI_CALLBACK_SECRET, только при запуске в debug-режиме (локальная разработка)
+    CALLBACK_ALLOW_UNSIGNED = os.getenv('CALLBACK_ALLOW_UNSIGNED', 'false').lower() == 'true'
+
+    # Логирование (app/log.py)
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()  # Уровень по умолчанию
+    LOG_LEVELS = os.getenv('LOG_LEVELS', 'werkzeug=INFO,sqlalchemy.engine=WARNING')  # Уровни отдельных логгеров
+    LOG_FORMAT = os.getenv('LOG_FORMAT', 'json')  # json или text
+    LOG_SAMPLING = os.getenv('LOG_SAMPLING', '')  # Доля записей ниже WARNING, "app.services.http_client=0.1"
+
+    # Метрики Prometheus на /metrics (app/services/metrics.py), у каждого процесса свои.
+    # Отдаются только с заголовком Authorization: Bearer METRICS_TOKEN, без токена - 403
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'false').lower() == 'true'
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
+    # Пул соединений с базой (для SQLite не применяется)
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 10))  # Постоянных соединений на процесс
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 20))  # Дополнительных соединений при пиковой нагрузке
+    DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 10))  # Сколько ждать свободного соединения, сек
+    DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 280))  # Пересоздавать соединение раньше wait_timeout MySQL, сек
+    DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true'  # Проверять соединение перед выдачей
+
+    # Фоновая сверка статусов битов с API генерации (reconciler.py)
+    RECONCILER_INTERVAL = float(os.getenv('RECONCILER_INTERVAL', 5))  # Пауза между проходами, сек
+    RECONCILER_BATCH_SIZE = int(os.getenv('RECONCILER_BATCH_SIZE', 100))  # Сколько битов читать из базы за раз
+    RECONCILER_BACKOFF_BASE = float(os.getenv('RECONCILER_BACKOFF_BASE', 5))  # Первый интервал повторного опроса задачи, сек
+    RECONCILER_BACKOFF_MAX = float(os.getenv('RECONCILER_BACKOFF_MAX', 300))  # Максимальный интервал опроса задачи, сек
+
+    # Пул заранее сгенерированных битов по жанрам (refiller.py)
+    GENRE_POOL_TARGET = int(os.getenv('GENRE_POOL_TARGET', 4))  # Свободных битов на жанр по умолчанию
+    GENRE_POOL_REFILL_INTERVAL = float(os.getenv('GENRE_POOL_REFILL_INTERVAL', 60))  # Пауза между проходами, сек
+    GENRE_POOL_MAX_TASKS_PER_PASS = int(os.getenv('GENRE_POOL_MAX_TASKS_PER_PASS', 5))  # Лимит задач генерации за проход
+
+    # Кэш (каталог жанров и т.п.): memory - в памяти процесса, redis - общий для всех процессов
+    CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'memory')
+    CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+    CACHE_LOCAL_TTL = float(os.getenv('CACHE_LOCAL_TTL', 30))  # Сколько процесс держит значение у себя, сек
+    GENRE_CACHE_TTL = float(os.getenv('GENRE_CACHE_TTL', 3600))  # Время жизни каталога жанров, сек
+
+    # Очередь исходящих писем (mail_worker.py)
+    MAIL_QUEUE_INTERVAL = float(os.getenv('MAIL_QUEUE_INTERVAL', 2))  # Пауза между проходами, сек
+    MAIL_QUEUE_BATCH_SIZE = int(os.getenv('MAIL_QUEUE_BATCH_SIZE', 50))  # Писем на одно SMTP-соединение
+    MAIL_QUEUE_MAX_ATTEMPTS = int(os.getenv('MAIL_QUEUE_MAX_ATTEMPTS', 5))  # После этого письмо помечается failed
+    MAIL_QUEUE_BACKOFF_BASE = float(os.getenv('MAIL_QUEUE_BACKOFF_BASE', 30))  # Первая задержка повтора, сек
+    MAIL_QUEUE_BACKOFF_MAX = float(os.getenv('MAIL_QUEUE_BACKOFF_MAX', 3600))  # Максимальная задержка повтора, сек
+
+    # Постраничная выдача /beats/list
+    BEATS_PAGE_SIZE = int(os.getenv('BEATS_PAGE_SIZE', 50))  # Размер страницы по умолчанию
+    BEATS_PAGE_MAX = int(os.getenv('BEATS_PAGE_MAX', 200))  # Максимальный limit
+    BEATS_CHANGES_LOOKBACK = float(os.getenv('BEATS_CHANGES_LOOKBACK', 10))  # Перекрытие окна since: коммиты не по порядку updated_at и отставание реплики, сек
+
+    # События об изменении битов (/beats/events): db - опрос beats.updated_at в каждом процессе,
+    # redis - Redis pub/sub (по умолчанию, если задан EVENTS_REDIS_URL), memory - только внутри
+    # одного процесса: завершения из reconciler.py и generation_worker.py до подписчиков не дойдут
+    EVENTS_BACKEND = os.getenv('EVENTS_BACKEND') or ('redis' if os.getenv('EVENTS_REDIS_URL') else 'db')
+    EVENTS_REDIS_URL = os.getenv('EVENTS_REDIS_URL', os.getenv('CACHE_REDIS_URL', 'redis://localhost:6379/0'))
+    EVENTS_DB_POLL_INTERVAL = float(os.getenv('EVENTS_DB_POLL_INTERVAL', 1))  # Опрос базы в режиме db, сек
+    EVENTS_DB_LOOKBACK = float(os.getenv('EVENTS_DB_LOOKBACK', 10))  # Перекрытие окна опроса: коммиты не по порядку updated_at, сек
+    WEB_CONCURRENCY = int(os.getenv('WEB_CONCURRENCY', 1))  # Процессов gunicorn (с memory допустим только один)
+    EVENTS_KEEPALIVE = float(os.getenv('EVENTS_KEEPALIVE', 15))  # Пустое сообщение в SSE-поток, сек
+    EVENTS_STREAM_MAX = float(os.getenv('EVENTS_STREAM_MAX', 300))  # Максимальная длина SSE-соединения, сек
+    EVENTS_POLL_TIMEOUT = float(os.getenv('EVENTS_POLL_TIMEOUT', 25))  # Максимальное ожидание long-poll, сек
+
+    # Очередь заданий генерации (generation_worker.py)
+    GENERATION_QUEUE_INTERVAL = float(os.getenv('GENERATION_QUEUE_INTERVAL', 1))  # Пауза между проходами, сек
+    GENERATION_WORKER_CONCURRENCY = int(os.getenv('GENERATION_WORKER_CONCURRENCY', 4))  # Заданий одновременно на процесс
+    GENERATION_JOB_MAX_ATTEMPTS = int(os.getenv('GENERATION_JOB_MAX_ATTEMPTS', 5))  # После этого задание помечается dead
+    GENERATION_JOB_BACKOFF_BASE = float(os.getenv('GENERATION_JOB_BACKOFF_BASE', 10))  # Первая задержка повтора, сек
+    GENERATION_JOB_BACKOFF_MAX = float(os.getenv('GENERATION_JOB_BACKOFF_MAX', 600))  # Максимальная задержка повтора, сек
+    GENERATION_JOB_LEASE = float(os.getenv('GENERATION_JOB_LEASE', 120))  # Через сколько секунд задание упавшего воркера берется снова
+
+    # Кэш снимков пользователей для авторизованных роутов (current_user)
+    IDENTITY_CACHE_SIZE = int(os.getenv('IDENTITY_CACHE_SIZE', 10000))  # Пользователей в кэше процесса (0 - без кэша)
+    IDENTITY_CACHE_TTL = float(os.getenv('IDENTITY_CACHE_TTL', 30))  # Сколько снимок считается свежим, сек
+
+    # Ограничение частоты запросов: лимиты вида "N/секунд" на пользователя или IP
+    RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+    RATE_LIMIT_BACKEND = os.getenv('RATE_LIMIT_BACKEND', 'memory')  # memory или redis (общий для процессов)
+    RATE_LIMIT_REDIS_URL = os.getenv('RATE_LIMIT_REDIS_URL', os.getenv('CACHE_REDIS_URL', 'redis://localhost:6379/0'))
+    RATE_LIMIT_CREATE_BEAT = os.getenv('RATE_LIMIT_CREATE_BEAT', '5/60')  # /beats/create-by-genre на пользователя
+    # Эндпоинты /auth: у каждого своя корзина, чтобы частый check-email не блокировал вход
+    RATE_LIMIT_REGISTER = os.getenv('RATE_LIMIT_REGISTER', '5/60')  # /auth/register на IP
+    RATE_LIMIT_LOGIN = os.getenv('RATE_LIMIT_LOGIN', '20/60')  # /auth/login на IP
+    RATE_LIMIT_VERIFY_EMAIL = os.getenv('RATE_LIMIT_VERIFY_EMAIL', '10/60')  # /auth/verify-email на IP
+    RATE_LIMIT_RESEND_VERIFICATION = os.getenv('RATE_LIMIT_RESEND_VERIFICATION', '3/60')  # /auth/resend-verification на IP
+    RATE_LIMIT_CHANGE_PASSWORD = os.getenv('RATE_LIMIT_CHANGE_PASSWORD', '5/60')  # /auth/change-password на пользователя
+    RATE_LIMIT_CHECK_EMAIL = os.getenv('RATE_LIMIT_CHECK_EMAIL', '120/60')  # /auth/check-email на IP (проверка при вводе)
+    # Сколько прокси (nginx, балансировщик) перед приложением: адрес клиента берется из X-Forwarded-For.
+    # 0 - приложение доступно напрямую, заголовок не учитывается (его может подделать клиент)
+    PROXY_FIX_X_FOR = int(os.getenv('PROXY_FIX_X_FOR', 0))
+
+    # Очередь запросов к API генерации
+    UPSTREAM_MAX_IN_FLIGHT = int(os.getenv('UPSTREAM_MAX_IN_FLIGHT', 8))  # Одновременных запросов на процесс
+    UPSTREAM_MAX_PER_SECOND = float(os.getenv('UPSTREAM_MAX_PER_SECOND', 5))  # Запросов в секунду (общая корзина)
+    UPSTREAM_QUEUE_TIMEOUT = float(os.getenv('UPSTREAM_QUEUE_TIMEOUT', 30))  # Сколько запрос ждет очереди, сек
+    # Приоритет по тарифу: меньше - раньше ("pro=0,premium=1,free=2")
+    UPSTREAM_PLAN_PRIORITIES = {
+        name: int(priority)
+        for name, priority in (item.split('=') for item in os.getenv('UPSTREAM_PLAN_PRIORITIES', 'pro=0,premium=1,free=2').split(','))
+    }
+    UPSTREAM_DEFAULT_PRIORITY = int(os.getenv('UPSTREAM_DEFAULT_PRIORITY', 5))  # Запросы пользователей без тарифа в списке
+    UPSTREAM_BACKGROUND_PRIORITY = int(os.getenv('UPSTREAM_BACKGROUND_PRIORITY', 10))  # Фоновые процессы (пул, сверка)
+
+    # Хеширование паролей в отдельном пуле процессов (app/services/passwords.py)
+    PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'scrypt')  # Метод werkzeug: scrypt[:n:r:p] или pbkdf2[:hash[:iterations]]
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', 2))  # Процессов (ядер) под хеширование, 0 - в потоке запроса
+    PASSWORD_HASH_MAX_PENDING = int(os.getenv('PASSWORD_HASH_MAX_PENDING', 32))  # Операций в очереди, сверх этого 503
+    PASSWORD_HASH_TIMEOUT = float(os.getenv('PASSWORD_HASH_TIMEOUT', 10))  # Сколько запрос ждет результата, сек
+
+    # Фильтр Блума по email пользователей для /auth (app/services/email_index.py)
+    EMAIL_INDEX_ENABLED = os.getenv('EMAIL_INDEX_ENABLED', 'true').lower() == 'true'
+    EMAIL_INDEX_CAPACITY = int(os.getenv('EMAIL_INDEX_CAPACITY', 1_000_000))  # Минимальная емкость фильтра, email
+    EMAIL_INDEX_ERROR_RATE = float(os.getenv('EMAIL_INDEX_ERROR_RATE', 0.01))  # Доля ложных "возможно есть"
+    EMAIL_INDEX_REFRESH_INTERVAL = float(os.getenv('EMAIL_INDEX_REFRESH_INTERVAL', 5))  # Подхват регистраций из других процессов, сек
+    EMAIL_INDEX_REFRESH_LOOKBACK = float(os.getenv('EMAIL_INDEX_REFRESH_LOOKBACK', 120))  # Перекрытие окна подхвата: поздние коммиты и расхождение часов, сек
+    EMAIL_INDEX_REBUILD_INTERVAL = float(os.getenv('EMAIL_INDEX_REBUILD_INTERVAL', 3600))  # Полная пересборка фильтра, сек
+
+    # Коды подтверждения почты и их очистка (purge_worker.py)
+    VERIFICATION_CODE_TTL = int(os.getenv('VERIFICATION_CODE_TTL', 900))  # Срок действия кода, сек
+    VERIFICATION_CODE_MAX_ATTEMPTS = int(os.getenv('VERIFICATION_CODE_MAX_ATTEMPTS', 5))  # Неверных вводов до блокировки кода
+    VERIFICATION_PURGE_INTERVAL = float(os.getenv('VERIFICATION_PURGE_INTERVAL', 300))  # Пауза между проходами очистки, сек
+    VERIFICATION_PURGE_BATCH_SIZE = int(os.getenv('VERIFICATION_PURGE_BATCH_SIZE', 500))  # Строк в одной транзакции удаления
+    VERIFICATION_PURGE_MAX_BATCHES = int(os.getenv('VERIFICATION_PURGE_MAX_BATCHES', 200))  # Пачек за проход
+    VERIFICATION_PURGE_PAUSE = float(os.getenv('VERIFICATION_PURGE_PAUSE', 0.05))  # Пауза между пачками, сек
+
+    # Локальные копии треков и обложек (media_worker.py, /beats/<id>/audio)
+    MEDIA_STORE_BACKEND = os.getenv('MEDIA_STORE_BACKEND', 'local')  # local или s3
+    MEDIA_STORE_PATH = os.getenv('MEDIA_STORE_PATH', os.path.abspath('media'))  # Каталог хранилища для local
+    MEDIA_S3_BUCKET = os.getenv('MEDIA_S3_BUCKET')
+    MEDIA_S3_PREFIX = os.getenv('MEDIA_S3_PREFIX', 'media/')
+    MEDIA_S3_ENDPOINT_URL = os.getenv('MEDIA_S3_ENDPOINT_URL')  # Для MinIO и других S3-совместимых хранилищ
+    MEDIA_S3_URL_TTL = int(os.getenv('MEDIA_S3_URL_TTL', 300))  # Срок временной ссылки на объект, сек
+    MEDIA_STORE_MAX_BYTES = int(os.getenv('MEDIA_STORE_MAX_BYTES', 10 * 1024 ** 3))  # Объем хранилища, после которого вытесняются холодные файлы
+    MEDIA_STORE_LOW_WATERMARK = float(os.getenv('MEDIA_STORE_LOW_WATERMARK', 0.9))  # До какой доли объема вытеснять
+    MEDIA_MAX_FILE_SIZE = int(os.getenv('MEDIA_MAX_FILE_SIZE', 50 * 1024 ** 2))  # Файлы больше не копируются, байт
+    MEDIA_DOWNLOAD_TIMEOUT = float(os.getenv('MEDIA_DOWNLOAD_TIMEOUT', 30))  # Таймаут соединения и чтения с CDN, сек
+    MEDIA_MIRROR_INTERVAL = float(os.getenv('MEDIA_MIRROR_INTERVAL', 5))  # Пауза между проходами, сек
+    MEDIA_MIRROR_BATCH_SIZE = int(os.getenv('MEDIA_MIRROR_BATCH_SIZE', 50))  # Новых битов в очередь за проход
+    MEDIA_MIRROR_CONCURRENCY = int(os.getenv('MEDIA_MIRROR_CONCURRENCY', 4))  # Скачиваний одновременно на процесс
+    MEDIA_MIRROR_MAX_ATTEMPTS = int(os.getenv('MEDIA_MIRROR_MAX_ATTEMPTS', 5))  # После этого файл помечается failed
+    MEDIA_MIRROR_BACKOFF_BASE = float(os.getenv('MEDIA_MIRROR_BACKOFF_BASE', 30))  # Первая задержка повтора, сек
+    MEDIA_MIRROR_BACKOFF_MAX = float(os.getenv('MEDIA_MIRROR_BACKOFF_MAX', 3600))  # Максимальная задержка повтора, сек
+    MEDIA_MIRROR_LEASE = float(os.getenv('MEDIA_MIRROR_LEASE', 300))  # Через сколько секунд файл упавшего воркера берется снова
+    MEDIA_CACHE_MAX_AGE = int(os.getenv('MEDIA_CACHE_MAX_AGE', 365 * 24 * 3600))  # Cache-Control max-age отдаваемых файлов, сек
+    MEDIA_TOUCH_INTERVAL = float(os.getenv('MEDIA_TOUCH_INTERVAL', 300))  # Как часто обновлять last_accessed_at файла, сек
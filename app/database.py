@@ -0,0 +1,144 @@
+import logging
+import os
+import threading
+import time
+import weakref
+from functools import wraps
+from typing import Any, Dict
+
+from flask import g, has_app_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import Select, exc
+from sqlalchemy.pool import QueuePool
+
+logger = logging.getLogger(__name__)
+
+REPLICA_BIND = 'replica'
+
+# Приложения, чьи пулы соединений нужно сбросить в дочернем процессе после fork
+_apps: "weakref.WeakSet" = weakref.WeakSet()
+
+
+class MeteredQueuePool(QueuePool):
+    """QueuePool, который считает выдачи соединений, ожидание свободного соединения и таймауты."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._metrics_lock = threading.Lock()
+        self.metrics = {"checkouts": 0, "wait_seconds_total": 0.0, "wait_seconds_max": 0.0, "timeouts": 0}
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            with self._metrics_lock:
+                self.metrics["timeouts"] += 1
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            with self._metrics_lock:
+                self.metrics["checkouts"] += 1
+                self.metrics["wait_seconds_total"] += waited
+                self.metrics["wait_seconds_max"] = max(self.metrics["wait_seconds_max"], waited)
+
+
+def _pool_options(uri: str, config) -> Dict[str, Any]:
+    # У SQLite свой пул без этих настроек
+    if uri.startswith('sqlite'):
+        return {}
+    return {
+        'poolclass': MeteredQueuePool,
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': config['DB_POOL_PRE_PING'],
+    }
+
+
+def configure_engines(app) -> None:
+    """
+    Дополняет конфиг до db.init_app: настройки пула для основной базы и bind реплики
+    (SQLALCHEMY_DATABASE_REPLICA_URI), если она задана. Явный SQLALCHEMY_ENGINE_OPTIONS
+    имеет приоритет.
+    """
+    config = app.config
+    config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        **_pool_options(config['SQLALCHEMY_DATABASE_URI'], config),
+        **config.get('SQLALCHEMY_ENGINE_OPTIONS', {}),
+    }
+    replica_uri = config.get('SQLALCHEMY_DATABASE_REPLICA_URI')
+    if replica_uri:
+        binds = dict(config.get('SQLALCHEMY_BINDS') or {})
+        binds[REPLICA_BIND] = {'url': replica_uri, **_pool_options(replica_uri, config)}
+        config['SQLALCHEMY_BINDS'] = binds
+    _apps.add(app)
+
+
+def _reset_pools_after_fork() -> None:
+    """
+    Воркер, унаследовавший приложение от мастера (gunicorn --preload), не должен
+    использовать соединения, открытые до fork: сокет остался бы общим с мастером.
+    """
+    for app in list(_apps):
+        extension = app.extensions.get('sqlalchemy')
+        if extension is None:
+            continue
+        with app.app_context():
+            for engine in extension.engines.values():
+                engine.dispose(close=False)
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_pools_after_fork)
+
+
+class RoutingSession(Session):
+    """
+    Сессия, которая внутри роутов с @read_only отправляет SELECT на реплику.
+    Запись, flush и SELECT ... FOR UPDATE всегда идут в основную базу.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (
+            bind is None
+            and not self._flushing
+            and has_app_context()
+            and g.get('db_read_only')
+            and isinstance(clause, Select)
+            and clause._for_update_arg is None
+        ):
+            replica = self._db.engines.get(REPLICA_BIND)
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def read_only(view):
+    """
+    Декоратор роута, который только читает данные: его запросы идут на реплику, если она настроена.
+    Реплика может отставать от основной базы на время репликации.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.db_read_only = True
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def get_pool_stats() -> Dict[str, Dict[str, Any]]:
+    """Заполненность пулов соединений и ожидание соединения по каждой базе (default, replica)."""
+    from app import db
+
+    stats = {}
+    for name, engine in db.engines.items():
+        pool = engine.pool
+        item: Dict[str, Any] = {"pool": type(pool).__name__}
+        if isinstance(pool, QueuePool):
+            item.update(size=pool.size(), checked_out=pool.checkedout(), idle=pool.checkedin(), overflow=pool.overflow())
+        if isinstance(pool, MeteredQueuePool):
+            with pool._metrics_lock:
+                item.update(pool.metrics)
+        stats[name or "default"] = item
+    return stats
@@ -0,0 +1,165 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import re
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+# Атрибуты LogRecord, которые не считаются полями extra
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'taskName'}
+
+# Ключи полей extra, значения которых не пишутся в лог
+SECRET_KEYS = re.compile(r'password|secret|token|authorization|api[_-]?key|verification_code', re.IGNORECASE)
+# Секреты внутри текста сообщения: password=..., secret=..., Bearer ..., JWT
+SECRET_PATTERNS = (
+    (re.compile(r'(?i)\b(password|secret|token|api[_-]?key)(["\']?\s*[=:]\s*["\']?)[^\s"\'&,}]+'), r'\1\2***'),
+    (re.compile(r'(?i)\bBearer\s+[A-Za-z0-9._~+/=-]+'), 'Bearer ***'),
+    (re.compile(r'\beyJ[A-Za-z0-9_-]+\.[A-Za-z0-9_-]+\.[A-Za-z0-9_-]*'), '***'),
+)
+
+_listener: Optional[QueueListener] = None
+_config = None
+
+
+def redact(text: str) -> str:
+    for pattern, replacement in SECRET_PATTERNS:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+def _parse_mapping(value: str) -> Dict[str, str]:
+    """Разбирает "app.routes=INFO,werkzeug=WARNING" в словарь."""
+    items = (item.split('=', 1) for item in value.split(',') if '=' in item)
+    return {name.strip(): level.strip() for name, level in items}
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна JSON-строка на запись: время, уровень, логгер, сообщение, поля extra и traceback."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": redact(record.getMessage()),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = '***' if SECRET_KEYS.search(key) else value
+        if record.exc_info:
+            entry["exc"] = redact(self.formatException(record.exc_info))
+        elif record.exc_text:
+            entry["exc"] = redact(record.exc_text)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Прежний текстовый формат, но с удалением секретов."""
+
+    def __init__(self):
+        super().__init__('%(asctime)s - %(levelname)s - %(name)s - %(message)s')
+
+    def format(self, record: logging.LogRecord) -> str:
+        return redact(super().format(record))
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Пропускает только долю записей ниже WARNING от частых логгеров (LOG_SAMPLING),
+    предупреждения и ошибки проходят всегда.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or not self.rates:
+            return True
+        name = record.name
+        while name:
+            rate = self.rates.get(name)
+            if rate is not None:
+                return random.random() < rate
+            name = name.rpartition('.')[0]
+        return True
+
+
+class _PreparedQueueHandler(QueueHandler):
+    """
+    QueueHandler без форматирования в потоке запроса: в очередь уходит сама запись
+    с уже подставленными аргументами, форматирует и пишет поток QueueListener.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            # traceback не передается между потоками как объект, форматируем здесь
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def configure_logging(config) -> None:
+    """
+    Настраивает логирование процесса по конфигу приложения:
+        LOG_LEVEL - уровень корневого логгера;
+        LOG_LEVELS - уровни отдельных логгеров, "app.services.reconciler=DEBUG,werkzeug=WARNING";
+        LOG_FORMAT - json или text;
+        LOG_SAMPLING - доля записей ниже WARNING по логгерам, "app.services.http_client=0.1".
+
+    Записи передаются через очередь в отдельный поток (QueueHandler/QueueListener),
+    поэтому запрос не ждет записи в stdout. Повторный вызов перенастраивает уровни
+    и фильтры, поток записи остается один.
+    """
+    global _listener, _config
+
+    _config = config
+    root = logging.getLogger()
+    root.setLevel(config['LOG_LEVEL'])
+    for name, level in _parse_mapping(config['LOG_LEVELS']).items():
+        logging.getLogger(name).setLevel(level.upper())
+
+    if _listener is not None:
+        _listener.stop()
+
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter() if config['LOG_FORMAT'] == 'json' else TextFormatter())
+
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    handler = _PreparedQueueHandler(log_queue)
+    rates = {name: float(rate) for name, rate in _parse_mapping(config['LOG_SAMPLING']).items()}
+    handler.addFilter(SamplingFilter(rates))
+
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+
+    _listener = QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+
+
+@atexit.register
+def _flush_logs() -> None:
+    # Дописываем записи, оставшиеся в очереди, при завершении процесса
+    if _listener is not None:
+        _listener.stop()
+
+
+def _restart_after_fork() -> None:
+    # Поток записи не переживает fork (gunicorn --preload): в дочернем процессе
+    # старую очередь бросаем и поднимаем новую со своим потоком
+    global _listener
+    if _listener is not None:
+        _listener = None
+        configure_logging(_config)
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_restart_after_fork)
@@ -1,5 +1,27 @@
 from datetime import datetime
 from app import db
+
+# Допустимые статусы бита
+BEAT_STATUSES = ('in_progress', 'completed', 'failed')
+
+
+def default_available_generations(context):
+    """Новый пользователь получает столько генераций, сколько дает его тариф"""
+    plan_id = context.get_current_parameters().get('subscription_plan_id') or 1
+    max_generations = context.connection.scalar(
+        db.select(SubscriptionPlan.max_generations).where(SubscriptionPlan.id == plan_id)
+    )
+    return max_generations or 0
+
+
+def normalize_email(email):
+    """Email для поиска и уникальности: без пробелов по краям и в нижнем регистре"""
+    return (email or '').strip().lower()
+
+
+def default_email_normalized(context):
+    return normalize_email(context.get_current_parameters().get('email'))
+
 # Модель пользователя
 
 class User(db.Model):
@@ -7,18 +29,41 @@ class User(db.Model):
 
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(120), unique=True, nullable=False)
-    password = db.Column(db.String(128), nullable=False)
+    email_normalized = db.Column(db.String(120), nullable=False, default=default_email_normalized)  # Для поиска по email без учета регистра
+    password = db.Column(db.String(255), nullable=False)  # Хеш werkzeug вместе с методом и солью
     subscription_plan_id = db.Column(db.Integer, db.ForeignKey('subscription_plans.id'), nullable=False, default=1)  # Связь с тарифом
     subscription_plan = db.relationship('SubscriptionPlan', backref='users')  # Объект подписки
     total_generations = db.Column(db.Integer, default=0)  # Всего сгенерированных битов
-    current_generating_beats = db.Column(db.JSON, default=[])  # Список ID битов, которые сейчас генерируются
-    successful_generated_beats = db.Column(db.JSON, default=[])  # Список ID успешно сгенерированных битов
+    available_generations = db.Column(db.Integer, nullable=False, default=default_available_generations, server_default='0')  # Оставшиеся генерации
     is_verified = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('ux_users_email_normalized', 'email_normalized', unique=True),  # Поиск в /auth, один аккаунт на адрес
+        db.Index('ix_users_created_at', 'created_at'),  # Подхват новых регистраций фильтром email
+    )
+
+    def beat_ids(self, status):
+        return user_beat_ids(self.id, status)
+
+    @property
+    def current_generating_beats(self):
+        return self.beat_ids('in_progress')  # Список ID битов, которые сейчас генерируются
+
+    @property
+    def successful_generated_beats(self):
+        return self.beat_ids('completed')  # Список ID успешно сгенерированных битов
+
     def __repr__(self):
         return f"<User id={self.id}, email={self.email}, subscription_plan={self.subscription_plan.name}>"
 
+
+def user_beat_ids(user_id, status):
+    """ID битов пользователя с данным статусом (индекс ix_beats_user_status)"""
+    rows = db.session.query(Beat.id).filter(Beat.user_id == user_id, Beat.status == status).order_by(Beat.id)
+    return [row.id for row in rows]
+
+
 # Модель подписки
 class SubscriptionPlan(db.Model):
     __tablename__ = 'subscription_plans'
@@ -38,12 +83,33 @@ class Beat(db.Model):
     __tablename__ = 'beats'
 
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)  # Владелец бита
-    task_id = db.Column(db.String(120), unique=True, nullable=False)  # ID задачи в API генерации
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)  # Владелец бита (None - бит в пуле жанра)
+    task_id = db.Column(db.String(120), nullable=True)  # ID задачи в API генерации (общий для пары битов; None - задача в очереди)
+    job_id = db.Column(db.Integer, db.ForeignKey('generation_jobs.id'), nullable=True)  # Задание очереди генерации, создавшее бит
     genre = db.Column(db.String(50), nullable=False)  # Жанр бита
-    status = db.Column(db.String(50), nullable=False, default='in_progress')  # Статус (in_progress, completed, failed)
+    status = db.Column(db.Enum(*BEAT_STATUSES, name='beat_status'), nullable=False, default='in_progress')  # Статус (in_progress, completed, failed)
+    title = db.Column(db.String(255), nullable=True)  # Название трека
     url = db.Column(db.String(255), nullable=True)  # Ссылка на сгенерированный бит
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)  # Время создания бита
+    image_url = db.Column(db.String(255), nullable=True)  # Ссылка на обложку
+    audio_asset_id = db.Column(db.Integer, db.ForeignKey('media_assets.id'), nullable=True)  # Локальная копия трека (media_worker.py)
+    image_asset_id = db.Column(db.Integer, db.ForeignKey('media_assets.id'), nullable=True)  # Локальная копия обложки
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # Время создания бита
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)  # Время последнего изменения
+
+    audio_asset = db.relationship('MediaAsset', foreign_keys=[audio_asset_id])
+    image_asset = db.relationship('MediaAsset', foreign_keys=[image_asset_id])
+
+    __table_args__ = (
+        db.Index('ix_beats_user_status', 'user_id', 'status', 'created_at', 'id'),  # Биты пользователя по статусу (страницы)
+        db.Index('ix_beats_user_created', 'user_id', 'created_at', 'id'),  # Страницы /beats/list
+        db.Index('ix_beats_user_updated', 'user_id', 'updated_at', 'id'),  # Изменения после курсора since
+        db.Index('ix_beats_user_genre_status', 'user_id', 'genre', 'status'),  # Пул жанра (user_id IS NULL)
+        db.Index('ix_beats_task_user', 'task_id', 'user_id'),  # Биты задачи генерации
+        db.Index('ix_beats_status', 'status'),  # Обход in_progress фоновым сверщиком
+        db.Index('ix_beats_job', 'job_id'),  # Биты задания очереди генерации
+        db.Index('ix_beats_audio_asset', 'audio_asset_id', 'status'),  # Готовые биты без локальной копии
+        db.Index('ix_beats_image_asset', 'image_asset_id'),
+    )
 
     def __repr__(self):
         return f"<Beat id={self.id}, user_id={self.user_id}, genre={self.genre}, status={self.status}>"
@@ -59,6 +125,7 @@ class GenrePrompt(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     genre = db.Column(db.String(100), unique=True, nullable=False)  # Название жанра
     prompt = db.Column(db.Text, nullable=False)  # Длинный текстовый промпт
+    pool_target = db.Column(db.Integer, nullable=True)  # Сколько свободных битов держать в пуле (None - GENRE_POOL_TARGET)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)  # Дата создания
 
     def __repr__(self):
@@ -69,6 +136,99 @@ class VerificationCode(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     code = db.Column(db.String(6), nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False)  # После этого код не принимается и удаляется фоновой очисткой
+    attempts = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # Неверных вводов этого кода
 
     user = db.relationship('User', backref=db.backref('verification_codes', lazy=True))
+
+    __table_args__ = (
+        db.Index('ix_verification_code_user_created', 'user_id', 'created_at'),  # Последний код пользователя
+        db.Index('ix_verification_code_expires', 'expires_at'),  # Очистка истекших кодов
+    )
+
+
+class OutboundEmail(db.Model):
+    """
+    Очередь исходящих писем; отправляет mail_worker.py
+    """
+    __tablename__ = 'outbound_emails'
+
+    id = db.Column(db.Integer, primary_key=True)
+    recipient = db.Column(db.String(120), nullable=False)
+    subject = db.Column(db.String(255), nullable=False)
+    body = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # Статус (pending, sent, failed)
+    attempts = db.Column(db.Integer, nullable=False, default=0)  # Сколько раз пытались отправить
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # Когда пробовать снова
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_outbound_emails_status_next_attempt', 'status', 'next_attempt_at'),
+    )
+
+    def __repr__(self):
+        return f"<OutboundEmail id={self.id}, recipient={self.recipient}, status={self.status}>"
+
+
+class GenerationJob(db.Model):
+    """
+    Очередь заданий генерации; задания выполняет generation_worker.py
+    """
+    __tablename__ = 'generation_jobs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)  # Заказчик (None - пополнение пула)
+    genre = db.Column(db.String(50), nullable=False)
+    prompt = db.Column(db.Text, nullable=False)  # Промпт на момент постановки в очередь
+    idempotency_key = db.Column(db.String(120), unique=True, nullable=False)  # Повтор запроса с тем же ключом не создает задание
+    status = db.Column(db.String(20), nullable=False, default='pending')  # Статус (pending, running, done, dead)
+    priority = db.Column(db.Integer, nullable=False, default=0)  # Приоритет тарифа в очереди к API (меньше - раньше)
+    attempts = db.Column(db.Integer, nullable=False, default=0)  # Сколько раз задание брали в работу
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # Когда пробовать снова
+    locked_until = db.Column(db.DateTime, nullable=True)  # До какого времени задание занято воркером
+    task_id = db.Column(db.String(120), nullable=True)  # ID задачи в API генерации после успешного запуска
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    beats = db.relationship('Beat', backref='job', lazy=True, order_by='Beat.id')
+
+    __table_args__ = (
+        db.Index('ix_generation_jobs_status_next_attempt', 'status', 'next_attempt_at'),
+    )
+
+    def __repr__(self):
+        return f"<GenerationJob id={self.id}, genre={self.genre}, status={self.status}>"
+
+
+class MediaAsset(db.Model):
+    """
+    Локальная копия трека или обложки с CDN API генерации; скачивает media_worker.py.
+    Файл лежит в хранилище под ключом sha256 содержимого (app/services/media_store.py).
+    """
+    __tablename__ = 'media_assets'
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(10), nullable=False)  # audio или image
+    source_url = db.Column(db.String(255), nullable=False)  # Откуда скачивается (Beat.url / Beat.image_url)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, stored, failed, evicted
+    sha256 = db.Column(db.String(64), nullable=True)  # Ключ файла в хранилище
+    size = db.Column(db.BigInteger, nullable=True)  # Размер файла, байт
+    content_type = db.Column(db.String(100), nullable=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)  # Сколько раз файл брали в работу
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # Когда пробовать снова
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_accessed_at = db.Column(db.DateTime, nullable=True)  # Для вытеснения редко запрашиваемых файлов (LRU)
+
+    __table_args__ = (
+        db.Index('ix_media_assets_status_next_attempt', 'status', 'next_attempt_at'),
+        db.Index('ix_media_assets_status_accessed', 'status', 'last_accessed_at'),
+        db.Index('ix_media_assets_sha256', 'sha256'),
+    )
+
+    def __repr__(self):
+        return f"<MediaAsset id={self.id}, kind={self.kind}, status={self.status}>"
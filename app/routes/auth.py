@@ -1,56 +1,91 @@
+import logging
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity, create_refresh_token
-from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy.exc import IntegrityError
+from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity, create_refresh_token, current_user
 from app import db
-from app.services.auth_service import generate_verification_code, send_verification_email
-from app.models import User, VerificationCode
+from app.database import read_only
+from app.services.auth_service import CODE_LOCKED, CODE_OK, check_verification_code, issue_verification_code
+from app.models import User, normalize_email, user_beat_ids
+from app.services.email_index import email_index
+from app.services.passwords import PasswordHashingBusy, hasher
+from app.services.rate_limit import rate_limited, user_key
 
 
 bp = Blueprint('auth', __name__, url_prefix='/auth')
+logger = logging.getLogger(__name__)
+
+
+@bp.errorhandler(PasswordHashingBusy)
+def password_hashing_busy(e):
+    # Хеширование перегружено: отказываем сразу, а не копим потоки, ждущие пула
+    logger.warning("Password hashing rejected: %s", e)
+    response = jsonify({"msg": "Service is busy, try again later"})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+def find_user(email, use_filter=False):
+    """
+    Пользователь по email без учета регистра (индекс ux_users_email_normalized).
+
+    С use_filter=True в базу не ходит, если фильтр Блума говорит, что такого email нет.
+    Фильтр отстает от регистраций в других процессах, поэтому так можно только там,
+    где ложное "нет" безвредно: check-email и предпроверка в register.
+    """
+    if not email:
+        return None
+    if use_filter and not email_index.might_exist(email):
+        return None
+    return User.query.filter_by(email_normalized=normalize_email(email)).first()
+
 
 # Регистрация нового пользователя
 @bp.route('/register', methods=['POST'])
+@rate_limited('auth:register', 'RATE_LIMIT_REGISTER')
 def register():
     data = request.get_json()
     email = data.get('email')
     password = data.get('password')
 
-    print(email, password)
-    if User.query.filter_by(email=email).first():
+    # Гонку двух регистраций и отставание фильтра в других процессах ловит уникальный индекс
+    if find_user(email, use_filter=True):
         return jsonify({"msg": "User already exists"}), 400
 
-    hashed_password = generate_password_hash(password)
+    hashed_password = hasher.hash(password)
     new_user = User(email=email, password=hashed_password)
     db.session.add(new_user)
-    db.session.commit()
-
-    # Генерация и отправка кода подтверждения
-    verification_code = generate_verification_code()
-    send_verification_email(email, verification_code)
+    try:
+        db.session.flush()  # Нужен id пользователя для кода подтверждения
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({"msg": "User already exists"}), 400
 
-    # Сохраняем код подтверждения в базе данных
-    verification_entry = VerificationCode(user_id=new_user.id, code=verification_code)
-    db.session.add(verification_entry)
+    # Пользователь, код подтверждения и письмо в очереди сохраняются одной транзакцией;
+    # письмо отправит mail_worker.py
+    issue_verification_code(new_user.id, email)
     db.session.commit()
+    email_index.add(email)
 
     return jsonify({"msg": "User created successfully, verification code sent to email"}), 201
 
 
 @bp.route('/login', methods=['POST'])
+@rate_limited('auth:login', 'RATE_LIMIT_LOGIN')
 def login():
     data = request.get_json()
     email = data.get('email')
     password = data.get('password')
-    print(email, password)
     # Проверяем, есть ли пользователь с таким email
-    user = User.query.filter_by(email=email).first()
+    user = find_user(email)
     if not user:
         return jsonify({"message": "User not found"}), 404
 
-    print(user.password, password)
-    if not check_password_hash(user.password, password):
+    if not hasher.verify(user.password, password):
         return jsonify({"message": "Incorrect password"}), 401
 
+    # Хеш со старыми параметрами пересчитываем, пока пароль известен
+    if hasher.rehash_if_needed(user, password):
+        db.session.commit()
+
     # Генерация access_token и refresh_token
     access_token = create_access_token(identity=str(user.id))
     refresh_token = create_refresh_token(identity=str(user.id))
@@ -71,21 +106,25 @@ def logout():
 
 #типизировать и обработать отеты и оптимизировать
 @bp.route('/user', methods=['GET'])
+@read_only
 @jwt_required()  # Требуется авторизация
 def get_user():
-    current_user_id = get_jwt_identity()
-    if current_user_id is None:
-        return jsonify({"msg": "Token is invalid"}), 422
-    user = User.query.get(current_user_id)
-    if not user:
+    # Email и тариф берутся из снимка current_user, из базы читаются только счетчики
+    counters = (
+        db.session.query(User.total_generations, User.available_generations)
+        .filter(User.id == current_user.id)
+        .first()
+    )
+    if not counters:
         return jsonify({"msg": "User not found"}), 404
 
     return jsonify({
-        "email": user.email,
-        "subscription_plan": user.subscription_plan.name,
-        "total_generations": user.total_generations,
-        "current_generating_beats": user.current_generating_beats,
-        "successful_generated_beats":user.successful_generated_beats
+        "email": current_user.email,
+        "subscription_plan": current_user.plan_name,
+        "total_generations": counters.total_generations,
+        "available_generations": counters.available_generations,
+        "current_generating_beats": user_beat_ids(current_user.id, 'in_progress'),
+        "successful_generated_beats": user_beat_ids(current_user.id, 'completed')
     }), 200
 
 
@@ -100,22 +139,23 @@ def refresh_token():
 
 
 @bp.route('/verify-email', methods=['POST'])
+@rate_limited('auth:verify_email', 'RATE_LIMIT_VERIFY_EMAIL')
 def verify_email():
     data = request.get_json()
     email = data.get('email')
     verification_code = data.get('verification_code')
 
     # Проверяем, существует ли пользователь с таким email
-    user = User.query.filter_by(email=email).first()
+    user = find_user(email)
     if not user:
         return jsonify({"msg": "User not found"}), 404
 
-    # Проверяем, существует ли код подтверждения для этого пользователя
-    print(user.id)
-    verification_entry = VerificationCode.query.filter_by(user_id=user.id, code=verification_code).first()
-    print(f'code {verification_entry}, {type(verification_entry)}')
-    if not verification_entry:
-
+    # Сверяем с последним выданным кодом; неверный ввод засчитывается в attempts
+    result = check_verification_code(user.id, verification_code)
+    if result == CODE_LOCKED:
+        return jsonify({"msg": "Too many attempts, request a new verification code"}), 429
+    if result != CODE_OK:
+        db.session.commit()
         return jsonify({"msg": "Invalid or expired verification code"}), 400
 
     # Подтверждаем почту, устанавливаем флаг is_verified в True
@@ -124,8 +164,27 @@ def verify_email():
     return jsonify({"msg": "Successfully sent"}), 200
 
 
+@bp.route('/resend-verification', methods=['POST'])
+@rate_limited('auth:resend_verification', 'RATE_LIMIT_RESEND_VERIFICATION')
+def resend_verification():
+    data = request.get_json()
+    email = data.get('email')
+
+    user = find_user(email)
+    if not user:
+        return jsonify({"msg": "User not found"}), 404
+    if user.is_verified:
+        return jsonify({"msg": "Email already verified"}), 400
+
+    # Новый код заменяет прежние: старый перестает приниматься сразу
+    issue_verification_code(user.id, user.email)
+    db.session.commit()
+    return jsonify({"msg": "Verification code sent to email"}), 200
+
+
 @bp.route('/change-password', methods=['POST'])
 @jwt_required()  # Требуется авторизация
+@rate_limited('auth:change_password', 'RATE_LIMIT_CHANGE_PASSWORD', user_key)
 def change_password():
     data = request.get_json()
     current_password = data.get('current_password')
@@ -138,22 +197,23 @@ def change_password():
     if new_password != confirm_new_password:
         return jsonify({"msg": "New passwords do not match"}), 400
 
-    current_user_id = get_jwt_identity()
-    user = User.query.get(current_user_id)
+    user = db.session.get(User, current_user.id)
 
     if not user:
         return jsonify({"msg": "User not found"}), 404
 
-    if not check_password_hash(user.password, current_password):
+    if not hasher.verify(user.password, current_password):
         return jsonify({"msg": "Current password is incorrect"}), 401
 
-    user.password = generate_password_hash(new_password)
+    user.password = hasher.hash(new_password)
     db.session.commit()
 
     return jsonify({"msg": "Password updated successfully"}), 200
 
 
 @bp.route('/check-email', methods=['POST'])
+@rate_limited('auth:check_email', 'RATE_LIMIT_CHECK_EMAIL')
+@read_only
 def check_email():
     """
     Проверяет, существует ли пользователь с указанным email.
@@ -170,7 +230,7 @@ def check_email():
             return jsonify({"msg": "Email is required"}), 400
 
         # Ищем пользователя по email
-        user = User.query.filter_by(email=email).first()
+        user = find_user(email, use_filter=True)
 
         if user:
             return jsonify({"exists": True, "is_verified": user.is_verified}), 200
@@ -178,11 +238,6 @@ def check_email():
             return jsonify({"exists": False}), 200
 
     except Exception as e:
-        print(f"Error: {e}")
-        return jsonify({"msg": "Internal server error"}), 500
-
-
-    except Exception as e:
-        print(f"Error: {e}")
+        logger.exception("Error in check_email: %s", e)
         return jsonify({"msg": "Internal server error"}), 500
 
@@ -1,277 +1,404 @@
 import logging
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from datetime import datetime, timezone
+from flask import Blueprint, request, jsonify, current_app, redirect, send_file, Response, stream_with_context
+from sqlalchemy.exc import IntegrityError
+from flask_jwt_extended import jwt_required, get_jwt_identity, current_user
 from app import db
-from app.models import User, GenrePrompt, Beat
+from app.database import read_only
+from app.models import Beat, GenerationJob, MediaAsset
 from app.services.beat_service import *
 from typing import Dict, Any, Union
-from random_word import RandomWords
+from app.services.beat_completion import extract_completed_tracks, apply_completion
+from app.services.beat_pool import claim_pool_beat
+from app.services.genre_catalog import get_catalog, get_genre_prompt
+from app.services.beat_listing import parse_fields, list_beats, list_changed_beats
+from app.services import beat_service, quota
+from app.services.events import events
+from app.services.generation_queue import enqueue_generation, find_job
+from app.services.media_mirror import requeue, touch
+from app.services.media_store import media_storage
+from app.services.rate_limit import plan_priority, rate_limited, user_key
+import json
+import time
+import hashlib
+import hmac
 import os
 
 bp = Blueprint('beats', __name__, url_prefix='/beats')
 TOKEN = os.getenv("LOVEAI_API_TOKEN")
 
-# Настройка логирования
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+
+@bp.record_once
+def _warn_unsigned_callbacks(state) -> None:
+    if not beat_service.CALLBACK_SECRET:
+        logger.warning("LOVEAI_CALLBACK_SECRET is not set: /beats/callback will reject all callbacks")
+
 @bp.route('/create-by-genre', methods=['POST'])
 @jwt_required()
+@rate_limited('create', 'RATE_LIMIT_CREATE_BEAT', user_key)
 def create_beat_by_genre() -> Any:
     """
     Создает биты на основе указанного жанра.
+
+    Бит выдается из пула жанра или ставится в очередь генерации (generation_worker.py);
+    запрос к API генерации в обработчике не выполняется. Повтор запроса с тем же
+    заголовком Idempotency-Key возвращает уже созданное задание.
     """
-    print("Entering create_beat_by_genre")
     try:
-        current_user_id: int = get_jwt_identity()
-        print(f"Current user ID: {current_user_id}")
-        user: Union[User, None] = db.session.get(User, current_user_id)
-        if not user:
-            print(f"User with id {current_user_id} not found.")
-            logger.warning(f"User with id {current_user_id} not found.")
-            return jsonify({"msg": "User not found"}), 404
-
-        # Проверяем, есть ли у пользователя доступные генерации
-        if user.available_generations <= 0:
-            print(f"User with id {current_user_id} has no available generations.")
-            logger.warning(f"User with id {current_user_id} has no available generations.")
-            return jsonify({"msg": "No available generations left. Please purchase a generation package."}), 403
+        current_user_id: int = current_user.id
 
         data: Dict[str, Any] = request.get_json()
-        print(f"Request data: {data}")
         genre: Union[str, None] = data.get("genre")
 
         if not genre:
-            print("Genre is required in the request body.")
-            logger.warning(f"Genre is required in the request body.")
+            logger.warning("Genre is required in the request body.")
             return jsonify({"msg": "Genre is required"}), 400
 
-        existing_genre: Union[GenrePrompt, None] = GenrePrompt.query.filter_by(genre=genre).first()
-        if not existing_genre:
-            print(f"Invalid genre: {genre}")
-            logger.warning(f"Invalid genre: {genre}")
+        genre_prompt: Union[str, None] = get_genre_prompt(genre)
+        if genre_prompt is None:
+            logger.warning("Invalid genre: %s", genre)
             return jsonify({"msg": "Invalid genre"}), 400
 
-        # Проверяем существующие биты без привязки к пользователю с таким жанром
-        existing_beat_no_user = Beat.query.filter_by(user_id=None, genre=genre).first()
+        idempotency_key: Union[str, None] = None
+        if request.headers.get('Idempotency-Key'):
+            idempotency_key = f"user:{current_user_id}:{request.headers['Idempotency-Key'][:80]}"
+            existing_job = find_job(idempotency_key)
+            if existing_job:
+                return jsonify(_job_response(existing_job, "Beat generation already queued")), 200
 
-        if existing_beat_no_user:
-            print(f"Existing beat found without user, status: {existing_beat_no_user.status}")
-            if existing_beat_no_user.status in ["completed", "in_progress"]:
-                existing_beat_no_user.user_id = user.id
+        # Резервируем генерацию до любых действий; при неудаче резерв возвращается
+        if not quota.reserve(current_user_id):
+            logger.warning("User with id %s has no available generations.", current_user_id)
+            return jsonify({"msg": "No available generations left. Please purchase a generation package."}), 403
+
+        try:
+            # Сначала пробуем атомарно забрать готовый или генерирующийся бит из пула жанра;
+            # выдача и списание генерации коммитятся вместе, release откатывает обе
+            pool_beat = claim_pool_beat(current_user_id, genre)
+            if pool_beat:
+                quota.confirm(current_user_id)
                 db.session.commit()
-                print(f"Assigned existing beat with task_id {existing_beat_no_user.task_id} to user {current_user_id}.")
-                logger.info(f"Assigned existing beat with task_id {existing_beat_no_user.task_id} to user {current_user_id}.")
+                logger.info("Assigned pool beat %s to user %s.", pool_beat.id, current_user_id)
                 return jsonify({
                     "msg": "Beat found without user, now assigned to you.",
-                    "beat_id": existing_beat_no_user.id
+                    "beat_id": pool_beat.id
                 }), 200
 
-        # Генерация нового бита, если такого бита не было найдено
-        print(f"Generating beat for genre: {genre}")
-        status, answer = generate_beat_by_genre(TOKEN, existing_genre.prompt)
-        print(f"Response from generate_beat_by_genre: {status}, {answer}")
-
-        task_id: Union[str, None] = answer.get("task_id")
-
-        if not task_id:
-            print(f"Failed to generate beat for genre: {genre}")
-            logger.error(f"Failed to generate beat for genre: {genre}")
-            return jsonify({"msg": "Failed to generate beat"}), 500
-
-        # Здесь вызываем функцию для получения статуса бита по task_id
-        print(f"Fetching beat status for task_id: {task_id}")
-
-
-        new_beat_user = Beat(
-            user_id=user.id,
-            task_id=task_id,
-            genre=genre,
-            status="in_progress",
-            created_at=datetime.now(timezone.utc).isoformat()
-        )
-
-        new_beat_no_user = Beat(
-            user_id=None,
-            task_id=task_id,
-            genre=genre,
-            status="in_progress",
-            created_at=datetime.now(timezone.utc).isoformat()
-        )
-
-        db.session.add(new_beat_user)
-        db.session.add(new_beat_no_user)
-        db.session.commit()
-
-        user.available_generations -= 1
-        db.session.commit()
-
-        print(f"Started beat generation for user {current_user_id} with genre {genre}.")
-        logger.info(f"Started beat generation for user {current_user_id} with genre {genre}.")
-        return jsonify({
-            "msg": "Beat generation started",
-            "user_beat_id": new_beat_user.id,
-            "no_user_beat_id": new_beat_no_user.id
-        }), 201
+            # Задание и списание генерации сохраняются одной транзакцией;
+            # запросы к API пойдут в очередь с приоритетом тарифа пользователя
+            priority = plan_priority(current_user.plan_name)
+            job = enqueue_generation(current_user_id, genre, genre_prompt, idempotency_key, priority)
+            quota.confirm(current_user_id)
+            db.session.commit()
+        except IntegrityError as e:
+            # release откатывает транзакцию и возвращает резерв
+            quota.release(current_user_id)
+            # Параллельный запрос с тем же Idempotency-Key успел создать задание
+            existing_job = find_job(idempotency_key) if idempotency_key else None
+            if existing_job:
+                return jsonify(_job_response(existing_job, "Beat generation already queued")), 200
+            logger.warning("Generation request of user %s conflicted: %s", current_user_id, e.orig)
+            return jsonify({"msg": "Conflicting request, please retry"}), 409
+        except Exception:
+            quota.release(current_user_id)
+            raise
+
+        logger.info("Queued generation job %s for user %s with genre %s.", job.id, current_user_id, genre)
+        return jsonify(_job_response(job, "Beat generation queued")), 201
 
     except Exception as e:
-        print(f"Error in create_beat_by_genre: {e}")
-        logger.error(f"Error in create_beat_by_genre: {e}")
+        logger.exception("Error in create_beat_by_genre: %s", e)
         return jsonify({"msg": "Internal server error"}), 500
 
 
+def _job_response(job: GenerationJob, msg: str) -> Dict[str, Any]:
+    # Бит задания, ушедший в пул, мог уже забрать другой пользователь: его id не отдаем
+    user_beat_id = next((beat.id for beat in job.beats if beat.user_id == job.user_id), None)
+    pool_beat_id = next((beat.id for beat in job.beats if beat.user_id is None), None)
+    return {
+        "msg": msg,
+        "job_id": job.id,
+        "user_beat_id": user_beat_id,
+        "no_user_beat_id": pool_beat_id,
+    }
+
+
+# Статус задания очереди генерации (pending, running, done, dead)
+@bp.route('/jobs/<int:job_id>', methods=['GET'])
+@jwt_required()
+def get_generation_job(job_id: int):
+    job = GenerationJob.query.filter_by(id=job_id, user_id=int(get_jwt_identity())).first()
+    if not job:
+        return jsonify({"msg": "Job not found"}), 404
+
+    return jsonify({
+        "job_id": job.id,
+        "status": job.status,
+        "attempts": job.attempts,
+        "beat_ids": [beat.id for beat in job.beats if beat.user_id in (job.user_id, None)],
+        "error": job.last_error if job.status == 'dead' else None,
+    }), 200
+
+
+def _serve_media(beat_id: int, kind: str):
+    """
+    Отдает локальную копию трека или обложки: с диска через send_file (Range, ETag,
+    sendfile в gunicorn), из S3 - редиректом на временную ссылку. Пока копии нет
+    или она вытеснена, редиректит на CDN API генерации.
+    """
+    beat = db.session.get(Beat, beat_id)
+    if beat is None or beat.user_id != current_user.id:
+        return jsonify({"msg": "Beat not found"}), 404
+
+    asset_id, source_url = (beat.audio_asset_id, beat.url) if kind == 'audio' else (beat.image_asset_id, beat.image_url)
+    asset = db.session.get(MediaAsset, asset_id) if asset_id else None
+
+    if asset is not None and asset.status == 'stored':
+        touch(asset)
+        path = media_storage.local_path(asset.sha256)
+        if path:
+            # Содержимое по ключу sha256 не меняется: сильный ETag и долгий кэш у клиента
+            response = send_file(
+                path,
+                mimetype=asset.content_type or ('audio/mpeg' if kind == 'audio' else 'image/jpeg'),
+                conditional=True,
+                etag=asset.sha256,
+                last_modified=asset.created_at,
+                max_age=current_app.config['MEDIA_CACHE_MAX_AGE'],
+            )
+            response.cache_control.public = False
+            response.cache_control.private = True
+            response.cache_control.immutable = True
+            response.headers.setdefault('Accept-Ranges', 'bytes')
+            return response
+        url = media_storage.presigned_url(asset.sha256, asset.content_type)
+        if url:
+            return redirect(url)
+        # Строка stored, а файла на диске нет: копируем заново
+        logger.warning("Stored media asset %s is missing from the store, requeueing", asset.id)
+
+    if asset is not None and asset.status in ('evicted', 'stored'):
+        requeue(asset)
+    if not source_url:
+        return jsonify({"msg": "Media not available"}), 404
+    return redirect(source_url)
+
+
+# Трек бита из локального хранилища (поддерживает Range для перемотки)
+@bp.route('/<int:beat_id>/audio', methods=['GET'])
+@jwt_required()
+def get_beat_audio(beat_id: int):
+    return _serve_media(beat_id, 'audio')
+
+
+# Обложка бита из локального хранилища
+@bp.route('/<int:beat_id>/cover', methods=['GET'])
+@jwt_required()
+def get_beat_cover(beat_id: int):
+    return _serve_media(beat_id, 'image')
+
+
 @bp.route('/list', methods=['GET'])
+@read_only
 @jwt_required()
 def get_beats_list():
     """
-    Возвращает список битов пользователя.
+    Возвращает страницу битов пользователя.
+
+    Параметры запроса:
+        limit: размер страницы (по умолчанию BEATS_PAGE_SIZE, не больше BEATS_PAGE_MAX).
+        cursor: next_cursor из предыдущей страницы.
+        status: только биты с этим статусом (in_progress, completed, failed).
+        fields: поля через запятую, например fields=id,url,name.
+        since: курсор изменений; вместо страницы возвращает биты, измененные после него
+            (since=0 - с самого начала), и новый since для следующего запроса.
     """
-    print("Entering get_beats_list")
     try:
         current_user_id = get_jwt_identity()
-        print(f"Current user ID: {current_user_id}")
-        user = db.session.get(User, current_user_id)
-
-        if not user:
-            print(f"User with id {current_user_id} not found.")
-            logger.warning(f"User with id {current_user_id} not found.")
-            return jsonify({"msg": "User not found"}), 404
-
-        user_beats = Beat.query.filter_by(user_id=user.id).all()
-        print(f"User beats: {user_beats}")
-
-        completed_beats = [
-            {
-                "id": beat.id,
-                "genre": beat.genre,
-                "url": beat.url,
-                "name": beat.title,
-                "created_at": beat.created_at.isoformat(),
-                "img_url": beat.image_url,
-            }
-            for beat in user_beats if beat.status == "completed"
-        ]
-
-        in_progress_beats = [
-            {
-                "id": beat.id,
-                "genre": beat.genre,
-                "created_at": beat.created_at.isoformat()
-            }
-            for beat in user_beats if beat.status == "in_progress"
-        ]
-
-        print(f"Completed beats: {completed_beats}")
-        print(f"In-progress beats: {in_progress_beats}")
-
-        logger.info(f"Fetched beats list for user {current_user_id}.")
-        return jsonify({
-            "completed": completed_beats,
-            "in_progress": in_progress_beats
-        }), 200
+        config = current_app.config
+        limit = min(request.args.get('limit', config['BEATS_PAGE_SIZE'], type=int), config['BEATS_PAGE_MAX'])
+        if limit <= 0:
+            return jsonify({"msg": "limit must be positive"}), 400
+
+        try:
+            fields = parse_fields(request.args.get('fields'))
+            since = request.args.get('since')
+            if since is not None:
+                items, next_since, has_more = list_changed_beats(current_user_id, fields, limit, since)
+                return jsonify({"items": items, "since": next_since, "has_more": has_more}), 200
+
+            items, next_cursor = list_beats(
+                current_user_id, fields, limit,
+                status=request.args.get('status'),
+                cursor=request.args.get('cursor'),
+            )
+        except ValueError as e:
+            return jsonify({"msg": str(e)}), 400
+
+        return jsonify({"items": items, "next_cursor": next_cursor}), 200
 
     except Exception as e:
-        print(f"Error in get_beats_list: {e}")
-        logger.error(f"Error in get_beats_list: {e}")
+        logger.exception("Error in get_beats_list: %s", e)
         return jsonify({"msg": "Internal server error"}), 500
 
 
 @jwt_required()
 @bp.route('/genres', methods=['GET'])
+@read_only
 def get_genres():
     """
-    Возвращает список всех жанров из таблицы GenrePrompt.
+    Возвращает список всех жанров из кэша каталога GenrePrompt.
+    Поддерживает If-None-Match: при неизменном каталоге отвечает 304 без тела.
     """
-    print("Entering get_genres")
     try:
-        genres = GenrePrompt.query.all()
-        print(f"Genres found: {genres}")
+        catalog = get_catalog()
 
-        genre_list = [{"id": genre.id, "genre": genre.genre} for genre in genres]
-
-        print(f"Genre list: {genre_list}")
-        logger.info("Fetched genres list.")
-        return jsonify(genre_list), 200
+        response = jsonify(catalog["genres"])
+        response.set_etag(catalog["etag"])
+        response.cache_control.no_cache = True  # Клиент всегда перепроверяет ETag
+        return response.make_conditional(request)
 
     except Exception as e:
-        print(f"Error in get_genres: {e}")
-        logger.error(f"Error in get_genres: {e}")
+        logger.exception("Error in get_genres: %s", e)
         return jsonify({"msg": "Internal server error"}), 500
 
 
 
 def generate_random_word() -> str:
     try:
+        # random_word тяжелый и нужен редко, импортируем только при вызове
+        from random_word import RandomWords
+
         r = RandomWords()
         word = r.get_random_word()
-        logger.info(f"Generated random word: {word}")
+        logger.info("Generated random word: %s", word)
         return word
     except Exception as e:
-        logger.error(f"Error generating random word: {e}")
+        logger.error("Error generating random word: %s", e)
         return "default"
 
-# Endpoint для получения всех битов с статусом "in_progress" для текущего пользователя
+# Endpoint для получения всех битов с статусом "in_progress" для текущего пользователя.
+# Сами статусы обновляет фоновый процесс reconciler.py, здесь только чтение из базы.
 @bp.route('/update-beats', methods=['GET'])
 @jwt_required()  # Требуется JWT токен
 def update_beats():
     current_user_id = get_jwt_identity()  # Извлекаем ID текущего пользователя
-    logger.info(f"Current user ID: {current_user_id}")
 
-    user = db.session.get(User, current_user_id)  # Получаем пользователя из базы данных
+    in_progress_ids = [
+        row.id for row in
+        db.session.query(Beat.id).filter_by(user_id=current_user_id, status='in_progress').all()
+    ]
 
-    if not user:
-        logger.warning(f"User with ID {current_user_id} not found.")
-        return jsonify({"msg": "User not found"}), 404
+    if not in_progress_ids:
+        logger.debug("No beats found in progress for user %s", current_user_id)
+        return jsonify({"msg": "No beats found in progress"}), 404
 
-    beats = Beat.query.filter_by(user_id=current_user_id, status='in_progress').all()  # Все биты с таким статусом
-    logger.info(f"Found {len(beats)} beats with status 'in_progress' for user {current_user_id}")
+    return jsonify({"msg": "Beats updated successfully", "in_progress": in_progress_ids}), 200
 
-    if not beats:
-        logger.info(f"No beats found in progress for user {current_user_id}")
-        return jsonify({"msg": "No beats found in progress"}), 404
 
-    for beat in beats:
-        logger.info(f"Processing beat with task_id: {beat.task_id}")
-
-        # Получаем информацию по каждому биту через API
-        beat_info = get_beat_by_id(beat.task_id)
-
-        if isinstance(beat_info, dict) and 'output_data' in beat_info:
-            output_data = beat_info['output_data']
-            logger.info(f"Received output_data for beat {beat.task_id}: {output_data}")
-
-            if output_data.get('msg') == 'All generated successfully.' and output_data.get('data'):
-                data = output_data['data']
-                logger.info(f"Generated data for beat {beat.task_id}: {data}")
-
-                # Проверка, что ссылки на аудио и изображения не пустые и длина больше 1 символа
-                if (len(data[0]['audio_url']) > 1 and len(data[1]['audio_url']) > 1 and
-                    len(data[0]['image_url']) > 1 and len(data[1]['image_url']) > 1):
-
-                    # Генерация случайного осмысленного существительного
-                    random_word = generate_random_word()
-                    logger.info(f"Using random word '{random_word}' for updating beat data")
-
-                    # Обновляем данные о бите в базе
-                    beat.title = data[0]['title']
-                    beat.url = data[0]['audio_url']
-                    beat.image_url = data[0]['image_url']
-                    beat.status = 'completed'
-                    logger.info(f"Updated beat {beat.task_id} with title '{beat.title}' and status 'complete'")
-
-                    # Для бита без привязки к пользователю (если существует)
-                    beat_without_user = Beat.query.filter_by(task_id=beat.task_id, user_id=None).first()
-                    if beat_without_user:
-                        beat_without_user.title = data[1]['title']
-                        beat_without_user.url = data[1]['audio_url']
-                        beat_without_user.image_url = data[1]['image_url']
-                        beat_without_user.status = 'completed'
-                        logger.info(f"Updated beat without user (task_id: {beat.task_id}) with title '{beat_without_user.title}'")
-
-                    # Сохраняем изменения
-                    db.session.commit()
-                    logger.info(f"Committed changes to database for beat {beat.task_id}")
-
-    logger.info("Beats update process completed successfully.")
-    return jsonify({"msg": "Beats updated successfully"}), 200
+def _is_valid_callback(raw_body: bytes) -> bool:
+    """
+    Проверяет, что callback пришел от генератора: секрет из callback_url или
+    HMAC-SHA256 подпись тела запроса в заголовке X-Signature.
+    Без LOVEAI_CALLBACK_SECRET callback отклоняется; принять его без проверки можно
+    только в debug-режиме с CALLBACK_ALLOW_UNSIGNED.
+    """
+    secret = beat_service.CALLBACK_SECRET
+    if not secret:
+        return current_app.debug and current_app.config['CALLBACK_ALLOW_UNSIGNED']
+
+    query_secret = request.args.get('secret', '')
+    if query_secret and hmac.compare_digest(query_secret, secret):
+        return True
+
+    signature = request.headers.get('X-Signature', '')
+    expected = hmac.new(secret.encode(), raw_body, hashlib.sha256).hexdigest()
+    return bool(signature) and hmac.compare_digest(signature, expected)
+
+
+# Endpoint, на который API генерации присылает результат задачи (callback_url)
+@bp.route('/callback', methods=['POST'])
+def beat_callback():
+    if not _is_valid_callback(request.get_data()):
+        logger.warning("Rejected beat callback with invalid secret")
+        return jsonify({"msg": "Invalid signature"}), 403
+
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify({"msg": "JSON object is required"}), 400
+    # Генератор присылает либо саму задачу, либо задачу внутри поля data
+    task_info = payload.get('data') if isinstance(payload.get('data'), dict) else payload
+    task_id = task_info.get('task_id')
+    if not task_id:
+        return jsonify({"msg": "task_id is required"}), 400
+
+    if not db.session.query(Beat.id).filter_by(task_id=task_id).first():
+        logger.warning("Callback for unknown task_id %s", task_id)
+        return jsonify({"msg": "Unknown task"}), 404
+
+    tracks = extract_completed_tracks(task_info)
+    if tracks is None:
+        # Промежуточный статус: биты останутся in_progress до следующего callback
+        return jsonify({"msg": "Task is not completed yet"}), 202
+
+    # Повторный callback по уже завершенной задаче ничего не меняет
+    updated = apply_completion(task_id, tracks)
+    return jsonify({"msg": "Beats updated", "updated": updated}), 200
+
+
+@bp.route('/events', methods=['GET'])
+@jwt_required()
+def beat_events():
+    """
+    Поток событий об изменении статусов битов пользователя.
+
+    По умолчанию - Server-Sent Events (event: beat, data: {"beat_id", "status"}).
+    Соединение закрывается через EVENTS_STREAM_MAX секунд, клиент переподключается сам.
+
+    С mode=poll - long-poll: ждет изменений до timeout секунд (не больше EVENTS_POLL_TIMEOUT)
+    и отвечает как /beats/list?since=, т.е. изменения после курсора since не теряются
+    между запросами.
+    """
+    current_user_id = int(get_jwt_identity())
+    config = current_app.config
+
+    if request.args.get('mode') == 'poll':
+        since = request.args.get('since', '0')
+        timeout = min(request.args.get('timeout', config['EVENTS_POLL_TIMEOUT'], type=float), config['EVENTS_POLL_TIMEOUT'])
+        fields = ('id', 'status', 'updated_at')
+
+        # Подписываемся до чтения базы, чтобы не пропустить изменение между ними
+        deadline = time.monotonic() + timeout
+        subscription = events.subscribe(current_user_id)
+        try:
+            items, next_since, has_more = list_changed_beats(current_user_id, fields, config['BEATS_PAGE_MAX'], since)
+            # Событие может прийти по уже отданному курсором биту: тогда ждем дальше
+            while not items and subscription.get(max(0.0, deadline - time.monotonic())) is not None:
+                items, next_since, has_more = list_changed_beats(current_user_id, fields, config['BEATS_PAGE_MAX'], next_since)
+        except ValueError as e:
+            return jsonify({"msg": str(e)}), 400
+        finally:
+            events.unsubscribe(subscription)
+        return jsonify({"items": items, "since": next_since, "has_more": has_more}), 200
+
+    keepalive = config['EVENTS_KEEPALIVE']
+    deadline = time.monotonic() + config['EVENTS_STREAM_MAX']
+    subscription = events.subscribe(current_user_id)
+
+    def stream():
+        try:
+            yield "retry: 3000\n\n"
+            while time.monotonic() < deadline:
+                event = subscription.get(min(keepalive, max(0.0, deadline - time.monotonic())))
+                if event is None:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: beat\ndata: {json.dumps(event)}\n\n"
+        finally:
+            events.unsubscribe(subscription)
+
+    response = Response(stream_with_context(stream()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # nginx не должен буферизовать поток
+    return response
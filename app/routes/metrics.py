@@ -0,0 +1,27 @@
+import hmac
+import logging
+
+from flask import Blueprint, Response, current_app, request
+
+from app.services.metrics import registry
+
+bp = Blueprint('metrics', __name__)
+
+logger = logging.getLogger(__name__)
+
+
+@bp.record_once
+def _warn_missing_token(state) -> None:
+    if not state.app.config['METRICS_TOKEN']:
+        logger.warning("METRICS_TOKEN is not set: /metrics will reject all scrapes")
+
+
+# Метрики процесса в текстовом формате Prometheus; в них состояние пулов и очередей,
+# поэтому без токена не отдаются
+@bp.route('/metrics', methods=['GET'])
+def metrics():
+    token = current_app.config['METRICS_TOKEN']
+    supplied = request.headers.get('Authorization', '')
+    if not token or not hmac.compare_digest(supplied.encode(), f"Bearer {token}".encode()):
+        return Response("Forbidden\n", status=403, mimetype='text/plain')
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
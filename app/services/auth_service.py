@@ -1,18 +1,128 @@
+import hmac
+import logging
 import random
 import string
-from flask_mail import Message
-from app import mail  # Импортируем инициализированный mail из app
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import delete, select, update
+
+from app import db
+from app.models import VerificationCode
+from app.services.mail_queue import enqueue_email
+
+logger = logging.getLogger(__name__)
+
+# Результаты проверки кода подтверждения
+CODE_OK = 'ok'
+CODE_INVALID = 'invalid'
+CODE_EXPIRED = 'expired'
+CODE_LOCKED = 'locked'
+
 
 def generate_verification_code():
     """Генерация случайного 6-значного кода для подтверждения почты"""
     return ''.join(random.choices(string.digits, k=6))
 
 def send_verification_email(email, code):
-    """Отправка кода на почту"""
-    msg = Message("Email Verification Code", recipients=[email])
-    print(msg, 'сообщшение сформироано')
-    msg.body = f"Your verification code is: {code}"
-    mail.send(msg)
+    """Постановка письма с кодом в очередь; уйдет вместе с коммитом текущей транзакции"""
+    enqueue_email(email, "Email Verification Code", f"Your verification code is: {code}")
     return
 
 
+def issue_verification_code(user_id: int, email: str) -> VerificationCode:
+    """
+    Выдает новый код подтверждения со сроком VERIFICATION_CODE_TTL и ставит письмо в очередь.
+    Прежние коды пользователя удаляются. Не коммитит.
+    """
+    db.session.execute(delete(VerificationCode).where(VerificationCode.user_id == user_id))
+
+    now = datetime.utcnow()
+    code = generate_verification_code()
+    entry = VerificationCode(
+        user_id=user_id,
+        code=code,
+        created_at=now,
+        expires_at=now + timedelta(seconds=current_app.config['VERIFICATION_CODE_TTL']),
+    )
+    db.session.add(entry)
+    send_verification_email(email, code)
+    return entry
+
+
+def check_verification_code(user_id: int, code: str) -> str:
+    """
+    Проверяет код по последнему выданному коду пользователя (индекс ix_verification_code_user_created).
+
+    Неверный ввод увеличивает attempts; после VERIFICATION_CODE_MAX_ATTEMPTS код
+    больше не принимается, нужен новый. Верный код удаляется. Не коммитит.
+
+    Returns:
+        CODE_OK, CODE_INVALID, CODE_EXPIRED или CODE_LOCKED.
+    """
+    entry = db.session.execute(
+        select(VerificationCode)
+        .where(VerificationCode.user_id == user_id)
+        .order_by(VerificationCode.created_at.desc())
+        .limit(1)
+    ).scalar_one_or_none()
+
+    if entry is None or entry.expires_at <= datetime.utcnow():
+        return CODE_EXPIRED
+    if entry.attempts >= current_app.config['VERIFICATION_CODE_MAX_ATTEMPTS']:
+        return CODE_LOCKED
+
+    if not hmac.compare_digest(entry.code, str(code or '')):
+        # Счетчик увеличивается в базе, а не в объекте: параллельные попытки не потеряют неверные вводы
+        db.session.execute(
+            update(VerificationCode)
+            .where(VerificationCode.id == entry.id)
+            .values(attempts=VerificationCode.attempts + 1)
+        )
+        return CODE_INVALID
+
+    db.session.delete(entry)
+    return CODE_OK
+
+
+def purge_expired_codes(batch_size: int = None) -> int:
+    """
+    Удаляет истекшие коды подтверждения пачками по VERIFICATION_PURGE_BATCH_SIZE строк,
+    каждая пачка в своей короткой транзакции, с паузой между пачками. За один проход
+    удаляет не больше VERIFICATION_PURGE_MAX_BATCHES пачек, остальное - в следующем.
+
+    Returns:
+        Количество удаленных кодов.
+    """
+    config = current_app.config
+    batch_size = batch_size or config['VERIFICATION_PURGE_BATCH_SIZE']
+    now = datetime.utcnow()
+    purged = 0
+
+    for _ in range(config['VERIFICATION_PURGE_MAX_BATCHES']):
+        # Сначала id по индексу expires_at, затем удаление по первичному ключу:
+        # блокируются только удаляемые строки, а не диапазон индекса
+        ids = db.session.execute(
+            select(VerificationCode.id)
+            .where(VerificationCode.expires_at < now)
+            .order_by(VerificationCode.expires_at)
+            .limit(batch_size)
+        ).scalars().all()
+        if not ids:
+            db.session.rollback()
+            break
+
+        result = db.session.execute(
+            delete(VerificationCode)
+            .where(VerificationCode.id.in_(ids), VerificationCode.expires_at < now)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        purged += result.rowcount
+
+        if len(ids) < batch_size:
+            break
+        time.sleep(config['VERIFICATION_PURGE_PAUSE'])
+
+    return purged
@@ -0,0 +1,143 @@
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import bindparam, update
+
+from app import db
+from app.models import Beat
+from app.services.events import events
+
+logger = logging.getLogger(__name__)
+
+# Сообщение, которым API генерации помечает полностью готовую задачу
+COMPLETED_MSG = 'All generated successfully.'
+
+
+def extract_completed_tracks(beat_info: Any) -> Optional[List[Dict[str, Any]]]:
+    """
+    Достает готовые треки из ответа API по задаче.
+
+    Returns:
+        Список треков (по одному на каждый бит задачи) или None, если задача еще не готова.
+    """
+    if not isinstance(beat_info, dict) or 'output_data' not in beat_info:
+        return None
+
+    output_data = beat_info['output_data'] or {}
+    if output_data.get('msg') != COMPLETED_MSG or not output_data.get('data'):
+        return None
+
+    data = output_data['data']
+    # Проверка, что ссылки на аудио и изображения не пустые и длина больше 1 символа
+    if len(data) < 2:
+        return None
+    for track in data[:2]:
+        if len(track.get('audio_url') or '') <= 1 or len(track.get('image_url') or '') <= 1:
+            return None
+    return data
+
+
+def _track_values(beat_id: int, track: Dict[str, Any], now: datetime) -> Dict[str, Any]:
+    """Поля бита из трека; KeyError/TypeError, если трек неполный."""
+    return {
+        "b_id": beat_id,
+        "b_title": (track['title'] or '')[:255],
+        "b_url": track['audio_url'][:255],
+        "b_image_url": track['image_url'][:255],
+        "b_updated_at": now,
+    }
+
+
+_COMPLETE_BEAT = (
+    update(Beat.__table__)
+    .where(Beat.__table__.c.id == bindparam('b_id'), Beat.__table__.c.status != 'completed')
+    .values(
+        title=bindparam('b_title'),
+        url=bindparam('b_url'),
+        image_url=bindparam('b_image_url'),
+        status='completed',
+        updated_at=bindparam('b_updated_at'),
+    )
+)
+
+
+def _complete_beats(items: List[Dict[str, Any]]) -> List[int]:
+    """Выполняет _COMPLETE_BEAT по каждому биту; возвращает id битов, которые обновил этот вызов."""
+    return [item["b_id"] for item in items if db.session.execute(_COMPLETE_BEAT, item).rowcount == 1]
+
+
+def apply_completions(completions: Dict[str, List[Dict[str, Any]]]) -> int:
+    """
+    Записывает готовые треки сразу для многих задач: один SELECT битов всех задач,
+    UPDATE по каждому биту и один коммит. Callback и проход reconciler.py могут завершать
+    одну задачу одновременно; UPDATE не трогает уже готовый бит, и по rowcount каждого
+    UPDATE считаются и публикуются только биты, обновленные этим вызовом.
+
+    Биты одной задачи создаются парой (бит пользователя, затем бит без пользователя),
+    поэтому i-й по порядку создания бит задачи получает i-й трек. Задача с неполными
+    данными пропускается; если пачка не записалась целиком, задачи записываются
+    по одной в отдельных SAVEPOINT, и ошибка одной не откатывает остальные.
+
+    Returns:
+        Количество обновленных битов.
+    """
+    if not completions:
+        return 0
+
+    # Все биты задач одним запросом, включая готовые: от них зависит номер трека
+    rows = (
+        db.session.query(Beat.id, Beat.task_id, Beat.user_id, Beat.status)
+        .filter(Beat.task_id.in_(list(completions)))
+        .order_by(Beat.task_id, Beat.id)
+        .all()
+    )
+    beats_by_task: Dict[str, List[Any]] = {}
+    for row in rows:
+        beats_by_task.setdefault(row.task_id, []).append(row)
+
+    now = datetime.utcnow()
+    params_by_task: Dict[str, List[Dict[str, Any]]] = {}
+    for task_id, task_beats in beats_by_task.items():
+        try:
+            items = [
+                _track_values(beat.id, track, now)
+                for beat, track in zip(task_beats, completions[task_id])
+                if beat.status != 'completed'
+            ]
+        except (KeyError, TypeError, AttributeError) as e:
+            logger.error("Skipping completion of task_id %s: malformed track data (%r)", task_id, e)
+            continue
+        if items:
+            params_by_task[task_id] = items
+
+    params = [item for items in params_by_task.values() for item in items]
+    if not params:
+        return 0
+
+    try:
+        applied = {task_id: _complete_beats(items) for task_id, items in params_by_task.items()}
+    except Exception as e:
+        db.session.rollback()
+        logger.warning("Batched completion failed, retrying per task: %s", e)
+        applied = {}
+        for task_id, items in params_by_task.items():
+            try:
+                with db.session.begin_nested():
+                    applied[task_id] = _complete_beats(items)
+            except Exception as task_error:
+                logger.error("Failed to complete task_id %s: %s", task_id, task_error)
+    db.session.commit()
+
+    owners = {row.id: row.user_id for row in rows}
+    updated = [beat_id for beat_ids in applied.values() for beat_id in beat_ids]
+    logger.info("Completed %s beats for %s tasks", len(updated), sum(1 for beat_ids in applied.values() if beat_ids))
+    for beat_id in updated:
+        if owners[beat_id] is not None:
+            events.publish(owners[beat_id], {"beat_id": beat_id, "status": "completed"})
+    return len(updated)
+
+
+def apply_completion(task_id: str, tracks: List[Dict[str, Any]]) -> int:
+    """Записывает готовые треки одной задачи (см. apply_completions)."""
+    return apply_completions({task_id: tracks})
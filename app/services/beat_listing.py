@@ -0,0 +1,156 @@
+import base64
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from flask import current_app
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import load_only
+
+from app.models import BEAT_STATUSES, Beat
+
+# Поля ответа /beats/list и колонки, из которых они собираются
+FIELDS = {
+    "id": (Beat.id,),
+    "genre": (Beat.genre,),
+    "status": (Beat.status,),
+    "url": (Beat.url,),
+    "name": (Beat.title,),
+    "img_url": (Beat.image_url,),
+    "created_at": (Beat.created_at,),
+    "updated_at": (Beat.updated_at,),
+}
+DEFAULT_FIELDS = ("id", "genre", "status", "url", "name", "created_at", "img_url")
+
+
+def encode_cursor(moment: datetime, beat_id: int) -> str:
+    raw = f"{moment.isoformat()}|{beat_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """
+    Raises:
+        ValueError: если курсор поврежден.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        moment, beat_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(moment), int(beat_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def encode_since(watermark: datetime, seen: Iterable[Tuple[int, datetime]]) -> str:
+    parts = [watermark.isoformat()] + [f"{beat_id}@{moment.isoformat()}" for beat_id, moment in sorted(seen)]
+    return base64.urlsafe_b64encode("|".join(parts).encode()).decode().rstrip("=")
+
+
+def decode_since(since: str) -> Tuple[datetime, Set[Tuple[int, datetime]]]:
+    """
+    Raises:
+        ValueError: если курсор поврежден.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(since + "=" * (-len(since) % 4)).decode()
+        watermark, *items = raw.split("|")
+        seen = set()
+        for item in items:
+            beat_id, moment = item.split("@", 1)
+            seen.add((int(beat_id), datetime.fromisoformat(moment)))
+        return datetime.fromisoformat(watermark), seen
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid since: {since}") from e
+
+
+def parse_fields(fields: Optional[str]) -> Tuple[str, ...]:
+    """
+    Raises:
+        ValueError: если запрошено неизвестное поле.
+    """
+    if not fields:
+        return DEFAULT_FIELDS
+    requested = tuple(dict.fromkeys(field.strip() for field in fields.split(",") if field.strip()))
+    unknown = [field for field in requested if field not in FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return requested or DEFAULT_FIELDS
+
+
+def serialize(beat: Beat, fields: Iterable[str]) -> Dict[str, Any]:
+    item = {}
+    for field in fields:
+        value = getattr(beat, FIELDS[field][0].key)
+        item[field] = value.isoformat() if isinstance(value, datetime) else value
+    return item
+
+
+def _query(user_id: int, fields: Tuple[str, ...], order_column):
+    # Загружаем только нужные колонки плюс ключ курсора
+    columns = {Beat.id, order_column}
+    for field in fields:
+        columns.update(FIELDS[field])
+    return Beat.query.options(load_only(*columns)).filter(Beat.user_id == user_id)
+
+
+def list_beats(user_id: int, fields: Tuple[str, ...], limit: int,
+               status: Optional[str] = None, cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Страница битов пользователя от новых к старым, keyset по (created_at, id).
+
+    Returns:
+        (биты страницы, курсор следующей страницы или None, если страница последняя).
+    """
+    if status is not None and status not in BEAT_STATUSES:
+        raise ValueError(f"Invalid status: {status}")
+
+    query = _query(user_id, fields, Beat.created_at)
+    if status is not None:
+        query = query.filter(Beat.status == status)
+    if cursor:
+        created_at, beat_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            Beat.created_at < created_at,
+            and_(Beat.created_at == created_at, Beat.id < beat_id),
+        ))
+
+    beats = query.order_by(Beat.created_at.desc(), Beat.id.desc()).limit(limit + 1).all()
+    has_more = len(beats) > limit
+    beats = beats[:limit]
+    next_cursor = encode_cursor(beats[-1].created_at, beats[-1].id) if has_more else None
+    return [serialize(beat, fields) for beat in beats], next_cursor
+
+
+def list_changed_beats(user_id: int, fields: Tuple[str, ...], limit: int,
+                       since: str) -> Tuple[List[Dict[str, Any]], str, bool]:
+    """
+    Биты, измененные после курсора since, в порядке (updated_at, id).
+
+    updated_at ставит процесс-писатель при flush, поэтому строку с меньшим updated_at могут
+    закоммитить позже уже отданных. Курсор хранит водяной знак не новее BEATS_CHANGES_LOOKBACK
+    секунд назад и отданные после него (id, updated_at): строки окна перечитываются,
+    но повторно не отдаются.
+
+    Returns:
+        (измененные биты, курсор для следующего запроса, есть ли еще изменения).
+    """
+    query = _query(user_id, fields, Beat.updated_at)
+    watermark, seen = None, set()
+    if since != "0":
+        watermark, seen = decode_since(since)
+        query = query.filter(Beat.updated_at >= watermark)
+
+    # Уже отданных строк в окне не больше len(seen)
+    beats = query.order_by(Beat.updated_at, Beat.id).limit(limit + len(seen) + 1).all()
+    beats = [beat for beat in beats if (beat.id, beat.updated_at) not in seen]
+    has_more = len(beats) > limit
+
+    next_watermark = datetime.utcnow() - timedelta(seconds=current_app.config['BEATS_CHANGES_LOOKBACK'])
+    if has_more:
+        next_watermark = min(next_watermark, beats[limit].updated_at)
+    if watermark is not None:
+        next_watermark = max(next_watermark, watermark)
+
+    beats = beats[:limit]
+    seen |= {(beat.id, beat.updated_at) for beat in beats}
+    seen = {item for item in seen if item[1] >= next_watermark}
+    return [serialize(beat, fields) for beat in beats], encode_since(next_watermark, seen), has_more
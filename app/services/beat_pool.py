@@ -0,0 +1,91 @@
+import logging
+from typing import Dict, Optional
+
+from flask import current_app
+from sqlalchemy import case, func, update
+
+from app import db
+from app.models import Beat, GenrePrompt
+from app.services.generation_queue import BEATS_PER_TASK, enqueue_generation
+
+logger = logging.getLogger(__name__)
+
+# Статусы битов пула, которые можно выдать пользователю
+CLAIMABLE_STATUSES = ("completed", "in_progress")
+CLAIM_ATTEMPTS = 5
+
+
+def claim_pool_beat(user_id: int, genre: str) -> Optional[Beat]:
+    """
+    Атомарно забирает свободный бит жанра из пула и отдает его пользователю.
+
+    Кандидат выбирается с FOR UPDATE SKIP LOCKED (готовые биты в приоритете), а сама
+    выдача - условный UPDATE по user_id IS NULL, поэтому два запроса не получат один бит
+    даже на базах без блокировок строк. Выдачу не коммитит: вызывающий сохраняет ее
+    одной транзакцией со списанием генерации, откат возвращает бит в пул.
+
+    Returns:
+        Выданный бит или None, если пул жанра пуст.
+    """
+    for _ in range(CLAIM_ATTEMPTS):
+        candidate_id = (
+            db.session.query(Beat.id)
+            .filter(Beat.user_id.is_(None), Beat.genre == genre, Beat.status.in_(CLAIMABLE_STATUSES))
+            .order_by(case((Beat.status == "completed", 0), else_=1), Beat.id)
+            .with_for_update(skip_locked=True)
+            .limit(1)
+            .scalar()
+        )
+        if candidate_id is None:
+            db.session.rollback()
+            return None
+
+        result = db.session.execute(
+            update(Beat)
+            .where(Beat.id == candidate_id, Beat.user_id.is_(None))
+            .values(user_id=user_id)
+        )
+        if result.rowcount == 1:
+            return db.session.get(Beat, candidate_id)
+        # Бит перехватили: снимаем блокировку и берем следующего кандидата
+        db.session.rollback()
+
+    return None
+
+
+def get_pool_stock() -> Dict[str, int]:
+    """Количество свободных битов в пуле по жанрам."""
+    rows = (
+        db.session.query(Beat.genre, func.count(Beat.id))
+        .filter(Beat.user_id.is_(None), Beat.status.in_(CLAIMABLE_STATUSES))
+        .group_by(Beat.genre)
+        .all()
+    )
+    return {genre: count for genre, count in rows}
+
+
+def refill_once() -> int:
+    """
+    Один проход пополнения пула: для каждого жанра ставит в очередь генерации
+    задания на недостающие биты (их выполнит generation_worker.py).
+
+    Returns:
+        Количество поставленных заданий.
+    """
+    default_target = current_app.config['GENRE_POOL_TARGET']
+    budget = current_app.config['GENRE_POOL_MAX_TASKS_PER_PASS']
+    priority = current_app.config['UPSTREAM_BACKGROUND_PRIORITY']
+    stock = get_pool_stock()
+    started = 0
+
+    for genre_prompt in GenrePrompt.query.order_by(GenrePrompt.id).all():
+        target = genre_prompt.pool_target if genre_prompt.pool_target is not None else default_target
+        missing = target - stock.get(genre_prompt.genre, 0)
+
+        while missing > 0 and started < budget:
+            enqueue_generation(None, genre_prompt.genre, genre_prompt.prompt, priority=priority)
+            missing -= BEATS_PER_TASK
+            started += 1
+
+    db.session.commit()
+    return started
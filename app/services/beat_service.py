@@ -1,24 +1,67 @@
-from typing import Dict, Tuple, Union
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from typing import Dict, Iterable, Optional, Tuple, Union
+from urllib.parse import urlencode
 import requests
 import dotenv
 import os
+from app.services import http_client
+from app.services.metrics import upstream_call
 
 dotenv.load_dotenv()
 TOKEN = os.getenv("LOVEAI_API_TOKEN")
+BASE_URL = os.getenv("LOVEAI_BASE_URL", "https://api.loveaiapi.com").rstrip("/")
 
+# Публичный адрес нашего API, на который генератор присылает готовые задачи (роут /beats/callback)
+PUBLIC_BASE_URL = os.getenv("PUBLIC_BASE_URL", "http://127.0.0.1:5000").rstrip("/")
+CALLBACK_SECRET = os.getenv("LOVEAI_CALLBACK_SECRET")
 
+# Ограничение одновременных запросов к API при пакетном опросе задач
+MAX_CONCURRENCY = int(os.getenv("LOVEAI_MAX_CONCURRENCY", 16))
+
+_executor = None
+_executor_lock = Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Пул потоков для параллельных запросов, создается при первом использовании."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENCY, thread_name_prefix="loveai")
+    return _executor
+
+
+def _is_failed_response(result: Tuple[int, Dict]) -> bool:
+    return result[0] >= 400
+
+
+def _is_failed_task(result: Union[Dict, str]) -> bool:
+    return not isinstance(result, dict)
+
+
+def get_callback_url() -> str:
+    """Адрес для callback_url; секрет передается в query, генератор вернет его нам как есть."""
+    url = f"{PUBLIC_BASE_URL}/beats/callback"
+    if CALLBACK_SECRET:
+        url = f"{url}?{urlencode({'secret': CALLBACK_SECRET})}"
+    return url
+
+
+@upstream_call('generate_beat_by_description', _is_failed_response)
 def generate_beat_by_description(token: str, description: str) -> Tuple[int, Dict[str, str]]:
     if not token:
         raise ValueError("Токен LOVEAI_API_TOKEN отсутствует или не загружен!")
 
-    url = "https://api.loveaiapi.com/music/suno/generate2"
+    url = f"{BASE_URL}/music/suno/generate2"
     payload = {
         'prompt': f"INSTRUMENTAL MUST BE ONLY IN RAP INSTRUMENTAL GENRE AND MORE THAN 60 SECONDS. TRY TO take into account DESCRIPTION: {description}",
         'title': "",
         "custom": False,
         "instrumental": True,
         "style": 'rap',
-        "callback_url": 'http://127.0.0.1:5000'
+        "callback_url": get_callback_url()
     }
 
     headers = {
@@ -27,29 +70,31 @@ def generate_beat_by_description(token: str, description: str) -> Tuple[int, Dic
     }
 
     try:
-        response = requests.post(url, headers=headers, json=payload)
+        response = http_client.post(url, headers=headers, json=payload)
         response.raise_for_status()
 
         # Возвращаем код состояния и содержимое ответа
         return response.status_code, response.json()
+    except requests.exceptions.HTTPError as e:
+        return e.response.status_code, {"error": str(e)}
     except requests.exceptions.RequestException as e:
-        print(1)
         # Возвращаем код ошибки и сообщение об ошибке в виде словаря
         return 500, {"error": str(e)}
 
 
+@upstream_call('get_beat_by_id', _is_failed_task)
 def get_beat_by_id(task_id: str) -> Union[Dict, str]:
     if not TOKEN:
         raise ValueError("Токен LOVEAI_API_TOKEN отсутствует или не загружен!")
 
-    url = f"https://api.loveaiapi.com/music/suno/task?task_id={task_id}"
+    url = f"{BASE_URL}/music/suno/task?task_id={task_id}"
 
     headers = {
         'Authorization': f'Bearer {TOKEN}'
     }
 
     try:
-        response = requests.get(url, headers=headers)
+        response = http_client.get(url, headers=headers)
         response.raise_for_status()
         return response.json()  # Эта строка может вызвать ошибку, если ответ не в JSON
     except requests.exceptions.RequestException as e:
@@ -58,30 +103,55 @@ def get_beat_by_id(task_id: str) -> Union[Dict, str]:
         return f"Ошибка при разборе ответа JSON: {e}"
 
 
-def generate_beat_by_genre(token: str) -> Tuple[int, Dict]:
+def get_beats_by_ids(task_ids: Iterable[str]) -> Dict[str, Union[Dict, str]]:
+    """
+    Параллельно запрашивает статусы нескольких задач.
+
+    Одновременно выполняется не больше LOVEAI_MAX_CONCURRENCY запросов, поэтому время ответа
+    близко к одному запросу, пока задач не больше этого лимита.
+
+    Returns:
+        Словарь task_id -> результат get_beat_by_id (dict с ответом API или строка с ошибкой).
+    """
+    if not TOKEN:
+        raise ValueError("Токен LOVEAI_API_TOKEN отсутствует или не загружен!")
+
+    task_ids = list(dict.fromkeys(task_ids))
+    if len(task_ids) <= 1:
+        return {task_id: get_beat_by_id(task_id) for task_id in task_ids}
+
+    return dict(zip(task_ids, _get_executor().map(get_beat_by_id, task_ids)))
+
+
+@upstream_call('generate_beat_by_genre', _is_failed_response)
+def generate_beat_by_genre(token: str, prompt: str = "", style: str = "drill",
+                           idempotency_key: Optional[str] = None) -> Tuple[int, Dict]:
     if not token:
         raise ValueError("Токен LOVEAI_API_TOKEN отсутствует или не загружен!")
-    url = "https://api.loveaiapi.com/music/suno/generate2"
+    url = f"{BASE_URL}/music/suno/generate2"
     payload = {
-        'prompt': "",  # Используем текстовый промпт из базы данных
+        'prompt': prompt,  # Используем текстовый промпт из базы данных
         'title': "My Song",
         "custom": True,
         "instrumental": True,
-        "style": "drill",
-        "callback_url": 'http://127.0.0.1:5000'
+        "style": style,
+        "callback_url": get_callback_url()
     }
 
     headers = {
         'Authorization': f'Bearer {token}',
         'Content-Type': 'application/json'
     }
+    if idempotency_key:
+        # Повтор задания очереди с тем же ключом не должен запускать вторую задачу
+        headers['Idempotency-Key'] = idempotency_key
 
     try:
-        response = requests.post(url, headers=headers, json=payload)
+        response = http_client.post(url, headers=headers, json=payload)
         response.raise_for_status()
         # Возвращаем код состояния и распарсенный JSON
         return response.status_code, response.json()  # Возвращаем статус и данные JSON
+    except requests.exceptions.HTTPError as e:
+        return e.response.status_code, {"error": str(e)}
     except requests.exceptions.RequestException as e:
         return 500, {"error": str(e)}
-
-print(get_beat_by_id("4d6af3d2-ccc9-4c18-96b3-4a066684fa00"))
@@ -0,0 +1,123 @@
+import json
+import logging
+import time
+from threading import Lock
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryBackend:
+    """
+    Общее хранилище в памяти процесса. Локальная замена Redis для разработки и тестов.
+    """
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[float, str]] = {}
+        self._lock = Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            if item[0] <= time.monotonic():
+                del self._data[key]
+                return None
+            return item[1]
+
+    def set(self, key: str, value: str, ttl: float) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+
+class RedisBackend:
+    """
+    Общее хранилище в Redis, одно на все процессы. Требует пакет redis.
+    """
+
+    def __init__(self, url: str, prefix: str = "beatmaker:"):
+        import redis  # Необязательная зависимость, нужна только с CACHE_BACKEND=redis
+
+        self._client = redis.Redis.from_url(url)
+        self._prefix = prefix
+
+    def get(self, key: str) -> Optional[str]:
+        value = self._client.get(self._prefix + key)
+        return value.decode() if value is not None else None
+
+    def set(self, key: str, value: str, ttl: float) -> None:
+        self._client.set(self._prefix + key, value, px=int(ttl * 1000))
+
+    def delete(self, key: str) -> None:
+        self._client.delete(self._prefix + key)
+
+
+class Cache:
+    """
+    Двухуровневый кэш: короткий TTL в памяти процесса поверх общего хранилища.
+
+    Значения в общем хранилище лежат в JSON, поэтому кэшировать можно только то,
+    что сериализуется в JSON.
+    """
+
+    def __init__(self):
+        self.backend = MemoryBackend()
+        self.local_ttl = 30.0
+        self._local: Dict[str, Tuple[float, Any]] = {}
+        self._lock = Lock()
+
+    def init_app(self, app) -> None:
+        self.local_ttl = app.config['CACHE_LOCAL_TTL']
+        if app.config['CACHE_BACKEND'] == 'redis':
+            self.backend = RedisBackend(app.config['CACHE_REDIS_URL'])
+        else:
+            self.backend = MemoryBackend()
+        self.clear_local()
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.monotonic()
+        with self._lock:
+            item = self._local.get(key)
+            if item is not None and item[0] > now:
+                return item[1]
+
+        try:
+            raw = self.backend.get(key)
+        except Exception as e:
+            logger.warning("Shared cache get failed for %s: %s", key, e)
+            return None
+        if raw is None:
+            return None
+
+        value = json.loads(raw)
+        with self._lock:
+            self._local[key] = (now + self.local_ttl, value)
+        return value
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        with self._lock:
+            self._local[key] = (time.monotonic() + min(ttl, self.local_ttl), value)
+        try:
+            self.backend.set(key, json.dumps(value), ttl)
+        except Exception as e:
+            logger.warning("Shared cache set failed for %s: %s", key, e)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._local.pop(key, None)
+        try:
+            self.backend.delete(key)
+        except Exception as e:
+            logger.warning("Shared cache delete failed for %s: %s", key, e)
+
+    def clear_local(self) -> None:
+        with self._lock:
+            self._local.clear()
+
+
+cache = Cache()
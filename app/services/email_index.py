@@ -0,0 +1,210 @@
+import hashlib
+import logging
+import math
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional
+
+from app.models import normalize_email
+
+logger = logging.getLogger(__name__)
+
+
+class BloomFilter:
+    """
+    Фильтр Блума по строкам: "нет" - точно нет, "да" - возможно есть
+    (ложные срабатывания с долей около error_rate при заполнении до capacity).
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        capacity = max(capacity, 1)
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))  # Бит
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, value: str) -> Iterable[int]:
+        # Двойное хеширование: k позиций из двух 64-битных половин одного blake2b
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, value: str) -> None:
+        added = False
+        for position in self._positions(value):
+            mask = 1 << (position & 7)
+            if not self.bits[position >> 3] & mask:
+                self.bits[position >> 3] |= mask
+                added = True
+        # Повторное добавление (перекрытие окна refresh) не раздувает счетчик
+        if added:
+            self.count += 1
+
+    def __contains__(self, value: str) -> bool:
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+
+class EmailIndex:
+    """
+    Отрицательный кэш email в памяти процесса: фильтр Блума по users.email_normalized.
+
+    Пока фильтр не построен, might_exist всегда отвечает True (поиск идет в базу).
+    Фоновый поток строит фильтр, каждые EMAIL_INDEX_REFRESH_INTERVAL секунд добавляет
+    пользователей, созданных после последнего увиденного created_at минус
+    EMAIL_INDEX_REFRESH_LOOKBACK (регистрации в других процессах, в том числе
+    закоммиченные позже соседних), и раз в EMAIL_INDEX_REBUILD_INTERVAL пересобирает
+    фильтр целиком под текущее число пользователей. Регистрации в этом процессе
+    добавляются сразу (add).
+
+    Регистрация из другого процесса видна фильтру с задержкой, поэтому отрицательный
+    ответ годится только там, где ошибка безвредна (check-email, предпроверка в register).
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self.capacity = 1_000_000
+        self.error_rate = 0.01
+        self.refresh_interval = 5.0
+        self.rebuild_interval = 3600.0
+        self.refresh_lookback = timedelta(seconds=60)
+        self._filter: Optional[BloomFilter] = None
+        self._last_created: Optional[datetime] = None
+        self._rebuilt_at = 0.0
+        self._added_during_rebuild: Optional[list] = None
+        self._lock = threading.Lock()
+        self._started = False
+        self._app = None
+        self.stats = {"negative": 0, "maybe": 0, "not_ready": 0, "rebuilds": 0}
+
+    def init_app(self, app) -> None:
+        self.enabled = app.config['EMAIL_INDEX_ENABLED']
+        self.capacity = app.config['EMAIL_INDEX_CAPACITY']
+        self.error_rate = app.config['EMAIL_INDEX_ERROR_RATE']
+        self.refresh_interval = app.config['EMAIL_INDEX_REFRESH_INTERVAL']
+        self.rebuild_interval = app.config['EMAIL_INDEX_REBUILD_INTERVAL']
+        self.refresh_lookback = timedelta(seconds=app.config['EMAIL_INDEX_REFRESH_LOOKBACK'])
+        self._app = app
+
+    def _ensure_started(self) -> None:
+        """Поток построения фильтра запускается при первом обращении в процессе."""
+        if self._started:
+            return
+        with self._lock:
+            if self._started:
+                return
+            threading.Thread(target=self._run, name="email-index", daemon=True).start()
+            self._started = True
+
+    def might_exist(self, email: str) -> bool:
+        """False - пользователя с таким email точно нет, в базу можно не ходить."""
+        if not self.enabled:
+            return True
+        self._ensure_started()
+        bloom = self._filter
+        if bloom is None:
+            self.stats["not_ready"] += 1
+            return True
+        if normalize_email(email) in bloom:
+            self.stats["maybe"] += 1
+            return True
+        self.stats["negative"] += 1
+        return False
+
+    def add(self, email: str) -> None:
+        email = normalize_email(email)
+        with self._lock:
+            if self._filter is not None:
+                self._filter.add(email)
+            if self._added_during_rebuild is not None:
+                self._added_during_rebuild.append(email)
+
+    def rebuild(self) -> int:
+        """
+        Строит новый фильтр по всем пользователям и подменяет им текущий.
+
+        Returns:
+            Количество email в фильтре.
+        """
+        from app import db
+        from app.models import User
+
+        with self._lock:
+            self._added_during_rebuild = []
+        try:
+            # Отметка берется до чтения: все, что закоммитят во время сборки, подхватит refresh
+            last_created = db.session.query(db.func.max(User.created_at)).scalar()
+            total = db.session.query(db.func.count(User.id)).scalar() or 0
+            bloom = BloomFilter(max(self.capacity, total * 2), self.error_rate)
+            rows = db.session.execute(
+                db.select(User.email_normalized).order_by(User.id).execution_options(yield_per=10000)
+            )
+            for (email,) in rows:
+                bloom.add(email)
+        except Exception:
+            with self._lock:
+                self._added_during_rebuild = None
+            raise
+        finally:
+            db.session.rollback()
+
+        with self._lock:
+            # Регистрации этого процесса, пришедшие во время сборки, переносим в новый фильтр
+            for email in self._added_during_rebuild:
+                bloom.add(email)
+            self._added_during_rebuild = None
+            self._filter = bloom
+            self._last_created = last_created
+            self._rebuilt_at = time.monotonic()
+            self.stats["rebuilds"] += 1
+        return bloom.count
+
+    def refresh(self) -> int:
+        """
+        Добавляет в фильтр пользователей, созданных после последнего прохода
+        (индекс ix_users_created_at). Окно начинается на refresh_lookback раньше
+        последней увиденной отметки: транзакции коммитятся не в порядке created_at и id,
+        а часы процессов расходятся. Уже добавленные email в окне безвредны.
+        """
+        from app import db
+        from app.models import User
+
+        query = db.select(User.email_normalized, User.created_at)
+        if self._last_created is not None:
+            query = query.where(User.created_at >= self._last_created - self.refresh_lookback)
+        rows = db.session.execute(query).all()
+        db.session.rollback()
+        with self._lock:
+            for email, created_at in rows:
+                self._filter.add(email)
+                if created_at is not None and (self._last_created is None or created_at > self._last_created):
+                    self._last_created = created_at
+        return len(rows)
+
+    def _run(self) -> None:
+        while True:
+            try:
+                with self._app.app_context():
+                    if self._filter is None or time.monotonic() - self._rebuilt_at >= self.rebuild_interval:
+                        started = time.monotonic()
+                        count = self.rebuild()
+                        logger.info("Email index rebuilt: %s emails in %.2fs", count, time.monotonic() - started)
+                    else:
+                        self.refresh()
+            except Exception as e:
+                logger.exception("Email index update failed: %s", e)
+            time.sleep(self.refresh_interval)
+
+    def get_stats(self) -> Dict[str, int]:
+        bloom = self._filter
+        return dict(
+            self.stats,
+            ready=int(bloom is not None),
+            size=bloom.count if bloom is not None else 0,
+            bytes=len(bloom.bits) if bloom is not None else 0,
+        )
+
+
+email_index = EmailIndex()
@@ -0,0 +1,167 @@
+import json
+import logging
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+SUBSCRIPTION_QUEUE_SIZE = 100
+
+
+class Subscription:
+    """Очередь событий одного подписчика (одного открытого SSE/long-poll запроса)."""
+
+    def __init__(self, user_id: int):
+        self.user_id = user_id
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=SUBSCRIPTION_QUEUE_SIZE)
+
+    def put(self, event: Dict[str, Any]) -> None:
+        # Медленный клиент теряет самые старые события, а не блокирует публикацию
+        while True:
+            try:
+                self._queue.put_nowait(event)
+                return
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout: float) -> Optional[Dict[str, Any]]:
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class EventBus:
+    """
+    Pub/sub событий по пользователям внутри процесса.
+
+    Backend определяет, как события попадают в другие процессы:
+        db - процесс сам опрашивает beats.updated_at для своих подписчиков;
+        redis - через канал Redis pub/sub;
+        memory - только внутри процесса (разработка с одним процессом: события
+        из воркеров сверки и генерации подписчикам не доставляются).
+    """
+
+    def __init__(self):
+        self.backend = "db"
+        self._subscribers: Dict[int, Set[Subscription]] = {}
+        self._lock = threading.Lock()
+        self._redis = None
+        self._channel = "beatmaker:beat_events"
+        self._started = False
+
+    def init_app(self, app) -> None:
+        self.backend = app.config['EVENTS_BACKEND']
+        if self.backend == 'memory':
+            if app.config['WEB_CONCURRENCY'] > 1:
+                raise RuntimeError("EVENTS_BACKEND=memory works only with one process, use db or redis")
+            logger.warning("EVENTS_BACKEND=memory: beat updates from worker processes are not delivered to subscribers")
+        elif self.backend == 'redis':
+            import redis  # Необязательная зависимость, нужна только с EVENTS_BACKEND=redis
+
+            self._redis = redis.Redis.from_url(app.config['EVENTS_REDIS_URL'])
+        self._app = app
+
+    def _ensure_listener(self) -> None:
+        """Фоновый поток доставки для redis/db запускается при первой подписке в процессе."""
+        if self._started or self.backend == 'memory':
+            return
+        with self._lock:
+            if self._started:
+                return
+            target = self._listen_redis if self.backend == 'redis' else self._poll_database
+            threading.Thread(target=target, name=f"events-{self.backend}", daemon=True).start()
+            self._started = True
+
+    def subscribe(self, user_id: int) -> Subscription:
+        subscription = Subscription(user_id)
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(subscription)
+        self._ensure_listener()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.user_id)
+            if subscribers:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.user_id]
+
+    def _dispatch(self, user_id: int, event: Dict[str, Any]) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for subscription in subscribers:
+            subscription.put(event)
+
+    def publish(self, user_id: int, event: Dict[str, Any]) -> None:
+        """Отправляет событие всем подписчикам пользователя во всех процессах."""
+        if self.backend == 'redis':
+            try:
+                self._redis.publish(self._channel, json.dumps({"user_id": user_id, "event": event}))
+            except Exception as e:
+                logger.warning("Failed to publish event for user %s: %s", user_id, e)
+        elif self.backend == 'memory':
+            self._dispatch(user_id, event)
+        # В режиме db событие доставит опрос beats.updated_at
+
+    def _listen_redis(self) -> None:
+        while True:
+            try:
+                pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self._channel)
+                for message in pubsub.listen():
+                    payload = json.loads(message["data"])
+                    self._dispatch(int(payload["user_id"]), payload["event"])
+            except Exception as e:
+                logger.error("Redis event listener failed, reconnecting: %s", e)
+                time.sleep(1)
+
+    def _poll_database(self) -> None:
+        from app import db
+        from app.models import Beat
+
+        interval = self._app.config['EVENTS_DB_POLL_INTERVAL']
+        # Окно опроса начинается с запасом: строку с меньшим updated_at могут закоммитить
+        # позже соседних. Уже отправленные (id, updated_at) в окне повторно не отправляются
+        lookback = timedelta(seconds=self._app.config['EVENTS_DB_LOOKBACK'])
+        watermark = datetime.utcnow()
+        sent: Set[Tuple[int, datetime]] = set()
+
+        with self._app.app_context():
+            while True:
+                time.sleep(interval)
+                with self._lock:
+                    user_ids = list(self._subscribers)
+                if not user_ids:
+                    watermark, sent = datetime.utcnow(), set()
+                    continue
+                try:
+                    rows = (
+                        db.session.query(Beat.id, Beat.user_id, Beat.status, Beat.updated_at)
+                        .filter(Beat.user_id.in_(user_ids), Beat.updated_at >= watermark - lookback)
+                        .order_by(Beat.updated_at, Beat.id)
+                        .all()
+                    )
+                except Exception as e:
+                    logger.error("Event database poll failed: %s", e)
+                    rows = []
+                finally:
+                    db.session.remove()
+
+                for row in rows:
+                    if (row.id, row.updated_at) in sent:
+                        continue
+                    sent.add((row.id, row.updated_at))
+                    watermark = max(watermark, row.updated_at)
+                    self._dispatch(row.user_id, {"beat_id": row.id, "status": row.status})
+                sent = {item for item in sent if item[1] >= watermark - lookback}
+
+
+events = EventBus()
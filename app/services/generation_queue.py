@@ -0,0 +1,203 @@
+import logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from threading import Lock
+from typing import List, Optional, Tuple
+
+from flask import current_app, g
+from sqlalchemy import and_, or_, update
+
+from app import db
+from app.models import Beat, GenerationJob
+from app.services import quota
+from app.services.beat_service import TOKEN, generate_beat_by_genre
+from app.services.events import events
+
+logger = logging.getLogger(__name__)
+
+# Одна задача генерации дает два трека, т.е. два бита
+BEATS_PER_TASK = 2
+
+_executor = None
+_executor_lock = Lock()
+
+
+def _get_executor(workers: int) -> ThreadPoolExecutor:
+    """Пул потоков воркера, создается при первом проходе."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="generation")
+    return _executor
+
+
+def enqueue_generation(user_id: Optional[int], genre: str, prompt: str,
+                       idempotency_key: Optional[str] = None, priority: int = 0) -> GenerationJob:
+    """
+    Ставит задание генерации в очередь в текущей транзакции; коммитит вызывающий код.
+
+    Биты задания создаются сразу (in_progress, без task_id): для пользователя - его бит
+    и бит в пул жанра, для пополнения пула - BEATS_PER_TASK битов без владельца.
+    """
+    job = GenerationJob(
+        user_id=user_id,
+        genre=genre,
+        prompt=prompt,
+        idempotency_key=idempotency_key or uuid.uuid4().hex,
+        priority=priority,
+    )
+    db.session.add(job)
+    owners = [user_id] + [None] * (BEATS_PER_TASK - 1) if user_id is not None else [None] * BEATS_PER_TASK
+    for owner in owners:
+        db.session.add(Beat(user_id=owner, genre=genre, status='in_progress', job=job))
+    db.session.flush()
+    return job
+
+
+def find_job(idempotency_key: str) -> Optional[GenerationJob]:
+    return GenerationJob.query.filter_by(idempotency_key=idempotency_key).first()
+
+
+def _retry_delay(attempts: int) -> timedelta:
+    base = current_app.config['GENERATION_JOB_BACKOFF_BASE']
+    maximum = current_app.config['GENERATION_JOB_BACKOFF_MAX']
+    return timedelta(seconds=min(base * (2 ** (attempts - 1)), maximum))
+
+
+def claim_jobs(limit: int) -> List[Tuple[int, int]]:
+    """
+    Берет в работу до limit готовых к выполнению заданий: pending, у которых подошло время,
+    и running, чей воркер не уложился в GENERATION_JOB_LEASE (например, упал).
+
+    Строки берутся с FOR UPDATE SKIP LOCKED, поэтому несколько воркеров не возьмут одно задание.
+
+    Returns:
+        Список (id задания, номер попытки).
+    """
+    now = datetime.utcnow()
+    jobs: List[GenerationJob] = (
+        GenerationJob.query
+        .filter(or_(
+            and_(GenerationJob.status == 'pending', GenerationJob.next_attempt_at <= now),
+            and_(GenerationJob.status == 'running', GenerationJob.locked_until < now),
+        ))
+        .order_by(GenerationJob.priority, GenerationJob.next_attempt_at, GenerationJob.id)
+        .with_for_update(skip_locked=True)
+        .limit(limit)
+        .all()
+    )
+    lease = timedelta(seconds=current_app.config['GENERATION_JOB_LEASE'])
+    claimed = []
+    for job in jobs:
+        job.status = 'running'
+        job.attempts += 1
+        job.locked_until = now + lease
+        claimed.append((job.id, job.attempts))
+    db.session.commit()
+    return claimed
+
+
+def _finish(job_id: int, attempt: int, **values) -> bool:
+    """Меняет задание, только если оно все еще в этой попытке (аренду не перехватил другой воркер)."""
+    result = db.session.execute(
+        update(GenerationJob)
+        .where(GenerationJob.id == job_id, GenerationJob.status == 'running', GenerationJob.attempts == attempt)
+        .values(locked_until=None, **values)
+    )
+    return result.rowcount == 1
+
+
+def _dead_letter(job_id: int, attempt: int, error: str) -> None:
+    """
+    Задание больше не повторяется: его биты помечаются failed, владельцам битов
+    возвращается списанная генерация.
+    """
+    if not _finish(job_id, attempt, status='dead', last_error=error):
+        db.session.rollback()
+        return
+
+    failed = []
+    for beat in Beat.query.filter_by(job_id=job_id, status='in_progress').all():
+        beat.status = 'failed'
+        if beat.user_id is not None:
+            quota.refund(beat.user_id)
+            failed.append((beat.user_id, beat.id))
+    db.session.commit()
+
+    logger.error("Generation job %s dead-lettered after %s attempts: %s", job_id, attempt, error)
+    for user_id, beat_id in failed:
+        events.publish(user_id, {"beat_id": beat_id, "status": "failed"})
+
+
+def run_job(job_id: int, attempt: int) -> bool:
+    """
+    Запускает задачу в API генерации для задания и записывает task_id в его биты.
+    Неудачная попытка откладывается с экспоненциальной задержкой; после
+    GENERATION_JOB_MAX_ATTEMPTS попыток или ошибки 4xx задание уходит в dead.
+
+    Returns:
+        True, если задача генерации запущена.
+    """
+    max_attempts = current_app.config['GENERATION_JOB_MAX_ATTEMPTS']
+    job = db.session.get(GenerationJob, job_id)
+    if job is None or job.status != 'running' or job.attempts != attempt:
+        return False
+    if attempt > max_attempts:
+        _dead_letter(job_id, attempt, job.last_error or "lease expired")
+        return False
+
+    # Запросы к API встают в очередь с приоритетом тарифа заказчика
+    g.upstream_priority = job.priority
+    try:
+        status, answer = generate_beat_by_genre(TOKEN, job.prompt, job.genre, idempotency_key=job.idempotency_key)
+    except Exception as e:
+        status, answer = 500, {"error": str(e)}
+    db.session.rollback()
+
+    task_id = answer.get("task_id")
+    if task_id:
+        if _finish(job_id, attempt, status='done', task_id=task_id, last_error=None):
+            db.session.execute(update(Beat).where(Beat.job_id == job_id).values(task_id=task_id))
+        db.session.commit()
+        logger.info("Generation job %s started task_id %s", job_id, task_id)
+        return True
+
+    error = str(answer.get("error") or answer)
+    if (400 <= status < 500 and status != 429) or attempt >= max_attempts:
+        _dead_letter(job_id, attempt, error)
+        return False
+
+    next_attempt_at = datetime.utcnow() + _retry_delay(attempt)
+    _finish(job_id, attempt, status='pending', next_attempt_at=next_attempt_at, last_error=error)
+    db.session.commit()
+    logger.warning("Generation job %s attempt %s failed, retry at %s: %s", job_id, attempt, next_attempt_at, error)
+    return False
+
+
+def process_once(concurrency: Optional[int] = None) -> int:
+    """
+    Один проход воркера: берет до GENERATION_WORKER_CONCURRENCY заданий и выполняет их
+    параллельно, каждое в своем контексте приложения.
+
+    Returns:
+        Количество запущенных задач генерации.
+    """
+    concurrency = concurrency or current_app.config['GENERATION_WORKER_CONCURRENCY']
+    claimed = claim_jobs(concurrency)
+    if not claimed:
+        return 0
+
+    app = current_app._get_current_object()
+
+    def run(job: Tuple[int, int]) -> bool:
+        with app.app_context():
+            try:
+                return run_job(*job)
+            except Exception as e:
+                db.session.rollback()
+                logger.error("Error in generation job %s: %s", job[0], e)
+                return False
+
+    return sum(_get_executor(concurrency).map(run, claimed))
@@ -0,0 +1,69 @@
+import hashlib
+import json
+import logging
+from typing import Any, Dict, List, Optional
+
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.models import GenrePrompt
+from app.services.cache import cache
+
+logger = logging.getLogger(__name__)
+
+CATALOG_KEY = "genre_catalog"
+
+
+def _load_catalog() -> Dict[str, Any]:
+    genres = GenrePrompt.query.order_by(GenrePrompt.id).all()
+    genre_list = [{"id": genre.id, "genre": genre.genre} for genre in genres]
+    prompts = {genre.genre: genre.prompt for genre in genres}
+    etag = hashlib.sha1(json.dumps(genre_list, sort_keys=True).encode()).hexdigest()
+    return {"etag": etag, "genres": genre_list, "prompts": prompts}
+
+
+def get_catalog() -> Dict[str, Any]:
+    """
+    Каталог жанров из кэша; при промахе читается из GenrePrompt.
+
+    Returns:
+        Словарь с ключами etag, genres (список для /beats/genres) и prompts (жанр -> промпт).
+    """
+    catalog = cache.get(CATALOG_KEY)
+    if catalog is None:
+        catalog = _load_catalog()
+        cache.set(CATALOG_KEY, catalog, current_app.config['GENRE_CACHE_TTL'])
+    return catalog
+
+
+def get_genre_list() -> List[Dict[str, Any]]:
+    return get_catalog()["genres"]
+
+
+def get_genre_prompt(genre: str) -> Optional[str]:
+    """Промпт жанра или None, если такого жанра нет."""
+    return get_catalog()["prompts"].get(genre)
+
+
+def invalidate() -> None:
+    cache.delete(CATALOG_KEY)
+    logger.info("Genre catalog cache invalidated")
+
+
+# Сбрасываем кэш после коммита, в котором менялись жанры
+@event.listens_for(Session, "after_flush")
+def _mark_genre_changes(session, flush_context):
+    if any(isinstance(obj, GenrePrompt) for obj in (*session.new, *session.dirty, *session.deleted)):
+        session.info["genre_catalog_changed"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    if session.info.pop("genre_catalog_changed", False):
+        invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_genre_changes(session):
+    session.info.pop("genre_catalog_changed", None)
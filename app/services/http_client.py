@@ -0,0 +1,213 @@
+import logging
+import os
+import random
+import time
+from threading import Lock
+from typing import Dict, Optional
+
+import dotenv
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.services.rate_limit import governor, upstream_priority
+
+dotenv.load_dotenv()
+logger = logging.getLogger(__name__)
+
+# Таймауты (connect, read) в секундах и размер пула keep-alive соединений
+TIMEOUT = (float(os.getenv("LOVEAI_CONNECT_TIMEOUT", 3.05)), float(os.getenv("LOVEAI_READ_TIMEOUT", 15)))
+POOL_SIZE = int(os.getenv("LOVEAI_POOL_SIZE", 32))
+
+# Повторы идемпотентных запросов: количество и база экспоненциальной задержки с jitter
+MAX_RETRIES = int(os.getenv("LOVEAI_MAX_RETRIES", 2))
+RETRY_BACKOFF = float(os.getenv("LOVEAI_RETRY_BACKOFF", 0.3))
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Circuit breaker: после скольких ошибок подряд перестаем ходить в API и на сколько секунд
+BREAKER_THRESHOLD = int(os.getenv("LOVEAI_BREAKER_THRESHOLD", 5))
+BREAKER_RESET_TIMEOUT = float(os.getenv("LOVEAI_BREAKER_RESET_TIMEOUT", 30))
+# Сколько ждать ответа на пробный запрос, после этого пропускается следующий пробный
+BREAKER_PROBE_TIMEOUT = float(os.getenv("LOVEAI_BREAKER_PROBE_TIMEOUT", TIMEOUT[0] + TIMEOUT[1] + 5))
+
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """API генерации считается недоступным, запрос не отправлялся."""
+
+
+class CircuitBreaker:
+    """
+    Размыкатель цепи: closed -> open после BREAKER_THRESHOLD ошибок подряд,
+    через reset_timeout пропускает один пробный запрос (half_open).
+    Если пробный запрос не завершился за probe_timeout, пропускается следующий.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, threshold: int, reset_timeout: float, probe_timeout: float):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.probe_timeout = probe_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_started = 0.0
+        self._lock = Lock()
+
+    def _probe_due(self, now: float) -> bool:
+        if self.state == self.OPEN:
+            return now - self.opened_at >= self.reset_timeout
+        return now - self.probe_started >= self.probe_timeout
+
+    def is_open(self) -> bool:
+        """Запрос заведомо не будет пропущен; состояние не меняет."""
+        with self._lock:
+            return self.state != self.CLOSED and not self._probe_due(time.monotonic())
+
+    def allow(self) -> bool:
+        """
+        Пропускает запрос. В half_open пропущенный запрос - пробный: вызывающий код
+        обязан завершить его record_success, record_failure или release_probe.
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            now = time.monotonic()
+            if not self._probe_due(now):
+                return False
+            if self.state == self.HALF_OPEN:
+                logger.warning("LoveAI circuit breaker probe timed out, sending another one")
+            self.state = self.HALF_OPEN
+            self.probe_started = now
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.threshold:
+                if self.state != self.OPEN:
+                    logger.warning("LoveAI circuit breaker opened after %s failures", self.failures)
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def release_probe(self) -> None:
+        """Пробный запрос не дошел до API (не сетевая ошибка): следующий запрос снова станет пробным."""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic() - self.reset_timeout
+
+
+breaker = CircuitBreaker(BREAKER_THRESHOLD, BREAKER_RESET_TIMEOUT, BREAKER_PROBE_TIMEOUT)
+
+# Общая сессия с пулом keep-alive соединений на все потоки
+session = requests.Session()
+_adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+session.mount("https://", _adapter)
+session.mount("http://", _adapter)
+
+_stats_lock = Lock()
+_stats: Dict[str, int] = {
+    "requests": 0,
+    "in_flight": 0,
+    "retries": 0,
+    "failures": 0,
+    "short_circuited": 0,
+}
+
+
+def _incr(name: str, value: int = 1) -> None:
+    with _stats_lock:
+        _stats[name] += value
+
+
+def get_stats() -> Dict[str, object]:
+    """Счетчики клиента и состояние circuit breaker для мониторинга."""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["breaker_state"] = breaker.state
+    stats["breaker_failures"] = breaker.failures
+    stats["governor"] = governor.get_stats()
+    return stats
+
+
+def _retry_delay(attempt: int) -> float:
+    """Экспоненциальная задержка с полным jitter."""
+    return random.uniform(0, RETRY_BACKOFF * (2 ** attempt))
+
+
+def request(method: str, url: str, timeout: Optional[tuple] = None, **kwargs) -> requests.Response:
+    """
+    Выполняет запрос к API генерации через общий пул соединений.
+
+    GET-запросы повторяются до MAX_RETRIES раз при сетевых ошибках и ответах 429/5xx.
+    Пока breaker разомкнут, сразу выбрасывает CircuitOpenError.
+
+    Returns:
+        Ответ requests; ошибки HTTP проверяет вызывающий код через raise_for_status().
+    """
+    method = method.upper()
+    retries = MAX_RETRIES if method in IDEMPOTENT_METHODS else 0
+
+    for attempt in range(retries + 1):
+        if breaker.is_open():
+            _incr("short_circuited")
+            raise CircuitOpenError(f"LoveAI API circuit is open, request to {url} skipped")
+
+        if attempt:
+            _incr("retries")
+            time.sleep(_retry_delay(attempt - 1))
+
+        # Очередь к API по приоритету тарифа и общий лимит запросов в секунду.
+        # Место в очереди берется до breaker.allow(): пробный запрос half_open
+        # не должен застрять, не дождавшись очереди
+        governor.acquire(upstream_priority())
+        try:
+            if not breaker.allow():
+                _incr("short_circuited")
+                raise CircuitOpenError(f"LoveAI API circuit is open, request to {url} skipped")
+
+            _incr("requests")
+            _incr("in_flight")
+            try:
+                response = session.request(method, url, timeout=timeout or TIMEOUT, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                _incr("failures")
+                breaker.record_failure()
+                if attempt == retries:
+                    raise
+                continue
+            except BaseException:
+                breaker.release_probe()
+                raise
+            finally:
+                _incr("in_flight", -1)
+        finally:
+            governor.release()
+
+        if response.status_code >= 500:
+            _incr("failures")
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+
+        if response.status_code in RETRY_STATUSES and attempt < retries:
+            response.close()
+            continue
+        return response
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    return request("GET", url, **kwargs)
+
+
+def post(url: str, **kwargs) -> requests.Response:
+    return request("POST", url, **kwargs)
@@ -0,0 +1,139 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Set
+
+from flask import current_app
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+from app import db, jwt
+from app.models import SubscriptionPlan, User
+
+logger = logging.getLogger(__name__)
+
+# Поля пользователя, после изменения которых снимок в кэше устаревает
+SNAPSHOT_FIELDS = ('email', 'password', 'is_verified', 'subscription_plan_id')
+
+
+@dataclass(frozen=True)
+class UserSnapshot:
+    """Облегченный пользователь для авторизованных роутов (current_user)."""
+    id: int
+    email: str
+    is_verified: bool
+    plan_id: int
+    plan_name: str
+    max_generations: int
+
+
+class IdentityCache:
+    """
+    LRU-кэш снимков пользователей в памяти процесса с коротким TTL.
+
+    Изменения пользователя в этом процессе сбрасывают снимок после коммита,
+    изменения из других процессов видны не позже чем через TTL.
+    """
+
+    def __init__(self, size: int = 10000, ttl: float = 30.0):
+        self.size = size
+        self.ttl = ttl
+        self._items: "OrderedDict[int, tuple]" = OrderedDict()  # user_id -> (снимок, когда истекает)
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+
+    def init_app(self, app) -> None:
+        self.size = app.config['IDENTITY_CACHE_SIZE']
+        self.ttl = app.config['IDENTITY_CACHE_TTL']
+        jwt.user_lookup_loader(_lookup_user)
+
+    def get(self, user_id: int) -> Optional[UserSnapshot]:
+        with self._lock:
+            item = self._items.get(user_id)
+            if item is None or item[1] <= time.monotonic():
+                self.stats["misses"] += 1
+                return None
+            self._items.move_to_end(user_id)
+            self.stats["hits"] += 1
+            return item[0]
+
+    def set(self, snapshot: UserSnapshot) -> None:
+        if self.size <= 0:
+            return
+        with self._lock:
+            self._items[snapshot.id] = (snapshot, time.monotonic() + self.ttl)
+            self._items.move_to_end(snapshot.id)
+            while len(self._items) > self.size:
+                self._items.popitem(last=False)
+
+    def invalidate(self, user_id: int) -> None:
+        with self._lock:
+            self._items.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+
+identity_cache = IdentityCache()
+
+
+def load_snapshot(user_id: int) -> Optional[UserSnapshot]:
+    """Снимок пользователя вместе с тарифом одним запросом, без кэша."""
+    row = db.session.execute(
+        select(User.id, User.email, User.is_verified, SubscriptionPlan.id, SubscriptionPlan.name,
+               SubscriptionPlan.max_generations)
+        .join(SubscriptionPlan, User.subscription_plan_id == SubscriptionPlan.id)
+        .where(User.id == user_id)
+    ).first()
+    if row is None:
+        return None
+    return UserSnapshot(*row[:2], bool(row[2]), *row[3:])
+
+
+def get_snapshot(user_id: int) -> Optional[UserSnapshot]:
+    snapshot = identity_cache.get(user_id)
+    if snapshot is None:
+        snapshot = load_snapshot(user_id)
+        if snapshot is not None:
+            identity_cache.set(snapshot)
+    return snapshot
+
+
+def _lookup_user(_jwt_header, jwt_data) -> Optional[UserSnapshot]:
+    # None для удаленного пользователя - flask_jwt_extended ответит 401
+    try:
+        return get_snapshot(int(jwt_data[current_app.config['JWT_IDENTITY_CLAIM']]))
+    except (TypeError, ValueError):
+        return None
+
+
+# Сбрасываем снимки после коммита, в котором менялись пользователи или тарифы
+@event.listens_for(Session, "after_flush")
+def _mark_identity_changes(session, flush_context):
+    changed: Set[int] = session.info.setdefault("identity_changed", set())
+    for obj in (*session.dirty, *session.deleted):
+        if isinstance(obj, SubscriptionPlan):
+            session.info["identity_plans_changed"] = True
+        elif isinstance(obj, User):
+            state = inspect(obj)
+            if obj in session.deleted or any(
+                state.attrs[field].history.has_changes() for field in SNAPSHOT_FIELDS
+            ):
+                changed.add(obj.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_identities(session):
+    if session.info.pop("identity_plans_changed", False):
+        identity_cache.clear()
+    for user_id in session.info.pop("identity_changed", ()):
+        identity_cache.invalidate(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_identity_changes(session):
+    session.info.pop("identity_plans_changed", None)
+    session.info.pop("identity_changed", None)
@@ -0,0 +1,85 @@
+import logging
+from datetime import datetime, timedelta
+from typing import List
+
+from flask import current_app
+from flask_mail import Message
+
+from app import db, mail
+from app.models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_email(recipient: str, subject: str, body: str) -> OutboundEmail:
+    """
+    Добавляет письмо в очередь в текущей транзакции; коммитит вызывающий код.
+    """
+    email = OutboundEmail(recipient=recipient, subject=subject, body=body)
+    db.session.add(email)
+    return email
+
+
+def _retry_delay(attempts: int) -> timedelta:
+    base = current_app.config['MAIL_QUEUE_BACKOFF_BASE']
+    maximum = current_app.config['MAIL_QUEUE_BACKOFF_MAX']
+    return timedelta(seconds=min(base * (2 ** (attempts - 1)), maximum))
+
+
+def _mark_failed(email: OutboundEmail, error: Exception, now: datetime) -> None:
+    email.attempts += 1
+    email.last_error = str(error)
+    if email.attempts >= current_app.config['MAIL_QUEUE_MAX_ATTEMPTS']:
+        email.status = 'failed'
+        logger.error("Giving up on email %s after %s attempts: %s", email.id, email.attempts, error)
+    else:
+        email.next_attempt_at = now + _retry_delay(email.attempts)
+
+
+def send_pending(batch_size: int = None) -> int:
+    """
+    Отправляет пачку писем из очереди через одно SMTP-соединение.
+
+    Строки берутся с FOR UPDATE SKIP LOCKED, поэтому несколько воркеров не отправят
+    одно письмо дважды. Неудачные письма откладываются с экспоненциальной задержкой.
+
+    Returns:
+        Количество отправленных писем.
+    """
+    batch_size = batch_size or current_app.config['MAIL_QUEUE_BATCH_SIZE']
+    now = datetime.utcnow()
+    emails: List[OutboundEmail] = (
+        OutboundEmail.query
+        .filter(OutboundEmail.status == 'pending', OutboundEmail.next_attempt_at <= now)
+        .order_by(OutboundEmail.next_attempt_at, OutboundEmail.id)
+        .with_for_update(skip_locked=True)
+        .limit(batch_size)
+        .all()
+    )
+    if not emails:
+        db.session.rollback()
+        return 0
+
+    sent = 0
+    handled = set()
+    try:
+        with mail.connect() as connection:
+            for email in emails:
+                handled.add(email.id)
+                try:
+                    connection.send(Message(email.subject, recipients=[email.recipient], body=email.body))
+                except Exception as e:
+                    _mark_failed(email, e, now)
+                    continue
+                email.status = 'sent'
+                email.sent_at = datetime.utcnow()
+                sent += 1
+    except Exception as e:
+        # SMTP-соединение не установилось или оборвалось: откладываем необработанные письма
+        logger.error("SMTP connection failed: %s", e)
+        for email in emails:
+            if email.id not in handled:
+                _mark_failed(email, e, now)
+
+    db.session.commit()
+    return sent
@@ -0,0 +1,303 @@
+import hashlib
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from threading import Lock
+from typing import List, Optional, Tuple
+
+import requests
+from flask import current_app
+from sqlalchemy import func, or_, update
+
+from app import db
+from app.models import Beat, MediaAsset
+from app.services.media_store import media_storage
+
+logger = logging.getLogger(__name__)
+
+# Файлы с CDN качаются отдельной сессией: очередь и breaker API генерации им не нужны
+session = requests.Session()
+
+_executor = None
+_executor_lock = Lock()
+
+
+def _get_executor(workers: int) -> ThreadPoolExecutor:
+    """Пул потоков воркера, создается при первом проходе."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="media")
+    return _executor
+
+
+def _retry_delay(attempts: int) -> timedelta:
+    base = current_app.config['MEDIA_MIRROR_BACKOFF_BASE']
+    maximum = current_app.config['MEDIA_MIRROR_BACKOFF_MAX']
+    return timedelta(seconds=min(base * (2 ** (attempts - 1)), maximum))
+
+
+def enqueue_missing(limit: int) -> int:
+    """
+    Ставит в очередь копирование для готовых битов, у которых еще нет локальной копии трека
+    (индекс ix_beats_audio_asset). Коммитит.
+
+    Returns:
+        Количество битов, поставленных в очередь.
+    """
+    beats: List[Beat] = (
+        Beat.query
+        .filter(Beat.audio_asset_id.is_(None), Beat.status == 'completed', Beat.url.isnot(None))
+        .order_by(Beat.id)
+        .with_for_update(skip_locked=True)
+        .limit(limit)
+        .all()
+    )
+    for beat in beats:
+        audio = MediaAsset(kind='audio', source_url=beat.url)
+        db.session.add(audio)
+        beat.audio_asset = audio
+        if beat.image_url and beat.image_asset_id is None:
+            image = MediaAsset(kind='image', source_url=beat.image_url)
+            db.session.add(image)
+            beat.image_asset = image
+    db.session.commit()
+    return len(beats)
+
+
+def claim_assets(limit: int) -> List[Tuple[int, int]]:
+    """
+    Берет в работу до limit файлов, у которых подошло время. next_attempt_at сразу
+    сдвигается на MEDIA_MIRROR_LEASE: если воркер упадет, файл возьмут снова.
+
+    Returns:
+        Список (id файла, номер попытки).
+    """
+    now = datetime.utcnow()
+    assets: List[MediaAsset] = (
+        MediaAsset.query
+        .filter(MediaAsset.status == 'pending', MediaAsset.next_attempt_at <= now)
+        .order_by(MediaAsset.next_attempt_at, MediaAsset.id)
+        .with_for_update(skip_locked=True)
+        .limit(limit)
+        .all()
+    )
+    lease = timedelta(seconds=current_app.config['MEDIA_MIRROR_LEASE'])
+    claimed = []
+    for asset in assets:
+        asset.attempts += 1
+        asset.next_attempt_at = now + lease
+        claimed.append((asset.id, asset.attempts))
+    db.session.commit()
+    return claimed
+
+
+def _download(url: str) -> Tuple[str, str, int, Optional[str]]:
+    """
+    Скачивает файл потоком во временный файл хранилища, считая sha256 по ходу.
+
+    Returns:
+        (путь временного файла, sha256, размер, Content-Type).
+    """
+    max_size = current_app.config['MEDIA_MAX_FILE_SIZE']
+    digest = hashlib.sha256()
+    size = 0
+    temp = media_storage.temp_file()
+    try:
+        with temp, session.get(url, stream=True, timeout=current_app.config['MEDIA_DOWNLOAD_TIMEOUT']) as response:
+            response.raise_for_status()
+            for chunk in response.iter_content(chunk_size=256 * 1024):
+                size += len(chunk)
+                if size > max_size:
+                    raise ValueError(f"File is larger than MEDIA_MAX_FILE_SIZE ({max_size} bytes)")
+                digest.update(chunk)
+                temp.write(chunk)
+            content_type = response.headers.get('Content-Type')
+    except BaseException:
+        os.remove(temp.name)
+        raise
+    return temp.name, digest.hexdigest(), size, content_type
+
+
+def mirror_asset(asset_id: int, attempt: int) -> bool:
+    """
+    Копирует один файл в хранилище. Неудача откладывается с экспоненциальной задержкой,
+    после MEDIA_MIRROR_MAX_ATTEMPTS попыток или ответа 4xx файл помечается failed
+    (плеер продолжит получать ссылку на CDN).
+
+    Returns:
+        True, если файл сохранен.
+    """
+    asset = db.session.get(MediaAsset, asset_id)
+    if asset is None or asset.status != 'pending' or asset.attempts != attempt:
+        return False
+    url = asset.source_url
+    db.session.rollback()
+
+    try:
+        temp_path, sha256, size, content_type = _download(url)
+        # Одинаковое содержимое хранится один раз. Если файл уже есть, скачанную копию
+        # держим до коммита: этот файл может удалить вытеснение
+        duplicate = media_storage.exists(sha256)
+        if not duplicate:
+            media_storage.put(sha256, temp_path, content_type)
+    except Exception as e:
+        status = getattr(getattr(e, 'response', None), 'status_code', None)
+        permanent = status is not None and 400 <= status < 500 and status != 429
+        if permanent or attempt >= current_app.config['MEDIA_MIRROR_MAX_ATTEMPTS']:
+            values = {"status": 'failed'}
+            logger.error("Giving up on media asset %s after %s attempts: %s", asset_id, attempt, e)
+        else:
+            values = {"next_attempt_at": datetime.utcnow() + _retry_delay(attempt)}
+            logger.warning("Media asset %s attempt %s failed: %s", asset_id, attempt, e)
+        db.session.execute(
+            update(MediaAsset)
+            .where(MediaAsset.id == asset_id, MediaAsset.attempts == attempt)
+            .values(last_error=str(e), **values)
+        )
+        db.session.commit()
+        return False
+
+    now = datetime.utcnow()
+    db.session.execute(
+        update(MediaAsset)
+        .where(MediaAsset.id == asset_id, MediaAsset.attempts == attempt)
+        .values(status='stored', sha256=sha256, size=size, content_type=content_type,
+                last_error=None, last_accessed_at=now)
+    )
+    db.session.commit()
+
+    # Вытеснение могло удалить файл с тем же содержимым, пока этот файл еще не был stored
+    if duplicate:
+        if media_storage.exists(sha256):
+            os.remove(temp_path)
+        else:
+            media_storage.put(sha256, temp_path, content_type)
+    return True
+
+
+def _stored_bytes() -> int:
+    """Объем хранилища: одинаковое содержимое лежит одним файлом, поэтому считаем по sha256."""
+    distinct = (
+        db.session.query(MediaAsset.sha256, MediaAsset.size)
+        .filter(MediaAsset.status == 'stored')
+        .distinct()
+        .subquery()
+    )
+    return db.session.query(func.coalesce(func.sum(distinct.c.size), 0)).scalar()
+
+
+def evict_cold_assets() -> int:
+    """
+    Держит хранилище в пределах MEDIA_STORE_MAX_BYTES: давно не запрашиваемые файлы
+    (по last_accessed_at, индекс ix_media_assets_status_accessed) помечаются evicted,
+    пока занято больше MEDIA_STORE_LOW_WATERMARK от лимита. Файл удаляется из хранилища,
+    только если на то же содержимое не ссылается другой сохраненный файл.
+    При следующем запросе вытесненный файл снова ставится в очередь.
+
+    Холодные строки берутся с FOR UPDATE SKIP LOCKED, а соседи по sha256 проверяются
+    блокирующим чтением до удаления файла: на MySQL параллельный mirror_asset с тем же
+    содержимым ждет коммита вытеснения и затем сам докладывает файл.
+
+    Returns:
+        Количество вытесненных файлов.
+    """
+    config = current_app.config
+    used = _stored_bytes()
+    if used <= config['MEDIA_STORE_MAX_BYTES']:
+        db.session.rollback()
+        return 0
+
+    target = config['MEDIA_STORE_MAX_BYTES'] * config['MEDIA_STORE_LOW_WATERMARK']
+    evicted = 0
+    while used > target:
+        cold: List[MediaAsset] = (
+            MediaAsset.query
+            .filter(MediaAsset.status == 'stored')
+            .order_by(MediaAsset.last_accessed_at, MediaAsset.id)
+            .with_for_update(skip_locked=True)
+            .limit(100)
+            .populate_existing()
+            .all()
+        )
+        if not cold:
+            break
+        for asset in cold:
+            if used <= target:
+                break
+            asset.status = 'evicted'
+            evicted += 1
+            db.session.flush()
+            shared = (
+                db.session.query(MediaAsset.id)
+                .filter(MediaAsset.sha256 == asset.sha256, MediaAsset.status == 'stored')
+                .with_for_update()
+                .first()
+            )
+            if shared is None:
+                media_storage.delete(asset.sha256)
+                used -= asset.size or 0
+        db.session.commit()
+
+    logger.info("Evicted %s media assets, %s bytes stored", evicted, used)
+    return evicted
+
+
+def touch(asset: MediaAsset) -> None:
+    """
+    Отмечает обращение к файлу для LRU. Пишет в базу не чаще раза в MEDIA_TOUCH_INTERVAL
+    на файл, поэтому частые воспроизведения не превращаются в запись на каждый запрос.
+    """
+    now = datetime.utcnow()
+    stale = now - timedelta(seconds=current_app.config['MEDIA_TOUCH_INTERVAL'])
+    if asset.last_accessed_at is not None and asset.last_accessed_at > stale:
+        return
+    db.session.execute(
+        update(MediaAsset)
+        .where(MediaAsset.id == asset.id, or_(MediaAsset.last_accessed_at.is_(None), MediaAsset.last_accessed_at <= stale))
+        .values(last_accessed_at=now)
+    )
+    db.session.commit()
+
+
+def requeue(asset: MediaAsset) -> None:
+    """Вытесненный или пропавший из хранилища файл снова нужен: ставим его в очередь копирования."""
+    db.session.execute(
+        update(MediaAsset)
+        .where(MediaAsset.id == asset.id, MediaAsset.status.in_(('evicted', 'stored')))
+        .values(status='pending', attempts=0, next_attempt_at=datetime.utcnow())
+    )
+    db.session.commit()
+
+
+def process_once(concurrency: Optional[int] = None) -> int:
+    """
+    Один проход воркера: ставит в очередь новые готовые биты, копирует до
+    MEDIA_MIRROR_CONCURRENCY файлов параллельно и вытесняет холодные файлы при переполнении.
+
+    Returns:
+        Количество сохраненных файлов.
+    """
+    concurrency = concurrency or current_app.config['MEDIA_MIRROR_CONCURRENCY']
+    enqueue_missing(current_app.config['MEDIA_MIRROR_BATCH_SIZE'])
+    claimed = claim_assets(concurrency)
+
+    stored = 0
+    if claimed:
+        app = current_app._get_current_object()
+
+        def run(asset: Tuple[int, int]) -> bool:
+            with app.app_context():
+                try:
+                    return mirror_asset(*asset)
+                except Exception as e:
+                    db.session.rollback()
+                    logger.error("Error mirroring media asset %s: %s", asset[0], e)
+                    return False
+
+        stored = sum(_get_executor(concurrency).map(run, claimed))
+
+    evict_cold_assets()
+    return stored
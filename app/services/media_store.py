@@ -0,0 +1,113 @@
+import os
+import tempfile
+from typing import Optional
+
+
+class LocalMediaStore:
+    """
+    Файлы в каталоге под ключом sha256: root/ab/cd/abcd...; запись через временный файл
+    и os.replace, поэтому читатель никогда не видит недописанный файл.
+    Файлы отдаются с диска через send_file (sendfile в gunicorn).
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.tmp_dir = os.path.join(root, "tmp")
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key[2:4], key)
+
+    def temp_file(self):
+        """Временный файл на том же разделе, что и хранилище (os.replace без копирования)."""
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        return tempfile.NamedTemporaryFile(dir=self.tmp_dir, delete=False)
+
+    def put(self, key: str, temp_path: str, content_type: Optional[str] = None) -> None:
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(temp_path, path)
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self.path(key))
+
+    def delete(self, key: str) -> None:
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    def local_path(self, key: str) -> Optional[str]:
+        path = self.path(key)
+        return path if os.path.exists(path) else None
+
+    def presigned_url(self, key: str, content_type: Optional[str] = None) -> Optional[str]:
+        return None
+
+
+class S3MediaStore:
+    """
+    Файлы в S3-совместимом хранилище (S3, MinIO) под ключом prefix + sha256. Требует пакет boto3.
+    Клиент получает временную ссылку на объект вместо потока через приложение.
+    """
+
+    def __init__(self, bucket: str, prefix: str = "media/", endpoint_url: Optional[str] = None, url_ttl: int = 300):
+        import boto3  # Необязательная зависимость, нужна только с MEDIA_STORE_BACKEND=s3
+
+        self._client = boto3.client("s3", endpoint_url=endpoint_url or None)
+        self.bucket = bucket
+        self.prefix = prefix
+        self.url_ttl = url_ttl
+
+    def temp_file(self):
+        return tempfile.NamedTemporaryFile(delete=False)
+
+    def put(self, key: str, temp_path: str, content_type: Optional[str] = None) -> None:
+        extra = {"ContentType": content_type} if content_type else {}
+        try:
+            self._client.upload_file(temp_path, self.bucket, self.prefix + key, ExtraArgs=extra)
+        finally:
+            os.remove(temp_path)
+
+    def exists(self, key: str) -> bool:
+        try:
+            self._client.head_object(Bucket=self.bucket, Key=self.prefix + key)
+            return True
+        except self._client.exceptions.ClientError:
+            return False
+
+    def delete(self, key: str) -> None:
+        self._client.delete_object(Bucket=self.bucket, Key=self.prefix + key)
+
+    def local_path(self, key: str) -> Optional[str]:
+        return None
+
+    def presigned_url(self, key: str, content_type: Optional[str] = None) -> Optional[str]:
+        params = {"Bucket": self.bucket, "Key": self.prefix + key}
+        if content_type:
+            params["ResponseContentType"] = content_type
+        return self._client.generate_presigned_url("get_object", Params=params, ExpiresIn=self.url_ttl)
+
+
+class MediaStorage:
+    """Хранилище медиафайлов процесса; backend выбирается в init_app по MEDIA_STORE_BACKEND."""
+
+    def __init__(self):
+        self.backend = None
+
+    def init_app(self, app) -> None:
+        config = app.config
+        if config['MEDIA_STORE_BACKEND'] == 's3':
+            self.backend = S3MediaStore(
+                config['MEDIA_S3_BUCKET'],
+                config['MEDIA_S3_PREFIX'],
+                config['MEDIA_S3_ENDPOINT_URL'],
+                config['MEDIA_S3_URL_TTL'],
+            )
+        else:
+            self.backend = LocalMediaStore(config['MEDIA_STORE_PATH'])
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
+
+
+media_storage = MediaStorage()
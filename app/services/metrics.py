@@ -0,0 +1,255 @@
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Границы корзин гистограмм по умолчанию, сек
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{str(value)}"'.replace("\n", " ") for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, value: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = list(self._values.items())
+        for labels, value in values:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labelnames: Iterable[str] = (), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values: Dict[Tuple[str, ...], list] = {}  # labels -> [счетчики корзин..., +Inf, сумма]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(labels)
+            if counts is None:
+                counts = self._values[labels] = [0] * (len(self.buckets) + 2)
+            counts[index] += 1
+            counts[-1] += value
+
+    def totals(self) -> Dict[Tuple[str, ...], Tuple[int, float]]:
+        """Количество наблюдений и их сумма по меткам."""
+        with self._lock:
+            return {labels: (sum(counts[:-1]), counts[-1]) for labels, counts in self._values.items()}
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            values = [(labels, list(counts)) for labels, counts in self._values.items()]
+        for labels, counts in values:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {counts[-1]}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class Registry:
+    """
+    Метрики процесса в текстовом формате Prometheus.
+
+    Счетчики и гистограммы обновляются по месту; значения, которые уже считают другие
+    модули (пулы соединений, клиент API, лимиты), снимаются коллекторами при каждом /metrics.
+    """
+
+    def __init__(self):
+        self._metrics: List = []
+        self._collectors: List[Callable[[], Iterable[Tuple[str, str, Dict[str, str], float]]]] = []
+
+    def counter(self, *args, **kwargs) -> Counter:
+        metric = Counter(*args, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, *args, **kwargs) -> Histogram:
+        metric = Histogram(*args, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def collector(self, func: Callable):
+        """Регистрирует функцию, которая отдает (имя, help, метки, значение) для gauge-метрик."""
+        self._collectors.append(func)
+        return func
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+
+        described = set()
+        for collect in self._collectors:
+            try:
+                samples = list(collect())
+            except Exception as e:
+                lines.append(f"# collector {collect.__name__} failed: {e}".replace("\n", " "))
+                continue
+            for name, help_text, labels, value in samples:
+                if name not in described:
+                    described.add(name)
+                    lines.append(f"# HELP {name} {help_text}")
+                    lines.append(f"# TYPE {name} gauge")
+                names = tuple(labels)
+                lines.append(f"{name}{_format_labels(names, tuple(labels[key] for key in names))} {value}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds", "Время обработки запроса", ("endpoint", "method", "status"))
+db_queries_per_request = registry.histogram(
+    "http_request_db_queries", "SQL-запросов на один HTTP-запрос", ("endpoint",), buckets=QUERY_COUNT_BUCKETS)
+db_time_per_request = registry.histogram(
+    "http_request_db_seconds", "Время SQL-запросов на один HTTP-запрос", ("endpoint",))
+db_queries = registry.counter("db_queries_total", "Выполнено SQL-запросов", ("engine",))
+db_query_duration = registry.histogram("db_query_duration_seconds", "Время одного SQL-запроса", ("engine",))
+upstream_duration = registry.histogram(
+    "upstream_call_duration_seconds", "Время вызова API генерации", ("function",))
+upstream_calls = registry.counter(
+    "upstream_calls_total", "Вызовы API генерации по результату (ok, error)", ("function", "outcome"))
+
+
+def _endpoint() -> str:
+    # Шаблон маршрута, а не путь: иначе /beats/jobs/<id> даст метку на каждый id
+    rule = request.url_rule
+    return rule.rule if rule is not None else "unmatched"
+
+
+def _before_request() -> None:
+    g.metrics_started = time.perf_counter()
+    g.metrics_db_queries = 0
+    g.metrics_db_seconds = 0.0
+
+
+def _after_request(response):
+    started = g.get('metrics_started')
+    if started is not None:
+        endpoint = _endpoint()
+        http_request_duration.observe(time.perf_counter() - started, endpoint, request.method, str(response.status_code))
+        db_queries_per_request.observe(g.metrics_db_queries, endpoint)
+        db_time_per_request.observe(g.metrics_db_seconds, endpoint)
+    return response
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('metrics_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info['metrics_started'].pop()
+    elapsed = time.perf_counter() - started
+    engine = conn.engine.url.host or conn.engine.url.database or conn.engine.url.drivername
+    db_queries.inc(engine)
+    db_query_duration.observe(elapsed, engine)
+    if has_request_context() and 'metrics_db_queries' in g:
+        g.metrics_db_queries += 1
+        g.metrics_db_seconds += elapsed
+
+
+def _handle_db_error(exception_context):
+    # Запрос упал: снимаем его время старта, чтобы стек не рос
+    connection = exception_context.connection
+    if connection is not None and connection.info.get('metrics_started'):
+        connection.info['metrics_started'].pop()
+
+
+def upstream_call(function: str, is_error: Optional[Callable] = None):
+    """
+    Декоратор функций beat_service: время вызова и результат (ok/error) по имени функции.
+    is_error получает результат функции; функции API возвращают ошибки, а не бросают их.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            outcome = "error"
+            try:
+                result = func(*args, **kwargs)
+                outcome = "error" if is_error is not None and is_error(result) else "ok"
+                return result
+            finally:
+                upstream_duration.observe(time.perf_counter() - started, function)
+                upstream_calls.inc(function, outcome)
+        return wrapper
+    return decorator
+
+
+@registry.collector
+def _collect_service_stats():
+    """Счетчики, которые уже ведут клиент API, очередь к API, лимиты, пулы соединений, кэш пользователей, фильтр email и хеширование паролей."""
+    from app.database import get_pool_stats
+    from app.services import http_client
+    from app.services.email_index import email_index
+    from app.services.identity import identity_cache
+    from app.services.passwords import hasher
+    from app.services.rate_limit import limiter
+
+    client = http_client.get_stats()
+    governor = client.pop("governor")
+    for key, value in client.items():
+        if isinstance(value, (int, float)):
+            yield f"upstream_client_{key}", "Счетчик клиента API генерации", {}, value
+    yield "upstream_breaker_open", "Circuit breaker API генерации разомкнут", {}, int(client["breaker_state"] != "closed")
+    for key, value in governor.items():
+        yield f"upstream_governor_{key}", "Очередь запросов к API генерации", {}, value
+    for key, value in limiter.get_stats().items():
+        yield f"rate_limit_{key}_total", "Решения лимитов частоты запросов", {}, value
+    for key, value in identity_cache.stats.items():
+        yield f"identity_cache_{key}_total", "Обращения к кэшу пользователей", {}, value
+    for key, value in email_index.get_stats().items():
+        name = f"email_index_{key}_total" if key in email_index.stats else f"email_index_{key}"
+        yield name, "Фильтр Блума по email", {}, value
+    for key, value in hasher.get_stats().items():
+        name = "password_hash_pending" if key == "pending" else f"password_hash_{key}_total"
+        yield name, "Хеширование паролей", {}, value
+    for engine, stats in get_pool_stats().items():
+        for key, value in stats.items():
+            if isinstance(value, (int, float)):
+                yield f"db_pool_{key}", "Пул соединений с базой", {"engine": engine}, value
+
+
+def init_app(app) -> None:
+    """Подключает замеры запросов и SQL к приложению, если METRICS_ENABLED."""
+    if not app.config['METRICS_ENABLED']:
+        return
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(Engine, "handle_error", _handle_db_error)
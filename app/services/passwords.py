@@ -0,0 +1,169 @@
+import logging
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Dict, Optional
+
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+logger = logging.getLogger(__name__)
+
+
+class PasswordHashingBusy(RuntimeError):
+    """Очередь хеширования паролей переполнена или не успела за timeout, запрос отклоняется (503)."""
+
+
+def _init_worker() -> None:
+    # Ctrl+C в терминале получает вся группа процессов: пул останавливает родитель
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _pool_context():
+    """
+    Процессы пула запускаются через forkserver (spawn там, где его нет), а не fork:
+    fork копирует многопоточный процесс вместе с захваченными блокировками и
+    запускает в ребенке обработчики register_at_fork приложения (пулы базы, поток логов).
+    Дочерний процесс начинается с чистого интерпретатора: импортирует werkzeug.security
+    и главный модуль как __mp_main__ (точки входа держат запуск под if __name__ == '__main__').
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload(["werkzeug.security"])
+        return context
+    return multiprocessing.get_context("spawn")
+
+
+def normalize_method(method: str) -> str:
+    """
+    Полная запись метода werkzeug с параметрами по умолчанию, в том виде,
+    в каком она стоит в начале хеша: "scrypt" -> "scrypt:32768:8:1",
+    "pbkdf2" -> "pbkdf2:sha256:1000000".
+    """
+    name, *params = method.split(":")
+    if name == "scrypt":
+        defaults = [str(2 ** 15), "8", "1"]
+    elif name == "pbkdf2":
+        defaults = ["sha256", str(DEFAULT_PBKDF2_ITERATIONS)]
+    else:
+        raise ValueError(f"Unsupported password hash method: {method}")
+    return ":".join([name, *params, *defaults[len(params):]])
+
+
+class PasswordHasher:
+    """
+    Хеширование и проверка паролей в отдельном пуле процессов.
+
+    Процессы занимают не больше PASSWORD_HASH_WORKERS ядер, поэтому всплеск логинов
+    не отнимает CPU у остальных роутов. Одновременно в очереди не больше
+    PASSWORD_HASH_MAX_PENDING операций, сверх этого - PasswordHashingBusy.
+    При PASSWORD_HASH_WORKERS=0 хеширует в потоке запроса (разработка).
+    """
+
+    def __init__(self):
+        self.method = normalize_method("scrypt")
+        self.workers = 2
+        self.max_pending = 32
+        self.timeout = 10.0
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._executor_pid: Optional[int] = None
+        self._pending = 0
+        self._lock = threading.Lock()
+        self.stats = {"hashed": 0, "verified": 0, "rehashed": 0, "rejected": 0, "seconds": 0.0}
+
+    def init_app(self, app) -> None:
+        self.method = normalize_method(app.config['PASSWORD_HASH_METHOD'])
+        self.workers = app.config['PASSWORD_HASH_WORKERS']
+        self.max_pending = app.config['PASSWORD_HASH_MAX_PENDING']
+        self.timeout = app.config['PASSWORD_HASH_TIMEOUT']
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # Пул создается лениво и заново после fork: процессы мастера воркеру gunicorn не достаются
+        with self._lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=_pool_context(),
+                    initializer=_init_worker,
+                )
+                self._executor_pid = os.getpid()
+            return self._executor
+
+    def _release(self, started: float) -> None:
+        with self._lock:
+            self._pending -= 1
+            self.stats["seconds"] += time.perf_counter() - started
+
+    def _run(self, func, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.stats["rejected"] += 1
+                raise PasswordHashingBusy("Password hashing queue is full")
+            self._pending += 1
+
+        started = time.perf_counter()
+        if self.workers <= 0:
+            try:
+                return func(*args)
+            finally:
+                self._release(started)
+
+        try:
+            future = self._get_executor().submit(func, *args)
+        except BaseException:
+            self._release(started)
+            raise
+        # Место в очереди освобождается, только когда операция действительно завершилась:
+        # после timeout запущенное хеширование продолжает занимать процесс пула
+        future.add_done_callback(lambda _: self._release(started))
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            with self._lock:
+                self.stats["rejected"] += 1
+            raise PasswordHashingBusy("Password hashing timed out")
+
+    def hash(self, password: str) -> str:
+        hashed = self._run(generate_password_hash, password, self.method)
+        with self._lock:
+            self.stats["hashed"] += 1
+        return hashed
+
+    def verify(self, stored_hash: str, password: str) -> bool:
+        ok = self._run(check_password_hash, stored_hash, password)
+        with self._lock:
+            self.stats["verified"] += 1
+        return ok
+
+    def needs_rehash(self, stored_hash: str) -> bool:
+        """Хеш сделан другим методом или с другой стоимостью, чем PASSWORD_HASH_METHOD."""
+        return stored_hash.split("$", 1)[0] != self.method
+
+    def rehash_if_needed(self, user, password: str) -> bool:
+        """
+        После успешного входа пересчитывает устаревший хеш пользователя под текущие настройки.
+        Не коммитит. Если пул занят, оставляет старый хеш до следующего входа.
+
+        Returns:
+            True, если хеш обновлен.
+        """
+        if not self.needs_rehash(user.password):
+            return False
+        try:
+            user.password = self.hash(password)
+        except PasswordHashingBusy:
+            return False
+        with self._lock:
+            self.stats["rehashed"] += 1
+        logger.info("Rehashed password of user %s with %s", user.id, self.method)
+        return True
+
+    def get_stats(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(self.stats, pending=self._pending)
+
+
+hasher = PasswordHasher()
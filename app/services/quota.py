@@ -0,0 +1,88 @@
+import logging
+from sqlalchemy import case, select, update
+
+from app import db
+from app.models import SubscriptionPlan, User
+
+logger = logging.getLogger(__name__)
+
+
+def reserve(user_id: int) -> bool:
+    """
+    Резервирует одну генерацию одним условным UPDATE и сразу коммитит его,
+    чтобы строка пользователя не была заблокирована на время запроса к API.
+
+    Returns:
+        True, если генерация зарезервирована; False, если лимит исчерпан.
+    """
+    result = db.session.execute(
+        update(User)
+        .where(User.id == user_id, User.available_generations > 0)
+        .values(available_generations=User.available_generations - 1)
+    )
+    db.session.commit()
+    return result.rowcount == 1
+
+
+def release(user_id: int) -> None:
+    """Возвращает зарезервированную генерацию, если генерация не состоялась."""
+    db.session.rollback()
+    db.session.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values(available_generations=User.available_generations + 1)
+    )
+    db.session.commit()
+    logger.info("Released generation reservation for user %s", user_id)
+
+
+def confirm(user_id: int) -> None:
+    """
+    Засчитывает зарезервированную генерацию. Не коммитит: вызывается в транзакции,
+    которая сохраняет созданные биты.
+    """
+    db.session.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values(total_generations=db.func.coalesce(User.total_generations, 0) + 1)
+    )
+
+
+def refund(user_id: int) -> None:
+    """
+    Возвращает уже засчитанную генерацию, например если задание генерации не выполнилось.
+    Не коммитит.
+    """
+    db.session.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values(
+            available_generations=User.available_generations + 1,
+            total_generations=case((User.total_generations > 0, User.total_generations - 1), else_=0),
+        )
+    )
+
+
+def sync_with_plans() -> int:
+    """
+    Сверяет остаток генераций с тарифом: available = max(max_generations - total_generations, 0).
+    Резервы, которые еще не подтверждены, при этом возвращаются в остаток, поэтому
+    запускать лучше при низкой нагрузке (flask quota sync).
+
+    Returns:
+        Количество исправленных пользователей.
+    """
+    allowance = (
+        select(SubscriptionPlan.max_generations - db.func.coalesce(User.total_generations, 0))
+        .where(SubscriptionPlan.id == User.subscription_plan_id)
+        .scalar_subquery()
+    )
+    expected = case((allowance > 0, allowance), else_=0)
+    result = db.session.execute(
+        update(User)
+        .where(User.available_generations != expected)
+        .values(available_generations=expected)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return result.rowcount
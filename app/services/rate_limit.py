@@ -0,0 +1,226 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+from functools import wraps
+from typing import Callable, Dict, Optional, Tuple
+
+import requests
+from flask import current_app, g, has_app_context, has_request_context, jsonify, request
+from flask_jwt_extended import get_jwt_identity
+
+logger = logging.getLogger(__name__)
+
+# Приоритет запросов к API вне контекста приложения (потоки пакетного опроса)
+BACKGROUND_PRIORITY = 100
+
+
+def parse_rate(value: str) -> Tuple[float, int]:
+    """
+    Разбирает лимит вида "5/60" (5 запросов за 60 секунд).
+
+    Returns:
+        (скорость пополнения в токенах в секунду, размер корзины).
+    """
+    count, seconds = value.split("/")
+    return int(count) / float(seconds), int(count)
+
+
+class MemoryBucketStore:
+    """Корзины токенов в памяти процесса."""
+
+    def __init__(self):
+        self._buckets: Dict[str, Tuple[float, float]] = {}  # key -> (токенов, время обновления)
+        self._lock = threading.Lock()
+
+    def hit(self, key: str, rate: float, burst: int) -> Tuple[bool, float]:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (float(burst), now))
+            tokens = min(float(burst), tokens + (now - updated) * rate)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                return True, 0.0
+            self._buckets[key] = (tokens, now)
+            return False, (1 - tokens) / rate
+
+
+class RedisBucketStore:
+    """Корзины токенов в Redis, общие для всех процессов. Требует пакет redis."""
+
+    SCRIPT = """
+    local tokens = tonumber(redis.call('HGET', KEYS[1], 't') or ARGV[2])
+    local updated = tonumber(redis.call('HGET', KEYS[1], 'u') or ARGV[3])
+    local rate, burst, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+    tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+    local allowed = 0
+    if tokens >= 1 then
+        tokens = tokens - 1
+        allowed = 1
+    end
+    redis.call('HSET', KEYS[1], 't', tokens, 'u', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+    return {allowed, tostring(tokens)}
+    """
+
+    def __init__(self, url: str, prefix: str = "beatmaker:bucket:"):
+        import redis  # Необязательная зависимость, нужна только с RATE_LIMIT_BACKEND=redis
+
+        self._client = redis.Redis.from_url(url)
+        self._script = self._client.register_script(self.SCRIPT)
+        self._prefix = prefix
+
+    def hit(self, key: str, rate: float, burst: int) -> Tuple[bool, float]:
+        allowed, tokens = self._script(keys=[self._prefix + key], args=[rate, burst, time.time()])
+        if allowed:
+            return True, 0.0
+        return False, (1 - float(tokens)) / rate
+
+
+class GovernorTimeout(requests.exceptions.ConnectionError):
+    """Запрос к API генерации не дождался своей очереди."""
+
+
+class UpstreamGovernor:
+    """
+    Ограничивает запросы к API генерации: не больше max_in_flight одновременно в процессе
+    и не больше per_second в секунду (общая корзина в хранилище лимитов).
+    Ожидающие запросы пропускаются по приоритету тарифа (меньше - раньше), затем по очереди.
+    """
+
+    def __init__(self):
+        self.max_in_flight = 8
+        self.per_second = 5.0
+        self.timeout = 30.0
+        self.store = MemoryBucketStore()
+        self.in_flight = 0
+        self._waiters = []
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self.stats = {"admitted": 0, "queued": 0, "timed_out": 0}
+
+    def acquire(self, priority: int) -> None:
+        """
+        Raises:
+            GovernorTimeout: если за timeout секунд очередь не дошла.
+        """
+        deadline = time.monotonic() + self.timeout
+        entry = (priority, next(self._counter))
+        with self._cond:
+            heapq.heappush(self._waiters, entry)
+            waited = False
+            try:
+                while True:
+                    wait = deadline - time.monotonic()
+                    if self._waiters[0] == entry and self.in_flight < self.max_in_flight:
+                        allowed, retry_after = self.store.hit("upstream", self.per_second, max(1, int(self.per_second)))
+                        if allowed:
+                            heapq.heappop(self._waiters)
+                            self.in_flight += 1
+                            self.stats["admitted"] += 1
+                            self._cond.notify_all()
+                            return
+                        wait = min(wait, retry_after)
+                    if deadline - time.monotonic() <= 0:
+                        self.stats["timed_out"] += 1
+                        raise GovernorTimeout("LoveAI API request queue timeout")
+                    if not waited:
+                        waited = True
+                        self.stats["queued"] += 1
+                    self._cond.wait(max(wait, 0.001))
+            except BaseException:
+                if entry in self._waiters:
+                    self._waiters.remove(entry)
+                    heapq.heapify(self._waiters)
+                self._cond.notify_all()
+                raise
+
+    def release(self) -> None:
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._cond:
+            return dict(self.stats, in_flight=self.in_flight, waiting=len(self._waiters))
+
+
+class RateLimiter:
+    def __init__(self):
+        self.store = MemoryBucketStore()
+        self.enabled = True
+        self.stats = {"allowed": 0, "throttled": 0}
+        self._lock = threading.Lock()
+
+    def init_app(self, app) -> None:
+        self.enabled = app.config['RATE_LIMIT_ENABLED']
+        if app.config['RATE_LIMIT_BACKEND'] == 'redis':
+            self.store = RedisBucketStore(app.config['RATE_LIMIT_REDIS_URL'])
+        else:
+            self.store = MemoryBucketStore()
+
+        governor.store = self.store
+        governor.max_in_flight = app.config['UPSTREAM_MAX_IN_FLIGHT']
+        governor.per_second = app.config['UPSTREAM_MAX_PER_SECOND']
+        governor.timeout = app.config['UPSTREAM_QUEUE_TIMEOUT']
+
+    def hit(self, key: str, limit: str) -> Tuple[bool, float]:
+        rate, burst = parse_rate(limit)
+        allowed, retry_after = self.store.hit(key, rate, burst)
+        with self._lock:
+            self.stats["allowed" if allowed else "throttled"] += 1
+        return allowed, retry_after
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.stats)
+
+
+limiter = RateLimiter()
+governor = UpstreamGovernor()
+
+
+def user_key() -> str:
+    return f"user:{get_jwt_identity()}"
+
+
+def ip_key() -> str:
+    return f"ip:{request.remote_addr}"
+
+
+def rate_limited(scope: str, config_key: str, key_func: Callable[[], str] = ip_key):
+    """
+    Декоратор роута: корзина токенов на ключ (пользователь или IP) с лимитом из config_key.
+    При превышении отвечает 429 с Retry-After.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if limiter.enabled:
+                allowed, retry_after = limiter.hit(f"{scope}:{key_func()}", current_app.config[config_key])
+                if not allowed:
+                    logger.warning("Rate limit exceeded for %s by %s", scope, key_func())
+                    response = jsonify({"msg": "Too many requests"})
+                    response.headers['Retry-After'] = str(int(retry_after) + 1)
+                    return response, 429
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def upstream_priority() -> int:
+    """Приоритет текущего запроса к API: задается по тарифу (g.upstream_priority), фоновые задачи - последние."""
+    if not has_app_context():
+        return BACKGROUND_PRIORITY
+    priority = g.get('upstream_priority')
+    if priority is not None:
+        return priority
+    if has_request_context():
+        return current_app.config['UPSTREAM_DEFAULT_PRIORITY']
+    return current_app.config['UPSTREAM_BACKGROUND_PRIORITY']
+
+
+def plan_priority(plan_name: Optional[str]) -> int:
+    priorities = current_app.config['UPSTREAM_PLAN_PRIORITIES']
+    return priorities.get(plan_name, current_app.config['UPSTREAM_DEFAULT_PRIORITY'])
@@ -0,0 +1,105 @@
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+
+from flask import current_app
+
+from app import db
+from app.models import Beat
+from app.services.beat_service import get_beats_by_ids
+from app.services.beat_completion import extract_completed_tracks, apply_completions
+from app.services.worker import run_periodic
+
+logger = logging.getLogger(__name__)
+
+
+class TaskBackoff:
+    """
+    Расписание опроса задач: после каждого неготового ответа интервал удваивается до потолка.
+    """
+
+    def __init__(self, base: float, maximum: float):
+        self.base = base
+        self.maximum = maximum
+        self._state: Dict[str, Tuple[int, float]] = {}  # task_id -> (попыток, когда опрашивать)
+
+    def is_due(self, task_id: str, now: float) -> bool:
+        state = self._state.get(task_id)
+        return state is None or state[1] <= now
+
+    def schedule(self, task_id: str, now: float) -> None:
+        attempts = self._state.get(task_id, (0, 0.0))[0] + 1
+        delay = min(self.base * (2 ** (attempts - 1)), self.maximum)
+        self._state[task_id] = (attempts, now + delay)
+
+    def forget(self, task_id: str) -> None:
+        self._state.pop(task_id, None)
+
+    def retain(self, task_ids: set) -> None:
+        """Удаляет состояние задач, которых больше нет среди in_progress."""
+        for task_id in list(self._state):
+            if task_id not in task_ids:
+                del self._state[task_id]
+
+
+def iter_in_progress_task_ids(batch_size: int):
+    """
+    Обходит биты со статусом in_progress пачками по id и отдает task_id каждой пачки.
+    Биты, задание которых еще в очереди (task_id пустой), пропускаются.
+    """
+    last_id = 0
+    while True:
+        rows = (
+            db.session.query(Beat.id, Beat.task_id)
+            .filter(Beat.status == 'in_progress', Beat.task_id.isnot(None), Beat.id > last_id)
+            .order_by(Beat.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not rows:
+            return
+        last_id = rows[-1].id
+        yield list(dict.fromkeys(row.task_id for row in rows))
+
+
+def reconcile_once(backoff: TaskBackoff, batch_size: Optional[int] = None) -> int:
+    """
+    Один проход сверки: опрашивает API по всем задачам, у которых подошло время, и
+    записывает готовые биты в базу.
+
+    Returns:
+        Количество битов, переведенных в completed.
+    """
+    batch_size = batch_size or current_app.config['RECONCILER_BATCH_SIZE']
+    completed = 0
+    seen = set()
+
+    for task_ids in iter_in_progress_task_ids(batch_size):
+        now = time.monotonic()
+        due: List[str] = [task_id for task_id in task_ids if task_id not in seen and backoff.is_due(task_id, now)]
+        seen.update(task_ids)
+
+        # Готовые задачи пачки записываются одним UPDATE и одним коммитом
+        completions = {}
+        for task_id, beat_info in get_beats_by_ids(due).items():
+            tracks = extract_completed_tracks(beat_info)
+            if tracks is None:
+                backoff.schedule(task_id, time.monotonic())
+                continue
+            completions[task_id] = tracks
+            backoff.forget(task_id)
+        completed += apply_completions(completions)
+
+        # Не держим транзакцию открытой между пачками
+        db.session.rollback()
+
+    backoff.retain(seen)
+    return completed
+
+
+def run_forever(app) -> None:
+    """
+    Бесконечный цикл сверки статусов битов с API генерации.
+    """
+    backoff = TaskBackoff(app.config['RECONCILER_BACKOFF_BASE'], app.config['RECONCILER_BACKOFF_MAX'])
+    run_periodic(app, "Reconciler", app.config['RECONCILER_INTERVAL'], lambda: reconcile_once(backoff))
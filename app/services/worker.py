@@ -0,0 +1,31 @@
+import logging
+import time
+from typing import Callable
+
+from app import db
+
+logger = logging.getLogger(__name__)
+
+
+def run_periodic(app, name: str, interval: float, task: Callable[[], int]) -> None:
+    """
+    Бесконечно вызывает task в контексте приложения раз в interval секунд.
+
+    task возвращает количество обработанных объектов; ошибки логируются, цикл продолжается.
+    """
+    with app.app_context():
+        logger.info("%s started, interval %ss", name, interval)
+
+        while True:
+            started = time.monotonic()
+            try:
+                processed = task()
+                if processed:
+                    logger.info("%s processed %s items", name, processed)
+            except Exception as e:
+                db.session.rollback()
+                logger.error("Error in %s pass: %s", name, e)
+            finally:
+                db.session.remove()
+
+            time.sleep(max(0.0, interval - (time.monotonic() - started)))
@@ -0,0 +1,11 @@
+from app import create_app
+from app.services.generation_queue import process_once
+from app.services.worker import run_periodic
+
+# Создание приложения
+app = create_app()
+
+# Отдельный процесс, который запускает задания из очереди generation_jobs в API генерации.
+# Пропускная способность растет с числом процессов и GENERATION_WORKER_CONCURRENCY
+if __name__ == '__main__':
+    run_periodic(app, "Generation worker", app.config['GENERATION_QUEUE_INTERVAL'], process_once)
@@ -0,0 +1,10 @@
+from app import create_app
+from app.services.mail_queue import send_pending
+from app.services.worker import run_periodic
+
+# Создание приложения
+app = create_app()
+
+# Отдельный процесс, который отправляет письма из очереди outbound_emails
+if __name__ == '__main__':
+    run_periodic(app, "Mail worker", app.config['MAIL_QUEUE_INTERVAL'], send_pending)
@@ -0,0 +1,10 @@
+from app import create_app
+from app.services.media_mirror import process_once
+from app.services.worker import run_periodic
+
+# Создание приложения
+app = create_app()
+
+# Отдельный процесс, который копирует треки и обложки готовых битов в локальное хранилище
+if __name__ == '__main__':
+    run_periodic(app, "Media worker", app.config['MEDIA_MIRROR_INTERVAL'], process_once)
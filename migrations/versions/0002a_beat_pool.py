@@ -0,0 +1,45 @@
+"""beat pool
+
+Биты без владельца (пул жанра) и пары битов на одну задачу генерации,
+целевой размер пула жанра.
+
+Revision ID: 0002a_beat_pool
+Revises: 0001_baseline
+Create Date: 2026-10-18 11:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002a_beat_pool'
+down_revision = '0001_baseline'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('beats', schema=None) as batch_op:
+        batch_op.drop_constraint('task_id', type_='unique')
+        batch_op.create_index(batch_op.f('ix_beats_task_id'), ['task_id'], unique=False)
+        batch_op.alter_column('user_id', existing_type=sa.Integer(), nullable=True)
+
+    with op.batch_alter_table('genre_prompts', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('pool_target', sa.Integer(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('genre_prompts', schema=None) as batch_op:
+        batch_op.drop_column('pool_target')
+
+    # Биты пула и вторые биты задач не помещаются в старую схему
+    op.execute("DELETE FROM beats WHERE user_id IS NULL")
+    op.execute(
+        "DELETE FROM beats WHERE id NOT IN ("
+        "SELECT first_id FROM (SELECT MIN(id) AS first_id FROM beats GROUP BY task_id) AS firsts)"
+    )
+    with op.batch_alter_table('beats', schema=None) as batch_op:
+        batch_op.alter_column('user_id', existing_type=sa.Integer(), nullable=False)
+        batch_op.drop_index(batch_op.f('ix_beats_task_id'))
+        batch_op.create_unique_constraint('task_id', ['task_id'])
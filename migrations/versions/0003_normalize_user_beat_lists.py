@@ -0,0 +1,82 @@
+"""normalize user beat lists
+
+Списки битов пользователя (users.current_generating_beats и
+users.successful_generated_beats) заменены запросами к beats по (user_id, status).
+
+Revision ID: 0003_normalize_user_beat_lists
+Revises: 0002b_mail_queue
+Create Date: 2026-10-18 11:50:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003_normalize_user_beat_lists'
+down_revision = '0002b_mail_queue'
+branch_labels = None
+depends_on = None
+
+users = sa.table(
+    'users',
+    sa.column('id', sa.Integer),
+    sa.column('current_generating_beats', sa.JSON),
+    sa.column('successful_generated_beats', sa.JSON),
+)
+beats = sa.table(
+    'beats',
+    sa.column('id', sa.Integer),
+    sa.column('user_id', sa.Integer),
+    sa.column('status', sa.String),
+)
+
+
+def upgrade():
+    with op.batch_alter_table('beats', schema=None) as batch_op:
+        batch_op.create_index('ix_beats_user_status', ['user_id', 'status'], unique=False)
+
+    # Переносим владельца из JSON-списков в beats.user_id там, где его нет
+    connection = op.get_bind()
+    rows = connection.execute(
+        sa.select(users.c.id, users.c.current_generating_beats, users.c.successful_generated_beats)
+    ).fetchall()
+    for user_id, generating, successful in rows:
+        beat_ids = [beat_id for beat_id in (generating or []) + (successful or []) if isinstance(beat_id, int)]
+        if beat_ids:
+            connection.execute(
+                beats.update()
+                .where(beats.c.id.in_(beat_ids), beats.c.user_id.is_(None))
+                .values(user_id=user_id)
+            )
+
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('current_generating_beats')
+        batch_op.drop_column('successful_generated_beats')
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('current_generating_beats', sa.JSON(), nullable=True))
+        batch_op.add_column(sa.Column('successful_generated_beats', sa.JSON(), nullable=True))
+
+    # Восстанавливаем списки из beats
+    connection = op.get_bind()
+    lists = {}
+    rows = connection.execute(
+        sa.select(beats.c.user_id, beats.c.status, beats.c.id)
+        .where(beats.c.user_id.is_not(None), beats.c.status.in_(['in_progress', 'completed']))
+        .order_by(beats.c.id)
+    ).fetchall()
+    for user_id, status, beat_id in rows:
+        generating, successful = lists.setdefault(user_id, ([], []))
+        (generating if status == 'in_progress' else successful).append(beat_id)
+    for user_id, (generating, successful) in lists.items():
+        connection.execute(
+            users.update()
+            .where(users.c.id == user_id)
+            .values(current_generating_beats=generating, successful_generated_beats=successful)
+        )
+
+    with op.batch_alter_table('beats', schema=None) as batch_op:
+        batch_op.drop_index('ix_beats_user_status')
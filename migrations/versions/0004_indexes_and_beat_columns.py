@@ -0,0 +1,70 @@
+"""indexes and beat columns
+
+Составные индексы под реальные запросы к beats и verification_code, статус бита
+как ENUM, недостающие колонки beats.title, beats.image_url, users.available_generations.
+
+Revision ID: 0004_indexes_and_beat_columns
+Revises: 0003_normalize_user_beat_lists
+Create Date: 2026-10-18 11:26:23.617243
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004_indexes_and_beat_columns'
+down_revision = '0003_normalize_user_beat_lists'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Все неизвестные статусы считаем неуспешными, иначе ENUM их не примет
+    op.execute("UPDATE beats SET status = 'failed' WHERE status NOT IN ('in_progress', 'completed', 'failed')")
+
+    with op.batch_alter_table('beats', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('title', sa.String(length=255), nullable=True))
+        batch_op.add_column(sa.Column('image_url', sa.String(length=255), nullable=True))
+        batch_op.alter_column('status',
+               existing_type=sa.VARCHAR(length=50),
+               type_=sa.Enum('in_progress', 'completed', 'failed', name='beat_status'),
+               existing_nullable=False)
+        batch_op.drop_index('ix_beats_task_id')
+        batch_op.create_index('ix_beats_status', ['status'], unique=False)
+        batch_op.create_index('ix_beats_task_user', ['task_id', 'user_id'], unique=False)
+        batch_op.create_index('ix_beats_user_genre_status', ['user_id', 'genre', 'status'], unique=False)
+
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('available_generations', sa.Integer(), server_default='0', nullable=False))
+
+    # Остаток генераций существующих пользователей: лимит тарифа минус уже сгенерированное
+    op.execute(
+        "UPDATE users SET available_generations = COALESCE(("
+        "SELECT CASE WHEN subscription_plans.max_generations > COALESCE(users.total_generations, 0) "
+        "THEN subscription_plans.max_generations - COALESCE(users.total_generations, 0) ELSE 0 END "
+        "FROM subscription_plans WHERE subscription_plans.id = users.subscription_plan_id), 0)"
+    )
+
+    with op.batch_alter_table('verification_code', schema=None) as batch_op:
+        batch_op.create_index('ix_verification_code_user_code', ['user_id', 'code'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('verification_code', schema=None) as batch_op:
+        batch_op.drop_index('ix_verification_code_user_code')
+
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('available_generations')
+
+    with op.batch_alter_table('beats', schema=None) as batch_op:
+        batch_op.drop_index('ix_beats_user_genre_status')
+        batch_op.drop_index('ix_beats_task_user')
+        batch_op.drop_index('ix_beats_status')
+        batch_op.create_index('ix_beats_task_id', ['task_id'], unique=False)
+        batch_op.alter_column('status',
+               existing_type=sa.Enum('in_progress', 'completed', 'failed', name='beat_status'),
+               type_=sa.VARCHAR(length=50),
+               existing_nullable=False)
+        batch_op.drop_column('image_url')
+        batch_op.drop_column('title')
@@ -0,0 +1,48 @@
+"""beat list pagination
+
+Время изменения бита и индексы под keyset-страницы /beats/list по (created_at, id)
+и выборку изменений по (updated_at, id).
+
+Revision ID: 0005_beat_list_pagination
+Revises: 0004_indexes_and_beat_columns
+Create Date: 2026-10-18 11:27:51.904822
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005_beat_list_pagination'
+down_revision = '0004_indexes_and_beat_columns'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("UPDATE beats SET created_at = CURRENT_TIMESTAMP WHERE created_at IS NULL")
+
+    with op.batch_alter_table('beats', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+
+    op.execute("UPDATE beats SET updated_at = created_at")
+
+    # Новые индексы с префиксом user_id создаем раньше, чем удаляем старый:
+    # на MySQL один из них должен оставаться под внешним ключом beats.user_id
+    with op.batch_alter_table('beats', schema=None) as batch_op:
+        batch_op.alter_column('updated_at', existing_type=sa.DateTime(), nullable=False)
+        batch_op.alter_column('created_at', existing_type=sa.DateTime(), nullable=False)
+        batch_op.create_index('ix_beats_user_created', ['user_id', 'created_at', 'id'], unique=False)
+        batch_op.create_index('ix_beats_user_updated', ['user_id', 'updated_at', 'id'], unique=False)
+        batch_op.drop_index('ix_beats_user_status')
+        batch_op.create_index('ix_beats_user_status', ['user_id', 'status', 'created_at', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('beats', schema=None) as batch_op:
+        batch_op.drop_index('ix_beats_user_status')
+        batch_op.create_index('ix_beats_user_status', ['user_id', 'status'], unique=False)
+        batch_op.drop_index('ix_beats_user_updated')
+        batch_op.drop_index('ix_beats_user_created')
+        batch_op.alter_column('created_at', existing_type=sa.DateTime(), nullable=True)
+        batch_op.drop_column('updated_at')
@@ -0,0 +1,70 @@
+"""generation job queue
+
+Очередь заданий генерации: биты создаются сразу без task_id и ссылаются на задание,
+task_id записывает generation_worker.py после запуска задачи в API.
+
+Revision ID: 0006_generation_job_queue
+Revises: 0005_beat_list_pagination
+Create Date: 2026-10-18 11:34:27.206589
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006_generation_job_queue'
+down_revision = '0005_beat_list_pagination'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('generation_jobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('genre', sa.String(length=50), nullable=False),
+    sa.Column('prompt', sa.Text(), nullable=False),
+    sa.Column('idempotency_key', sa.String(length=120), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('priority', sa.Integer(), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+    sa.Column('locked_until', sa.DateTime(), nullable=True),
+    sa.Column('task_id', sa.String(length=120), nullable=True),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('idempotency_key')
+    )
+    with op.batch_alter_table('generation_jobs', schema=None) as batch_op:
+        batch_op.create_index('ix_generation_jobs_status_next_attempt', ['status', 'next_attempt_at'], unique=False)
+
+    with op.batch_alter_table('beats', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('job_id', sa.Integer(), nullable=True))
+        batch_op.alter_column('task_id',
+               existing_type=sa.String(length=120),
+               nullable=True)
+        batch_op.create_index('ix_beats_job', ['job_id'], unique=False)
+        batch_op.create_foreign_key('fk_beats_job_id', 'generation_jobs', ['job_id'], ['id'])
+
+
+
+def downgrade():
+    # Биты заданий, которые так и не запустились, без task_id в старой схеме не сохранить
+    op.execute("DELETE FROM beats WHERE task_id IS NULL")
+
+    with op.batch_alter_table('beats', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_beats_job_id', type_='foreignkey')
+        batch_op.drop_index('ix_beats_job')
+        batch_op.alter_column('task_id',
+               existing_type=sa.String(length=120),
+               nullable=False)
+        batch_op.drop_column('job_id')
+
+    with op.batch_alter_table('generation_jobs', schema=None) as batch_op:
+        batch_op.drop_index('ix_generation_jobs_status_next_attempt')
+
+    op.drop_table('generation_jobs')
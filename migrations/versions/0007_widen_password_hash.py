@@ -0,0 +1,35 @@
+"""widen password hash
+
+Хеш scrypt из werkzeug (метод по умолчанию) длиннее 128 символов, а параметры
+метода настраиваются через PASSWORD_HASH_METHOD, поэтому колонка расширена до 255.
+
+Revision ID: 0007_widen_password_hash
+Revises: 0006_generation_job_queue
+Create Date: 2026-10-18 11:52:40.318207
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007_widen_password_hash'
+down_revision = '0006_generation_job_queue'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.alter_column('password',
+               existing_type=sa.String(length=128),
+               type_=sa.String(length=255),
+               existing_nullable=False)
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.alter_column('password',
+               existing_type=sa.String(length=255),
+               type_=sa.String(length=128),
+               existing_nullable=False)
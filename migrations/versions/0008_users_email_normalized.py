@@ -0,0 +1,43 @@
+"""users email normalized
+
+Email в нижнем регистре без пробелов по краям с уникальным индексом: поиск в /auth
+без учета регистра и один аккаунт на адрес.
+
+Revision ID: 0008_users_email_normalized
+Revises: 0007_widen_password_hash
+Create Date: 2026-10-18 12:04:13.552190
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0008_users_email_normalized'
+down_revision = '0007_widen_password_hash'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('email_normalized', sa.String(length=120), nullable=True))
+
+    op.execute("UPDATE users SET email_normalized = LOWER(TRIM(email))")
+
+    # Адреса, различающиеся только регистром, уникальный индекс не пропустит: их нужно разобрать вручную
+    duplicates = op.get_bind().execute(sa.text(
+        "SELECT email_normalized FROM users GROUP BY email_normalized HAVING COUNT(*) > 1"
+    )).scalars().all()
+    if duplicates:
+        raise RuntimeError(f"Users with emails differing only in case or spaces: {', '.join(duplicates[:20])}")
+
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.alter_column('email_normalized', existing_type=sa.String(length=120), nullable=False)
+        batch_op.create_index('ux_users_email_normalized', ['email_normalized'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_index('ux_users_email_normalized')
+        batch_op.drop_column('email_normalized')
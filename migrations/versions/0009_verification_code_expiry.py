@@ -0,0 +1,57 @@
+"""verification code expiry
+
+Срок действия и счетчик неверных вводов кодов подтверждения, индексы под поиск
+последнего кода пользователя и под фоновую очистку истекших кодов (purge_worker.py).
+
+Revision ID: 0009_verification_code_expiry
+Revises: 0008_users_email_normalized
+Create Date: 2026-10-18 12:21:05.774913
+
+"""
+from datetime import datetime, timedelta
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0009_verification_code_expiry'
+down_revision = '0008_users_email_normalized'
+branch_labels = None
+depends_on = None
+
+# Уже выданные коды не истекали; даем им час, чтобы не сломать подтверждение посреди регистрации
+LEGACY_CODE_GRACE = timedelta(hours=1)
+
+
+def upgrade():
+    with op.batch_alter_table('verification_code', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('expires_at', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('attempts', sa.Integer(), server_default='0', nullable=False))
+
+    now = datetime.utcnow()
+    op.get_bind().execute(
+        sa.text("UPDATE verification_code SET created_at = :now WHERE created_at IS NULL"), {"now": now}
+    )
+    op.get_bind().execute(
+        sa.text("UPDATE verification_code SET expires_at = :expires"), {"expires": now + LEGACY_CODE_GRACE}
+    )
+
+    # Новый индекс с префиксом user_id создаем раньше, чем удаляем старый:
+    # на MySQL один из них должен оставаться под внешним ключом verification_code.user_id
+    with op.batch_alter_table('verification_code', schema=None) as batch_op:
+        batch_op.alter_column('created_at', existing_type=sa.DateTime(), nullable=False)
+        batch_op.alter_column('expires_at', existing_type=sa.DateTime(), nullable=False)
+        batch_op.create_index('ix_verification_code_user_created', ['user_id', 'created_at'], unique=False)
+        batch_op.create_index('ix_verification_code_expires', ['expires_at'], unique=False)
+        batch_op.drop_index('ix_verification_code_user_code')
+
+
+def downgrade():
+    with op.batch_alter_table('verification_code', schema=None) as batch_op:
+        batch_op.create_index('ix_verification_code_user_code', ['user_id', 'code'], unique=False)
+        batch_op.drop_index('ix_verification_code_expires')
+        batch_op.drop_index('ix_verification_code_user_created')
+        batch_op.alter_column('created_at', existing_type=sa.DateTime(), nullable=True)
+        batch_op.drop_column('attempts')
+        batch_op.drop_column('expires_at')
@@ -0,0 +1,65 @@
+"""media assets
+
+Локальные копии треков и обложек готовых битов (media_worker.py) и ссылки на них из beats.
+
+Revision ID: 0010_media_assets
+Revises: 0009_verification_code_expiry
+Create Date: 2026-10-18 11:52:28.135469
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0010_media_assets'
+down_revision = '0009_verification_code_expiry'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('media_assets',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(length=10), nullable=False),
+    sa.Column('source_url', sa.String(length=255), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('sha256', sa.String(length=64), nullable=True),
+    sa.Column('size', sa.BigInteger(), nullable=True),
+    sa.Column('content_type', sa.String(length=100), nullable=True),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('last_accessed_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('media_assets', schema=None) as batch_op:
+        batch_op.create_index('ix_media_assets_sha256', ['sha256'], unique=False)
+        batch_op.create_index('ix_media_assets_status_accessed', ['status', 'last_accessed_at'], unique=False)
+        batch_op.create_index('ix_media_assets_status_next_attempt', ['status', 'next_attempt_at'], unique=False)
+
+    with op.batch_alter_table('beats', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('audio_asset_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('image_asset_id', sa.Integer(), nullable=True))
+        batch_op.create_index('ix_beats_audio_asset', ['audio_asset_id', 'status'], unique=False)
+        batch_op.create_index('ix_beats_image_asset', ['image_asset_id'], unique=False)
+        batch_op.create_foreign_key('fk_beats_audio_asset_id', 'media_assets', ['audio_asset_id'], ['id'])
+        batch_op.create_foreign_key('fk_beats_image_asset_id', 'media_assets', ['image_asset_id'], ['id'])
+
+
+def downgrade():
+    with op.batch_alter_table('beats', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_beats_image_asset_id', type_='foreignkey')
+        batch_op.drop_constraint('fk_beats_audio_asset_id', type_='foreignkey')
+        batch_op.drop_index('ix_beats_image_asset')
+        batch_op.drop_index('ix_beats_audio_asset')
+        batch_op.drop_column('image_asset_id')
+        batch_op.drop_column('audio_asset_id')
+
+    with op.batch_alter_table('media_assets', schema=None) as batch_op:
+        batch_op.drop_index('ix_media_assets_status_next_attempt')
+        batch_op.drop_index('ix_media_assets_status_accessed')
+        batch_op.drop_index('ix_media_assets_sha256')
+
+    op.drop_table('media_assets')
@@ -0,0 +1,28 @@
+"""users created_at index
+
+Индекс по users.created_at: фильтр Блума в /auth подхватывает новые регистрации
+по времени создания с запасом, а не по id.
+
+Revision ID: 0011_users_created_at_index
+Revises: 0010_media_assets
+Create Date: 2026-10-18 18:41:37.204518
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0011_users_created_at_index'
+down_revision = '0010_media_assets'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.create_index('ix_users_created_at', ['created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_index('ix_users_created_at')
@@ -0,0 +1,10 @@
+from app import create_app
+from app.services.auth_service import purge_expired_codes
+from app.services.worker import run_periodic
+
+# Создание приложения
+app = create_app()
+
+# Отдельный процесс, который небольшими пачками удаляет истекшие коды подтверждения
+if __name__ == '__main__':
+    run_periodic(app, "Purge worker", app.config['VERIFICATION_PURGE_INTERVAL'], purge_expired_codes)
@@ -0,0 +1,9 @@
+from app import create_app
+from app.services.reconciler import run_forever
+
+# Создание приложения
+app = create_app()
+
+# Отдельный процесс, который сверяет статусы битов с API генерации
+if __name__ == '__main__':
+    run_forever(app)
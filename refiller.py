@@ -0,0 +1,10 @@
+from app import create_app
+from app.services.beat_pool import refill_once
+from app.services.worker import run_periodic
+
+# Создание приложения
+app = create_app()
+
+# Отдельный процесс, который держит пул свободных битов каждого жанра заполненным
+if __name__ == '__main__':
+    run_periodic(app, "Pool refiller", app.config['GENRE_POOL_REFILL_INTERVAL'], refill_once)
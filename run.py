@@ -1,13 +1,8 @@
-from app import create_app, db
+from app import create_app
 
-
-
-# Создание приложения
+# Создание приложения. Таблицы создаются командой flask init-db или миграциями (flask db upgrade)
 app = create_app()
 
-with app.app_context():
-    db.create_all()
-
 # Команда для запуска приложения
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
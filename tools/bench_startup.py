@@ -0,0 +1,129 @@
+"""
+Замер холодного старта приложения: каждый прогон - новый процесс python.
+
+Для каждого прогона меряет:
+    import - импорт пакета app;
+    create_app - сборку приложения фабрикой;
+    first_request - первый запрос через test_client (по умолчанию GET /beats/genres);
+    total - от запуска интерпретатора до ответа на первый запрос.
+
+Работает без сети на SQLite во временном каталоге; схема создается один раз перед замерами.
+Сравнивает фабрику для продакшена (wsgi.py, без CLI и alembic) с полной (run.py):
+
+    python tools/bench_startup.py --runs 10
+    python tools/bench_startup.py --factory wsgi --path /beats/genres --output startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FACTORIES = {
+    "wsgi": "create_app(cli=False)",
+    "run": "create_app()",
+}
+
+# Код дочернего процесса; время до запуска интерпретатора считается в run_once по time.time()
+CHILD = """
+import json, os, sys, time
+sys.path.insert(0, {root!r})
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+application = app.{factory}
+created = time.perf_counter()
+response = application.test_client().get({path!r})
+finished = time.perf_counter()
+print(json.dumps({{
+    "import": imported - started,
+    "create_app": created - imported,
+    "first_request": finished - created,
+    "finished_at": time.time(),
+    "status": response.status_code,
+}}))
+"""
+
+SCHEMA = """
+import sys
+sys.path.insert(0, {root!r})
+from app import create_app, db
+application = create_app()
+with application.app_context():
+    db.create_all(bind_key=None)
+"""
+
+
+def child_environment(database_url: str) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.update({
+        "DATABASE_URL": database_url,
+        "LOVEAI_API_TOKEN": env.get("LOVEAI_API_TOKEN", "bench-token"),
+        "LOG_LEVEL": "WARNING",
+    })
+    return env
+
+
+def run_once(factory: str, path: str, env: Dict[str, str]) -> Dict[str, float]:
+    code = CHILD.format(root=ROOT, factory=FACTORIES[factory], path=path)
+    spawned = time.time()
+    result = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+    sample = json.loads(result.stdout.strip().splitlines()[-1])
+    sample["total"] = sample.pop("finished_at") - spawned
+    return sample
+
+
+def summarize(samples: List[Dict[str, float]]) -> Dict[str, Dict[str, float]]:
+    summary = {}
+    for phase in ("import", "create_app", "first_request", "total"):
+        values = [sample[phase] * 1000 for sample in samples]
+        summary[phase] = {
+            "median_ms": round(statistics.median(values), 1),
+            "min_ms": round(min(values), 1),
+            "max_ms": round(max(values), 1),
+        }
+    return summary
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Замер холодного старта beatmaker backend")
+    parser.add_argument("--runs", type=int, default=5, help="Прогонов на каждую фабрику")
+    parser.add_argument("--factory", choices=[*FACTORIES, "all"], default="all")
+    parser.add_argument("--path", default="/beats/genres", help="Путь первого запроса")
+    parser.add_argument("--database-url", default=None, help="По умолчанию SQLite во временном каталоге")
+    parser.add_argument("--output", help="Сохранить результат в JSON")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="beatmaker-startup-")
+    env = child_environment(args.database_url or f"sqlite:///{os.path.join(workdir, 'bench.db')}")
+    subprocess.run([sys.executable, "-c", SCHEMA.format(root=ROOT)], env=env, check=True)
+
+    factories = list(FACTORIES) if args.factory == "all" else [args.factory]
+    report = {}
+    for factory in factories:
+        run_once(factory, args.path, env)  # Прогрев кэша байткода и файловой системы
+        samples = [run_once(factory, args.path, env) for _ in range(args.runs)]
+        statuses = sorted({sample["status"] for sample in samples})
+        report[factory] = {"statuses": statuses, **summarize(samples)}
+
+    for factory, phases in report.items():
+        print(f"{factory} ({FACTORIES[factory]}), first request {args.path} -> {phases['statuses']}")
+        for phase in ("import", "create_app", "first_request", "total"):
+            stats = phases[phase]
+            print(f"  {phase:<14} median {stats['median_ms']:>8.1f} ms"
+                  f"   min {stats['min_ms']:>8.1f}   max {stats['max_ms']:>8.1f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
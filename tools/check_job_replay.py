@@ -0,0 +1,74 @@
+"""
+Проверка повтора /beats/create-by-genre с тем же Idempotency-Key после того, как бит
+задания из пула жанра забрал другой пользователь.
+
+Работает на отдельной базе, которую создает сам (запросы к API генерации не выполняются):
+
+    DATABASE_URL=sqlite:// JWT_SECRET_KEY=check python tools/check_job_replay.py
+
+Код выхода 1, если повтор не отвечает 200 или отдает чужой бит.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask_jwt_extended import create_access_token  # noqa: E402
+
+from app import create_app, db  # noqa: E402
+from app.models import Beat, GenrePrompt, SubscriptionPlan, User  # noqa: E402
+
+
+def main() -> int:
+    app = create_app(cli=False)
+    app.config['RATE_LIMIT_ENABLED'] = False
+    client = app.test_client()
+
+    with app.app_context():
+        db.create_all(bind_key=None)
+        db.session.add(SubscriptionPlan(id=1, name='free', max_generations=10))
+        db.session.add(GenrePrompt(genre='rap', prompt='rap instrumental'))
+        owner = User(email='owner@example.com', password='-', available_generations=10)
+        other = User(email='other@example.com', password='-', available_generations=10)
+        db.session.add_all([owner, other])
+        db.session.commit()
+        owner_headers = {'Authorization': f'Bearer {create_access_token(identity=str(owner.id))}'}
+        other_headers = {'Authorization': f'Bearer {create_access_token(identity=str(other.id))}'}
+        owner_id = owner.id
+
+    headers = dict(owner_headers, **{'Idempotency-Key': 'replay-check'})
+    first = client.post('/beats/create-by-genre', json={'genre': 'rap'}, headers=headers)
+    if first.status_code != 201:
+        print(f"create: expected 201, got {first.status_code} {first.get_json()}")
+        return 1
+    created = first.get_json()
+
+    # Второй пользователь забирает бит задания из пула жанра
+    claimed = client.post('/beats/create-by-genre', json={'genre': 'rap'}, headers=other_headers)
+    if claimed.get_json().get('beat_id') != created['no_user_beat_id']:
+        print(f"claim: expected pool beat {created['no_user_beat_id']}, got {claimed.get_json()}")
+        return 1
+
+    replay = client.post('/beats/create-by-genre', json={'genre': 'rap'}, headers=headers)
+    body = replay.get_json()
+    if replay.status_code != 200:
+        print(f"replay: expected 200, got {replay.status_code} {body}")
+        return 1
+    if body['job_id'] != created['job_id'] or body['user_beat_id'] != created['user_beat_id']:
+        print(f"replay: expected job {created['job_id']} and beat {created['user_beat_id']}, got {body}")
+        return 1
+    if body['no_user_beat_id'] is not None:
+        print(f"replay: returned claimed pool beat {body['no_user_beat_id']}")
+        return 1
+
+    with app.app_context():
+        if db.session.get(Beat, body['user_beat_id']).user_id != owner_id:
+            print(f"replay: beat {body['user_beat_id']} is not owned by the caller")
+            return 1
+
+    print("OK replay after pool claim")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
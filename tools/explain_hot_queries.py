@@ -0,0 +1,203 @@
+"""
+Проверка, что горячие запросы приложения идут по ожидаемым индексам (EXPLAIN).
+
+Работает с базой из DATABASE_URL (MySQL или SQLite). Для проверки схемы из моделей
+без реальной базы (так скрипт запускается в CI):
+
+    DATABASE_URL=sqlite:// python tools/explain_hot_queries.py --create-schema
+
+С --create-schema на SQLite в sqlite_stat1 записывается статистика таблиц с реальными
+объемами (SYNTHETIC_ROWS строк, число различных значений из CARDINALITY), иначе
+на пустых таблицах планировщик выбирает индексы не так, как в продакшене.
+На MySQL запускать стоит на копии базы с реальными объемами.
+
+Код выхода 1, если хотя бы один запрос читает таблицу целиком или идет не по
+ожидаемому индексу: так регрессия в индексах ломает сборку.
+"""
+import argparse
+import os
+import re
+import sys
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import select, text  # noqa: E402
+
+from app import create_app, db  # noqa: E402
+from app.models import Beat, MediaAsset, OutboundEmail, User, VerificationCode  # noqa: E402
+
+
+# Синтетическая статистика для SQLite: строк в таблице и различных значений в столбце
+# (столбцы, которых нет в словаре, считаются почти уникальными)
+SYNTHETIC_ROWS = 1_000_000
+CARDINALITY = {
+    "status": 5,
+    "kind": 2,
+    "genre": 30,
+    "user_id": 50_000,
+    "job_id": 500_000,
+    "task_id": 500_000,
+    "audio_asset_id": 500_000,
+    "image_asset_id": 500_000,
+    "sha256": 500_000,
+}
+
+
+def hot_queries():
+    """
+    Запросы из роутов и фоновых процессов в том виде, в каком их выполняет приложение.
+
+    Returns:
+        {название: (запрос, индексы, любой из которых считается правильным планом)}.
+    """
+    return {
+        "beats by user and status (update-beats, /auth/user)": (
+            select(Beat.id).where(Beat.user_id == 1, Beat.status == "in_progress").order_by(Beat.id),
+            ("ix_beats_user_status",)),
+        "beats page by user (/beats/list)": (
+            select(Beat).where(Beat.user_id == 1, Beat.created_at < datetime(2030, 1, 1))
+            .order_by(Beat.created_at.desc(), Beat.id.desc()).limit(51),
+            ("ix_beats_user_created",)),
+        "beats page by user and status (/beats/list?status=)": (
+            select(Beat).where(Beat.user_id == 1, Beat.status == "completed")
+            .order_by(Beat.created_at.desc(), Beat.id.desc()).limit(51),
+            ("ix_beats_user_status",)),
+        "changed beats (/beats/list?since=)": (
+            select(Beat).where(Beat.user_id == 1, Beat.updated_at > datetime(2020, 1, 1))
+            .order_by(Beat.updated_at, Beat.id).limit(51),
+            ("ix_beats_user_updated",)),
+        "pool claim by genre (create-by-genre)": (
+            select(Beat.id).where(Beat.user_id.is_(None), Beat.genre == "rap",
+                                  Beat.status.in_(("completed", "in_progress"))).limit(1),
+            ("ix_beats_user_genre_status",)),
+        "beats by task (completion)": (
+            select(Beat).where(Beat.task_id == "task").order_by(Beat.id),
+            ("ix_beats_task_user",)),
+        "in-progress scan (reconciler)": (
+            select(Beat.id, Beat.task_id).where(Beat.status == "in_progress", Beat.id > 0).order_by(Beat.id).limit(100),
+            ("ix_beats_status",)),
+        "completed beats without local copy (media worker)": (
+            select(Beat).where(Beat.audio_asset_id.is_(None), Beat.status == "completed", Beat.url.isnot(None))
+            .order_by(Beat.id).limit(50),
+            ("ix_beats_audio_asset",)),
+        "latest verification code (verify-email)": (
+            select(VerificationCode).where(VerificationCode.user_id == 1)
+            .order_by(VerificationCode.created_at.desc()).limit(1),
+            ("ix_verification_code_user_created",)),
+        "expired verification codes (purge worker)": (
+            select(VerificationCode.id).where(VerificationCode.expires_at < datetime(2030, 1, 1))
+            .order_by(VerificationCode.expires_at).limit(500),
+            ("ix_verification_code_expires",)),
+        "user by email (auth)": (
+            select(User).where(User.email_normalized == "user@example.com"),
+            ("ux_users_email_normalized",)),
+        "new users (email index refresh)": (
+            select(User.email_normalized, User.created_at).where(User.created_at >= datetime(2030, 1, 1)),
+            ("ix_users_created_at",)),
+        "pending emails (mail worker)": (
+            select(OutboundEmail).where(OutboundEmail.status == "pending",
+                                        OutboundEmail.next_attempt_at <= datetime(2030, 1, 1))
+            .order_by(OutboundEmail.next_attempt_at, OutboundEmail.id).limit(50),
+            ("ix_outbound_emails_status_next_attempt",)),
+        "pending media assets (media worker)": (
+            select(MediaAsset).where(MediaAsset.status == "pending", MediaAsset.next_attempt_at <= datetime(2030, 1, 1))
+            .order_by(MediaAsset.next_attempt_at, MediaAsset.id).limit(4),
+            ("ix_media_assets_status_next_attempt",)),
+        "coldest stored media assets (eviction)": (
+            select(MediaAsset).where(MediaAsset.status == "stored")
+            .order_by(MediaAsset.last_accessed_at, MediaAsset.id).limit(100),
+            ("ix_media_assets_status_accessed",)),
+    }
+
+
+def load_synthetic_stats(connection) -> None:
+    """Заполняет sqlite_stat1 статистикой по CARDINALITY для всех индексов моделей."""
+    connection.execute(text("ANALYZE"))
+    connection.execute(text("DELETE FROM sqlite_stat1"))
+    for table in db.metadata.sorted_tables:
+        connection.execute(text("INSERT INTO sqlite_stat1 VALUES (:tbl, NULL, :stat)"),
+                           {"tbl": table.name, "stat": str(SYNTHETIC_ROWS)})
+        for index in table.indexes:
+            distinct, stat = 1, [SYNTHETIC_ROWS]
+            for column in index.columns:
+                distinct = min(SYNTHETIC_ROWS, distinct * CARDINALITY.get(column.name, SYNTHETIC_ROWS))
+                stat.append(max(1, SYNTHETIC_ROWS // distinct))
+            connection.execute(text("INSERT INTO sqlite_stat1 VALUES (:tbl, :idx, :stat)"),
+                               {"tbl": table.name, "idx": index.name, "stat": " ".join(map(str, stat))})
+    connection.commit()
+    connection.execute(text("ANALYZE sqlite_schema"))  # Перечитать статистику
+
+
+def explain(connection, sql: str) -> Tuple[bool, List[str], List[str]]:
+    """
+    Returns:
+        (нет ли полного просмотра таблицы, индексы из плана, строки плана для вывода).
+    """
+    dialect = connection.dialect.name
+    if dialect == "sqlite":
+        plan = [row[-1] for row in connection.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+        full_scan = any(line.startswith("SCAN") and "INDEX" not in line for line in plan)
+        indexes = [match.group(1) for line in plan for match in [re.search(r"USING (?:COVERING )?INDEX (\w+)", line)] if match]
+        return not full_scan, indexes, plan
+
+    if dialect == "mysql":
+        result = connection.execute(text(f"EXPLAIN {sql}"))
+        rows = [dict(zip(result.keys(), row)) for row in result]
+        plan = [f"table={row['table']} type={row['type']} key={row['key']} rows={row['rows']}" for row in rows]
+        full_scan = any(row["type"] == "ALL" or (row["table"] and row["key"] is None) for row in rows)
+        return not full_scan, [row["key"] for row in rows if row["key"]], plan
+
+    raise RuntimeError(f"EXPLAIN для диалекта {dialect} не поддерживается")
+
+
+def check(connection) -> Dict[str, str]:
+    """
+    Returns:
+        {название запроса: OK, FULL SCAN или WRONG INDEX}.
+    """
+    results = {}
+    for name, (query, expected) in hot_queries().items():
+        sql = str(query.compile(connection, compile_kwargs={"literal_binds": True}))
+        no_full_scan, indexes, plan = explain(connection, sql)
+        if not no_full_scan:
+            status = "FULL SCAN"
+        elif not set(indexes) & set(expected):
+            status = "WRONG INDEX"
+        else:
+            status = "OK"
+        results[name] = status
+        print(f"[{status}] {name}")
+        if status != "OK":
+            print(f"    expected: {', '.join(expected)}")
+        for line in plan:
+            print(f"    {line}")
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="EXPLAIN горячих запросов")
+    parser.add_argument("--create-schema", action="store_true",
+                        help="Создать таблицы из моделей (для пустой базы), на SQLite - с синтетической статистикой")
+    args = parser.parse_args()
+
+    app = create_app(cli=False)
+    with app.app_context():
+        if args.create_schema:
+            db.create_all(bind_key=None)
+
+        with db.engine.connect() as connection:
+            if args.create_schema and connection.dialect.name == "sqlite":
+                load_synthetic_stats(connection)
+            results = check(connection)
+
+    failed = [name for name, status in results.items() if status != "OK"]
+    if failed:
+        print(f"{len(failed)} of {len(results)} hot queries do not use the expected index")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
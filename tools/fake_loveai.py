@@ -0,0 +1,116 @@
+"""
+Локальная заглушка API генерации LoveAI для разработки и тестов.
+
+Отвечает на те же запросы, что и api.loveaiapi.com, и через --complete-after секунд
+отправляет готовую задачу на callback_url. --latency/--jitter добавляют задержку к каждому
+ответу, --failure-rate - долю ответов 503. Запуск:
+
+    python tools/fake_loveai.py --port 5001 --complete-after 5 --secret <LOVEAI_CALLBACK_SECRET>
+
+и в .env приложения: LOVEAI_BASE_URL=http://127.0.0.1:5001
+"""
+import argparse
+import hashlib
+import hmac
+import json
+import random
+import threading
+import time
+import uuid
+
+import requests
+from flask import Flask, jsonify, request
+
+app = Flask(__name__)
+tasks = {}  # task_id -> {"created": ..., "title": ..., "callback_url": ...}
+tasks_lock = threading.Lock()
+settings = argparse.Namespace(complete_after=5.0, secret=None, latency=0.0, jitter=0.0, failure_rate=0.0, quiet=False)
+
+
+@app.before_request
+def simulate_upstream():
+    """Задержка ответа и случайные отказы, как у перегруженного API."""
+    delay = settings.latency + random.uniform(0, settings.jitter)
+    if delay > 0:
+        time.sleep(delay)
+    if settings.failure_rate and random.random() < settings.failure_rate:
+        return jsonify({"error": "Service temporarily unavailable"}), 503
+
+
+def task_payload(task_id: str) -> dict:
+    task = tasks[task_id]
+    if time.monotonic() - task["created"] < settings.complete_after:
+        return {"task_id": task_id, "output_data": {"msg": "Generating.", "data": []}}
+
+    tracks = [
+        {
+            "title": f"{task['title']} {i + 1}",
+            "audio_url": f"https://cdn.example.com/{task_id}/{i}.mp3",
+            "image_url": f"https://cdn.example.com/{task_id}/{i}.jpg",
+        }
+        for i in range(2)
+    ]
+    return {"task_id": task_id, "output_data": {"msg": "All generated successfully.", "data": tracks}}
+
+
+def send_callback(task_id: str) -> None:
+    time.sleep(settings.complete_after)
+    callback_url = tasks[task_id]["callback_url"]
+    body = json.dumps(task_payload(task_id)).encode()
+    headers = {"Content-Type": "application/json"}
+    if settings.secret:
+        headers["X-Signature"] = hmac.new(settings.secret.encode(), body, hashlib.sha256).hexdigest()
+    try:
+        response = requests.post(callback_url, data=body, headers=headers, timeout=10)
+        if not settings.quiet:
+            print(f"callback {task_id} -> {response.status_code}")
+    except requests.exceptions.RequestException as e:
+        print(f"callback {task_id} failed: {e}")
+
+
+@app.route("/music/suno/generate2", methods=["POST"])
+def generate():
+    if not request.headers.get("Authorization", "").startswith("Bearer "):
+        return jsonify({"error": "Unauthorized"}), 401
+
+    data = request.get_json() or {}
+    task_id = str(uuid.uuid4())
+    with tasks_lock:
+        tasks[task_id] = {
+            "created": time.monotonic(),
+            "title": data.get("title") or "Fake beat",
+            "callback_url": data.get("callback_url"),
+        }
+    if data.get("callback_url"):
+        threading.Thread(target=send_callback, args=(task_id,), daemon=True).start()
+    return jsonify({"task_id": task_id}), 200
+
+
+@app.route("/music/suno/task", methods=["GET"])
+def task():
+    task_id = request.args.get("task_id")
+    if task_id not in tasks:
+        return jsonify({"error": "Task not found"}), 404
+    return jsonify(task_payload(task_id)), 200
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake LoveAI API")
+    parser.add_argument("--port", type=int, default=5001)
+    parser.add_argument("--complete-after", type=float, default=5.0, help="Через сколько секунд задача готова")
+    parser.add_argument("--secret", default=None, help="Секрет для подписи callback (LOVEAI_CALLBACK_SECRET)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Задержка каждого ответа, сек")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Случайная добавка к задержке от 0 до jitter, сек")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Доля запросов, на которые ответ 503")
+    parser.add_argument("--quiet", action="store_true", help="Не печатать каждый callback и запрос")
+    args = parser.parse_args()
+    settings.complete_after = args.complete_after
+    settings.secret = args.secret
+    settings.latency = args.latency
+    settings.jitter = args.jitter
+    settings.failure_rate = args.failure_rate
+    settings.quiet = args.quiet
+    if args.quiet:
+        import logging
+        logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    app.run(port=args.port, threaded=True)
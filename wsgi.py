@@ -0,0 +1,11 @@
+"""
+Точка входа для продакшен-сервера: приложение создается один раз в мастер-процессе
+и наследуется воркерами после fork.
+
+    gunicorn --preload -w 4 -b 0.0.0.0:5000 wsgi:app
+
+Миграции и команды обслуживания запускаются через run.py: flask --app run db upgrade.
+"""
+from app import create_app
+
+app = create_app(cli=False)